@@ -4,7 +4,14 @@ from kaniko import main
 
 
 def __main__(argv=None):
-    main.main(docopt.docopt(main.__doc__, argv=argv, options_first=True))
+    main.main(
+        docopt.docopt(
+            main.__doc__,
+            argv=argv,
+            options_first=True,
+            version=main.PACKAGE_VERSION,
+        )
+    )
 
 
 if __name__ == "__main__":
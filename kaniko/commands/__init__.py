@@ -1 +0,0 @@
-from .build import cmd as build
@@ -1 +0,0 @@
-from .kaniko import kaniko_wrapper
@@ -2,27 +2,92 @@
 Kaniko-Compose Wrapper
 
 Usage:
-    kaniko [--compose-file=<file>] build [--kaniko-image=<image>] [--push | --deploy | --dry-run] [--version] [--help]
+    kaniko [--compose-file=<file>...] build [--kaniko-image=<image>] [--profile=<name>...] [--with-dependencies] [--changed-since=<ref>] [--max-parallel=<n>] [--skip-unchanged] [--build-index=<file>] [--pack-context] [--cache] [--cache-repo=<repo>] [--cache-dir=<dir>] [--cache-ttl=<ttl>] [--cache-copy-layers] [--use-new-run] [--snapshot-mode=<mode>] [--warm-cache] [--warmer-image=<image>] [--host-cpus=<n>] [--host-memory=<size>] [--log-dir=<dir>] [--tail-lines=<n>] [--engine=<engine>] [--backend=<name>] [--executor=<path>] [--build-timeout=<seconds>] [--retries=<n>] [--retry-delay=<seconds>] [--fail-fast | --keep-going] [--metrics-out=<file>] [--metrics-prom=<file>] [--digest-dir=<dir>] [--history=<file> | --no-history] [--plan-out=<file>] [--plan-in=<file>] [--shard=<i/n>] [--progress=<mode>] [--push | --deploy | --dry-run] [--version] [--help] [<service>...]
 
 Options:
-  --compose-file=<file>           Path to the docker-compose.yml file. [default: docker-compose.yml]
+  --compose-file=<file>           Path to the docker-compose.yml file; repeat to merge overrides. [default: docker-compose.yml]
   --kaniko-image=<image>          Kaniko executor image for building. [default: gcr.io/kaniko-project/executor:latest]
+  --profile=<name>                Also build services of this compose profile; repeatable (def. $COMPOSE_PROFILES).
+  --with-dependencies             With <service> names, also build the services they depend on.
+  --changed-since=<ref>           Only build services whose context or Dockerfile changed since this git ref, and their dependents.
+  --max-parallel=<n>              Maximum number of services built at the same time.
+  --skip-unchanged                Skip services whose context, Dockerfile, args and dependencies did not change since the last push.
+  --build-index=<file>            Where fingerprints of pushed builds are stored (under ~/.cache/kaniko-wrapper by default).
+  --pack-context                  Send each context to kaniko as a filtered tar.gz honoring .dockerignore, cached by content.
+  --cache                         Enable kaniko layer caching.
+  --cache-repo=<repo>             Remote repository used to store cached layers.
+  --cache-dir=<dir>               Local directory with cached base images, mounted into the kaniko container.
+  --cache-ttl=<ttl>               Cache timeout, e.g. 168h.
+  --cache-copy-layers             Cache COPY layers as well.
+  --use-new-run                   Use kaniko's experimental run implementation to detect changes.
+  --snapshot-mode=<mode>          How to snapshot the filesystem: full, redo or time.
+  --warm-cache                    Pull base images once with the kaniko warmer into --cache-dir before building.
+  --warmer-image=<image>          Kaniko warmer image. [default: gcr.io/kaniko-project/warmer:latest]
+  --host-cpus=<n>                 CPUs available to builds (detected from cgroup limits by default).
+  --host-memory=<size>            Memory available to builds, e.g. 16g (detected by default).
+  --log-dir=<dir>                 Write each service's build output to <dir>/<service>.log.
+  --tail-lines=<n>                Lines of output shown when a build fails. [default: 50]
+  --engine=<engine>               Build engine: threads or asyncio. [default: threads]
+  --backend=<name>                How builds run: docker (kaniko container per build) or direct (run the executor in place). [default: docker]
+  --executor=<path>               Kaniko executor binary of the direct backend. [default: /kaniko/executor]
+  --build-timeout=<seconds>       Abort a service build that runs longer than this (asyncio engine).
+  --retries=<n>                   Retry a build this many times after a transient registry or network failure. [default: 0]
+  --retry-delay=<seconds>         Delay before the first retry, doubled for every further one. [default: 5]
+  --fail-fast                     Kill running builds and drop queued ones as soon as one build fails.
+  --keep-going                    Build every service that does not depend on a failed one, then report all failures.
+  --metrics-out=<file>            Write per-service timings, exit codes and digests as JSON.
+  --metrics-prom=<file>           Write the same metrics as a Prometheus textfile.
+  --digest-dir=<dir>              Write <service>.digest and <service>.image files with the pushed digest.
+  --history=<file>                Build history used to start the longest builds first (under ~/.cache/kaniko-wrapper by default).
+  --no-history                    Neither read nor record the build history.
+  --plan-out=<file>               Write the resolved build plan as JSON; with --dry-run, only plan.
+  --plan-in=<file>                Build a plan written by --plan-out instead of reading the compose files.
+  --shard=<i/n>                   Only build shard i of n (from 1), balanced by expected build time.
+  --progress=<mode>               Build progress: live (one row per service), plain (a line per state change), off, or auto (live on a terminal). [default: auto]
   --push, -p                      Push the built images to a registry.
   --deploy, -d                    Deploy images to the registry after building.
-  --dry-run, --dry                Run in test mode: build images without pushing, with cleanup.
+  --dry-run, --dry                Print the build plan and the command of every build without starting any.
   -h --help                       Show this help message and exit.
 """
 
-import argparse
 import logging
+import os
 import subprocess
 import typing as t
 
-from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoCommandBuilder
-from kaniko.helpers.logger_file import LoggerModel
+from kaniko.commands.build.kaniko.backends import BACKENDS
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.resources import parse_memory
+from kaniko.helpers.castom_exeption import FailedBuild, UnknownProfile, UnknownService
+from kaniko.helpers.logger_file import Logger, LoggerModel
 from kaniko.settings import SCRIPT_VERSION
 
 
+ENGINES = ("threads", "asyncio")
+PROGRESS_MODES = ("auto", "live", "plain", "off")
+
+
+def _optional_int(value: t.Optional[str]) -> t.Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _optional_float(value: t.Optional[str]) -> t.Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _optional_memory(value: t.Optional[str]) -> t.Optional[int]:
+    return parse_memory(value) if value is not None else None
+
+
+def _optional_shard(value: t.Optional[str]) -> t.Optional[t.Tuple[int, int]]:
+    if value is None:
+        return None
+    index, separator, count = value.partition("/")
+    if not separator:
+        raise ValueError(f"Invalid shard '{value}', expected <i>/<n>")
+    return int(index), int(count)
+
+
 class CommandLineOptions:
     def __init__(
         self,
@@ -32,6 +97,38 @@ class CommandLineOptions:
         deploy: bool = False,
         dry_run: bool = False,
         version: bool = False,
+        max_parallel: t.Optional[int] = None,
+        skip_unchanged: bool = False,
+        build_index: t.Optional[str] = None,
+        cache_options: t.Optional[KanikoCacheOptions] = None,
+        warm_cache: bool = False,
+        warmer_image: str = "gcr.io/kaniko-project/warmer:latest",
+        host_cpus: t.Optional[float] = None,
+        host_memory: t.Optional[int] = None,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = 50,
+        engine: str = "threads",
+        backend: str = "docker",
+        executor: str = "/kaniko/executor",
+        retries: int = 0,
+        retry_delay: float = 5.0,
+        digest_dir: t.Optional[str] = None,
+        build_timeout: t.Optional[float] = None,
+        failure_mode: str = "stop",
+        metrics_out: t.Optional[str] = None,
+        metrics_prom: t.Optional[str] = None,
+        compose_files: t.Optional[t.List[str]] = None,
+        profiles: t.Optional[t.List[str]] = None,
+        services: t.Optional[t.List[str]] = None,
+        with_dependencies: bool = False,
+        changed_since: t.Optional[str] = None,
+        history: t.Optional[str] = None,
+        record_history: bool = True,
+        pack_context: bool = False,
+        plan_out: t.Optional[str] = None,
+        plan_in: t.Optional[str] = None,
+        shard: t.Optional[t.Tuple[int, int]] = None,
+        progress: str = "auto",
     ):
         self.compose_file = compose_file
         self.kaniko_image = kaniko_image
@@ -39,11 +136,51 @@ class CommandLineOptions:
         self.deploy = deploy
         self.dry_run = dry_run
         self.version = version
+        self.max_parallel = max_parallel
+        self.skip_unchanged = skip_unchanged
+        self.build_index = build_index
+        self.cache_options = cache_options or KanikoCacheOptions()
+        self.warm_cache = warm_cache
+        self.warmer_image = warmer_image
+        self.host_cpus = host_cpus
+        self.host_memory = host_memory
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.engine = engine
+        self.backend = backend
+        self.executor = executor
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.digest_dir = digest_dir
+        self.build_timeout = build_timeout
+        self.failure_mode = failure_mode
+        self.metrics_out = metrics_out
+        self.metrics_prom = metrics_prom
+        self.compose_files = compose_files or [compose_file]
+        self.profiles = profiles or []
+        self.services = services or []
+        self.with_dependencies = with_dependencies
+        self.changed_since = changed_since
+        self.history = history
+        self.record_history = record_history
+        self.pack_context = pack_context
+        self.plan_out = plan_out
+        self.plan_in = plan_in
+        self.shard = shard
+        self.progress = progress
 
     @classmethod
     def from_dict(cls, opts: t.Dict[str, t.Any]) -> "CommandLineOptions":
+        compose_files = opts.get("--compose-file") or ["docker-compose.yml"]
+        if isinstance(compose_files, str):
+            compose_files = [compose_files]
+        profiles = opts.get("--profile") or [
+            profile
+            for profile in os.environ.get("COMPOSE_PROFILES", "").split(",")
+            if profile
+        ]
         return cls(
-            compose_file=opts.get("--compose-file", "docker-compose.yml"),
+            compose_file=compose_files[0],
             kaniko_image=opts.get(
                 "--kaniko-image", "gcr.io/kaniko-project/executor:latest"
             ),
@@ -51,6 +188,44 @@ class CommandLineOptions:
             deploy=opts.get("--deploy", False),
             dry_run=opts.get("--dry-run", False),
             version=opts.get("--version", False),
+            max_parallel=_optional_int(opts.get("--max-parallel")),
+            skip_unchanged=opts.get("--skip-unchanged", False),
+            build_index=opts.get("--build-index"),
+            cache_options=KanikoCacheOptions.from_cli(opts),
+            warm_cache=opts.get("--warm-cache", False),
+            warmer_image=opts.get(
+                "--warmer-image", "gcr.io/kaniko-project/warmer:latest"
+            ),
+            host_cpus=_optional_float(opts.get("--host-cpus")),
+            host_memory=_optional_memory(opts.get("--host-memory")),
+            log_dir=opts.get("--log-dir"),
+            tail_lines=int(opts.get("--tail-lines") or 50),
+            engine=opts.get("--engine") or "threads",
+            backend=opts.get("--backend") or "docker",
+            executor=opts.get("--executor") or "/kaniko/executor",
+            build_timeout=_optional_float(opts.get("--build-timeout")),
+            retries=int(opts.get("--retries") or 0),
+            retry_delay=float(opts.get("--retry-delay") or 5.0),
+            failure_mode=(
+                "fail-fast"
+                if opts.get("--fail-fast")
+                else "keep-going" if opts.get("--keep-going") else "stop"
+            ),
+            metrics_out=opts.get("--metrics-out"),
+            metrics_prom=opts.get("--metrics-prom"),
+            digest_dir=opts.get("--digest-dir"),
+            compose_files=compose_files,
+            profiles=profiles,
+            services=opts.get("<service>") or [],
+            with_dependencies=opts.get("--with-dependencies", False),
+            changed_since=opts.get("--changed-since"),
+            history=opts.get("--history"),
+            record_history=not opts.get("--no-history", False),
+            pack_context=opts.get("--pack-context", False),
+            plan_out=opts.get("--plan-out"),
+            plan_in=opts.get("--plan-in"),
+            shard=_optional_shard(opts.get("--shard")),
+            progress=opts.get("--progress") or "auto",
         )
 
     def validate(self, logger: t.Optional[logging.Logger] = None) -> bool:
@@ -62,37 +237,204 @@ class CommandLineOptions:
             if logger:
                 logger.error("❌ Kaniko image is missing.")
             return False
+        if self.max_parallel is not None and self.max_parallel < 1:
+            if logger:
+                logger.error("❌ --max-parallel must be a positive integer.")
+            return False
+        if self.retries < 0:
+            if logger:
+                logger.error("❌ --retries must not be negative.")
+            return False
+        if self.engine not in ENGINES:
+            if logger:
+                logger.error(f"❌ Unknown engine: {self.engine}.")
+            return False
+        unsupported = self._threads_only_options() if self.engine == "asyncio" else []
+        if unsupported:
+            if logger:
+                logger.error(
+                    "❌ Not supported by the asyncio engine: "
+                    f"{', '.join(unsupported)}."
+                )
+            return False
+        if self.engine == "threads" and self.build_timeout is not None:
+            if logger:
+                logger.error("❌ Not supported by the threads engine: --build-timeout.")
+            return False
+        ignored = self._selection_options() if self.plan_in else []
+        if ignored:
+            if logger:
+                logger.error(
+                    "❌ The services of --plan-in are fixed, not supported with it: "
+                    f"{', '.join(ignored)}."
+                )
+            return False
+        if self.backend not in BACKENDS:
+            if logger:
+                logger.error(f"❌ Unknown backend: {self.backend}.")
+            return False
+        if self.shard is not None and not 1 <= self.shard[0] <= self.shard[1]:
+            if logger:
+                logger.error("❌ --shard must be i/n with 1 <= i <= n.")
+            return False
+        if self.progress not in PROGRESS_MODES:
+            if logger:
+                logger.error(f"❌ Unknown progress mode: {self.progress}.")
+            return False
         return True
 
+    def _threads_only_options(self) -> t.List[str]:
+        """Options given that only the threads engine implements."""
+        options = {
+            "--skip-unchanged": self.skip_unchanged,
+            "--digest-dir": self.digest_dir,
+            "--metrics-out": self.metrics_out,
+            "--metrics-prom": self.metrics_prom,
+            "--warm-cache": self.warm_cache,
+            "--fail-fast": self.failure_mode == "fail-fast",
+            "--keep-going": self.failure_mode == "keep-going",
+            "--retries": self.retries,
+            "--pack-context": self.pack_context,
+            "--history": self.history,
+            "--host-cpus": self.host_cpus is not None,
+            "--host-memory": self.host_memory is not None,
+        }
+        return [option for option, given in options.items() if given]
+
+    def _selection_options(self) -> t.List[str]:
+        """Options given that select the services to plan."""
+        options = {
+            "<service>": self.services,
+            "--profile": self.profiles,
+            "--with-dependencies": self.with_dependencies,
+            "--changed-since": self.changed_since,
+        }
+        return [option for option, given in options.items() if given]
+
 
 class KanikoBuildCommand:
+    """Plan the services of the compose files once, then build them.
+
+    With ``--dry-run`` the plan is printed with the command of every build and
+    nothing is started.
+    """
+
     def __init__(self, opts: CommandLineOptions):
         self.opts = opts
-        self.command_builder = KanikoCommandBuilder(self.opts.kaniko_image)
-
-    def build_command(self) -> t.List[str]:
-        return self.command_builder.build_command(
-            context=self.opts.compose_file,
-            dockerfile="Dockerfile",
-            image=self.opts.kaniko_image,
-            build_args={},
-            push=self.opts.push,
+
+    def create_builder(self):
+        # The engine pulls in yaml and pydantic, so it is only loaded to build.
+        from kaniko.commands.build.kaniko.backends import create_backend
+        from kaniko.commands.build.kaniko.progress import BuildProgress
+        from kaniko.commands.build.kaniko.resources import ResourcePool
+        from kaniko.commands.build.kaniko.retry import RetryPolicy
+
+        opts = self.opts
+        backend = create_backend(opts.backend, opts.kaniko_image, opts.executor)
+        push = opts.push or opts.deploy
+        progress = None
+        if opts.progress != "off" and not opts.dry_run:
+            progress = BuildProgress(opts.progress)
+        if opts.engine == "asyncio":
+            from kaniko.commands.build.kaniko.async_builder import AsyncKanikoBuilder
+
+            return AsyncKanikoBuilder(
+                opts.compose_files,
+                opts.kaniko_image,
+                push,
+                opts.dry_run,
+                opts.max_parallel,
+                opts.build_timeout,
+                opts.cache_options,
+                opts.log_dir,
+                opts.tail_lines,
+                opts.profiles,
+                opts.services,
+                opts.with_dependencies,
+                opts.changed_since,
+                backend,
+                progress,
+            )
+
+        from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoBuilder
+
+        resource_pool = None
+        if opts.host_cpus is not None or opts.host_memory is not None:
+            resource_pool = ResourcePool.from_host(opts.host_cpus, opts.host_memory)
+        return KanikoBuilder(
+            opts.compose_files,
+            opts.kaniko_image,
+            push,
+            opts.dry_run,
+            max_parallel=opts.max_parallel,
+            skip_unchanged=opts.skip_unchanged,
+            build_index_path=opts.build_index,
+            cache_options=opts.cache_options,
+            warm_cache=opts.warm_cache,
+            warmer_image=opts.warmer_image,
+            resource_pool=resource_pool,
+            log_dir=opts.log_dir,
+            tail_lines=opts.tail_lines,
+            failure_mode=opts.failure_mode,
+            metrics_out=opts.metrics_out,
+            metrics_prom=opts.metrics_prom,
+            profiles=opts.profiles,
+            services=opts.services,
+            with_dependencies=opts.with_dependencies,
+            changed_since=opts.changed_since,
+            history_path=opts.history,
+            record_history=opts.record_history,
+            pack_context=opts.pack_context,
+            backend=backend,
+            retry_policy=RetryPolicy(opts.retries, opts.retry_delay),
+            digest_dir=opts.digest_dir,
+            progress=progress,
         )
 
-    def run_build(self, logger: LoggerModel) -> None:
-        if self.opts.dry_run:
-            logger.log_info("🔍 Running in dry-run mode. No images will be pushed.")
-            return
+    def create_plan(self, builder, logger: LoggerModel):
+        """Plan from the compose files or ``--plan-in``, then export and shard."""
+        from kaniko.commands.build.kaniko.plan import BuildPlan
 
+        opts = self.opts
+        if opts.plan_in:
+            plan = BuildPlan.read(opts.plan_in)
+            logger.log_info(f"📄 Loaded a plan of {len(plan.builds)} services.")
+        else:
+            plan = builder.plan(fingerprints=bool(opts.plan_out))
+        if opts.plan_out:
+            plan.write(opts.plan_out)
+            logger.log_info(f"📝 Build plan written to {opts.plan_out}")
+        if opts.shard:
+            index, count = opts.shard
+            plan = plan.shard(index, count)
+            names = ", ".join(build.service_name for build in plan.builds)
+            logger.log_info(f"🧩 Shard {index}/{count}: {names or 'nothing to build'}")
+        return plan
+
+    def run_build(self, logger: LoggerModel) -> bool:
+        """Build everything, returning whether all builds succeeded."""
         try:
-            logger.log_info("⚙️ Kaniko build process is now running...")
-            command = self.build_command()
-            subprocess.run(command, check=True)
-            logger.log_info("✅ Kaniko build process completed successfully!")
-        except subprocess.CalledProcessError as e:
+            builder = self.create_builder()
+            plan = self.create_plan(builder, logger)
+            if self.opts.dry_run:
+                builder.show(plan)
+                return True
+            logger.log_info(
+                f"⚙️ Building {len(plan.builds)} services with the "
+                f"{self.opts.engine} engine..."
+            )
+            builder.run(plan)
+        except (UnknownService, UnknownProfile) as e:
+            logger.log_error(f"❌ Usage error: {e}")
+            return False
+        except (subprocess.CalledProcessError, FailedBuild) as e:
             logger.log_error(f"❌ Kaniko build failed with error: {e}")
+            return False
         except Exception as e:
             logger.log_error(f"❌ An unexpected error occurred: {e}")
+            return False
+        logger.log_info("✅ Kaniko build process completed successfully!")
+        return True
 
 
 class VersionModel:
@@ -104,7 +446,7 @@ class VersionModel:
 
 
 def run(opts: t.Dict[str, t.Any], script_version=SCRIPT_VERSION) -> None:
-    logger = LoggerModel(logging.INFO)
+    logger = LoggerModel()
     options = CommandLineOptions.from_dict(opts)
 
     if options.version:
@@ -118,6 +460,8 @@ def run(opts: t.Dict[str, t.Any], script_version=SCRIPT_VERSION) -> None:
         return
 
     logger.log_build_details(options)
+    if options.log_dir:
+        Logger.log_to_service_files(options.log_dir)
 
-    build_command = KanikoBuildCommand(options)
-    build_command.run_build(logger)
+    if not KanikoBuildCommand(options).run_build(logger):
+        raise SystemExit(1)
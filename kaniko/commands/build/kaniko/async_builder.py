@@ -0,0 +1,327 @@
+import asyncio
+import functools
+import os
+import signal
+import subprocess
+import typing as t
+import uuid
+
+from kaniko.commands.build.kaniko.backends import (
+    BuildRequest,
+    DockerRunBackend,
+    ExecutorBackend,
+)
+from kaniko.commands.build.kaniko import metrics as build_metrics
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.fingerprint import ContextFingerprinter
+from kaniko.commands.build.kaniko.kaniko_wrapper import load_build_graph
+from kaniko.commands.build.kaniko.output import DEFAULT_TAIL_LINES, ServiceOutput
+from kaniko.commands.build.kaniko.plan import BuildPlan, PlannedBuild, create_plan
+from kaniko.commands.build.kaniko.progress import BUILDING, QUEUED, BuildProgress
+from kaniko.commands.build.kaniko.scheduler import (
+    BuildGraph,
+    default_parallelism,
+    dockerfile_steps,
+)
+from kaniko.commands.build.kaniko.services import ServiceSpec
+from kaniko.helpers.logger_file import _init_log, service_logger
+
+logger = _init_log()
+
+# Time a terminated build gets to stop its container before it is killed.
+TERMINATE_GRACE_PERIOD = 10.0
+
+_STREAM_LIMIT = 1024 * 1024
+
+
+class AsyncKanikoBuilder:
+    """Build compose services from a single event loop instead of a thread pool.
+
+    Every build is a child process driven by ``asyncio``; concurrency is bounded
+    by a semaphore, each build may have a timeout, and SIGINT/SIGTERM cancel all
+    builds, terminating their processes (``docker run`` forwards the signal to
+    the kaniko container), and exit with ``128 + signal``.
+    """
+
+    def __init__(
+        self,
+        compose_file: t.Union[str, t.Sequence[str]],
+        kaniko_image: str,
+        push: bool,
+        dry_run: bool,
+        max_parallel: t.Optional[int] = None,
+        build_timeout: t.Optional[float] = None,
+        cache_options: t.Optional[KanikoCacheOptions] = None,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        profiles: t.Sequence[str] = (),
+        services: t.Sequence[str] = (),
+        with_dependencies: bool = False,
+        changed_since: t.Optional[str] = None,
+        backend: t.Optional[ExecutorBackend] = None,
+        progress: t.Optional[BuildProgress] = None,
+    ):
+        self.compose_file = compose_file
+        self.kaniko_image = kaniko_image
+        self.push = push
+        self.dry_run = dry_run
+        self.backend = backend or DockerRunBackend(kaniko_image)
+        self.max_parallel = max_parallel or default_parallelism()
+        if self.backend.max_parallel is not None:
+            self.max_parallel = min(self.max_parallel, self.backend.max_parallel)
+        self.build_timeout = build_timeout
+        self.cache_options = cache_options or KanikoCacheOptions()
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.profiles = list(profiles)
+        self.services = list(services)
+        self.with_dependencies = with_dependencies
+        self.changed_since = changed_since
+        self.progress = progress
+        self.run_id = uuid.uuid4().hex[:12]
+
+    def plan(self, fingerprints: bool = False) -> BuildPlan:
+        graph = load_build_graph(
+            self.compose_file,
+            self.profiles,
+            self.services,
+            self.with_dependencies,
+            self.changed_since,
+        )
+        fingerprint = None
+        if fingerprints:
+            fingerprinter = ContextFingerprinter()
+
+            def fingerprint(
+                service: ServiceSpec, parents: t.Sequence[str]
+            ) -> t.Optional[str]:
+                try:
+                    return fingerprinter.fingerprint(
+                        service.context,
+                        service.dockerfile,
+                        service.build_args(),
+                        self.backend.kaniko_image,
+                        service.target,
+                        parents=parents,
+                    )
+                except OSError as e:
+                    logger.warning(f"Cannot fingerprint service {service.name}: {e}")
+                    return None
+
+        return create_plan(graph, self.cache_options, fingerprint=fingerprint)
+
+    def show(self, plan: BuildPlan) -> None:
+        print(plan.describe(self.build_command))
+
+    def run(self, plan: BuildPlan) -> None:
+        if self.progress is None:
+            asyncio.run(self.run_graph(plan.graph()))
+            return
+        for build in plan.builds:
+            self.progress.add(
+                build.service_name,
+                dockerfile_steps(os.path.join(build.context, build.dockerfile)),
+                build.duration,
+            )
+        with self.progress:
+            asyncio.run(self.run_graph(plan.graph()))
+
+    def execute(self) -> None:
+        plan = self.plan()
+        if self.dry_run:
+            self.show(plan)
+        else:
+            self.run(plan)
+
+    async def run_graph(self, graph: BuildGraph) -> None:
+        """Build ``graph``, whose ``services`` are the builds of a plan."""
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        tasks: t.Dict[str, asyncio.Task] = {}
+        for name in graph.topological_order():
+            parents = [tasks[parent] for parent in graph.dependencies[name]]
+            tasks[name] = asyncio.ensure_future(
+                self._build_after(name, graph.services[name], parents, semaphore)
+            )
+
+        loop = asyncio.get_running_loop()
+        received: t.List[int] = []
+        installed = self._install_signal_handlers(loop, list(tasks.values()), received)
+        try:
+            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        finally:
+            for sig in installed:
+                loop.remove_signal_handler(sig)
+
+        if received:
+            cancelled = [
+                name
+                for name, result in zip(tasks, results)
+                if isinstance(result, asyncio.CancelledError)
+            ]
+            logger.error(
+                f"Build interrupted by {signal.Signals(received[0]).name}, "
+                f"cancelled: {', '.join(cancelled) or 'nothing'}"
+            )
+            raise SystemExit(128 + received[0])
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _install_signal_handlers(
+        loop: asyncio.AbstractEventLoop,
+        tasks: t.List[asyncio.Task],
+        received: t.List[int],
+    ) -> t.List[int]:
+        def cancel_all(sig: int) -> None:
+            logger.warning(
+                f"Received {signal.Signals(sig).name}, cancelling running builds."
+            )
+            received.append(sig)
+            for task in tasks:
+                task.cancel()
+
+        installed = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, cancel_all, sig)
+            except (NotImplementedError, RuntimeError):
+                # Not the main thread, or a platform without signal support.
+                continue
+            installed.append(sig)
+        return installed
+
+    async def _build_after(
+        self,
+        service_name: str,
+        build: PlannedBuild,
+        parents: t.List[asyncio.Task],
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        if parents:
+            await asyncio.gather(*parents)
+        if self.progress is not None:
+            self.progress.set_state(service_name, QUEUED)
+        async with semaphore:
+            await self.run_build(service_name, build)
+
+    def build_command(self, build: PlannedBuild) -> t.List[str]:
+        request = BuildRequest(
+            build.service_name,
+            build.context,
+            build.dockerfile,
+            build.image,
+            dict(build.build_args),
+            self.push,
+            build.cache_options,
+            build.resources,
+            build.target,
+            destinations=build.destinations,
+        )
+        return self.backend.build_command(request, self.run_id)
+
+    async def run_build(self, service_name: str, build: PlannedBuild) -> None:
+        command = self.build_command(build)
+        if self.dry_run:
+            logger.info(
+                f"[Dry-Run] Command for service {service_name}: {' '.join(command)}"
+            )
+            return
+
+        if self.progress is None:
+            await self._run_command(service_name, command)
+            return
+        self.progress.set_state(service_name, BUILDING)
+        status = build_metrics.FAILED
+        try:
+            await self._run_command(service_name, command)
+            status = build_metrics.SUCCESS
+        finally:
+            self.progress.finished(service_name, status)
+
+    async def _run_command(self, service_name: str, command: t.List[str]) -> None:
+        log = service_logger(service_name, self.run_id)
+        log.info(f"Building service: {service_name}")
+        log.info(f"Executing command: {' '.join(command)}")
+        listeners = []
+        if self.progress is not None:
+            listeners.append(functools.partial(self.progress.line, service_name))
+        output = ServiceOutput(
+            service_name,
+            self.log_dir,
+            self.tail_lines,
+            listeners=listeners,
+            echo=self.progress is None or not self.progress.live,
+        )
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_STREAM_LIMIT,
+        )
+        try:
+            returncode = await asyncio.wait_for(
+                self._communicate(process, output), self.build_timeout
+            )
+        except asyncio.TimeoutError:
+            log.error(
+                f"Build of service {service_name} timed out after {self.build_timeout}s"
+            )
+            await self._terminate(process)
+            raise subprocess.TimeoutExpired(command, self.build_timeout)
+        except asyncio.CancelledError:
+            log.warning(f"Build of service {service_name} cancelled")
+            await self._terminate(process)
+            raise
+        finally:
+            output.close()
+            self.backend.cleanup(service_name, self.run_id)
+
+        if returncode != 0:
+            tail = output.tail()
+            error = subprocess.CalledProcessError(
+                returncode, command, output="\n".join(tail)
+            )
+            log.error(f"Failed to build service {service_name}: {error}")
+            if tail:
+                log.error(
+                    f"Last {len(tail)} lines of {service_name}:\n" + "\n".join(tail)
+                )
+            raise error
+        log.info(f"Service {service_name} built successfully.")
+
+    @staticmethod
+    async def _pump(stream: asyncio.StreamReader, output: ServiceOutput) -> None:
+        """Copy ``stream`` to ``output`` line by line; lines longer than the
+        stream limit are written in chunks of that size."""
+        while True:
+            try:
+                line = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                # End of stream, with or without a last unterminated line.
+                line = e.partial
+                if not line:
+                    return
+            except asyncio.LimitOverrunError as e:
+                line = await stream.read(e.consumed)
+            output.write_line(line.rstrip(b"\r\n").decode(errors="replace"))
+
+    async def _communicate(
+        self, process: asyncio.subprocess.Process, output: ServiceOutput
+    ) -> int:
+        await asyncio.gather(
+            self._pump(process.stdout, output), self._pump(process.stderr, output)
+        )
+        return await process.wait()
+
+    @staticmethod
+    async def _terminate(process: asyncio.subprocess.Process) -> None:
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATE_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
@@ -0,0 +1,412 @@
+import abc
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import typing as t
+
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.resources import MemoryPeakSampler, ResourceRequest
+from kaniko.helpers.logger_file import _init_log
+
+logger = _init_log()
+
+CRANE_IMAGE = "gcr.io/go-containerregistry/crane:latest"
+
+# Path of the executor binary inside the kaniko image.
+KANIKO_EXECUTOR = "/kaniko/executor"
+# Path of the warmer binary inside the kaniko warmer image.
+KANIKO_WARMER = "/kaniko/warmer"
+
+# Labels put on every kaniko container so a run can find and stop its builds.
+RUN_LABEL = "kaniko-wrapper.run"
+SERVICE_LABEL = "kaniko-wrapper.service"
+
+# Where a packed build context is mounted inside the kaniko container.
+ARCHIVE_MOUNT = "/workspace/context.tar.gz"
+# Where the directory of digest files is mounted inside the kaniko container.
+DIGESTS_MOUNT = "/digests"
+# Where the directory of the image tarball is mounted inside the kaniko container.
+TARBALL_MOUNT = "/tarball"
+
+
+def container_name(run_id: str, service_name: str) -> str:
+    safe_name = re.sub(r"[^a-zA-Z0-9_.-]", "-", service_name)
+    return f"kaniko-{run_id}-{safe_name}"
+
+
+def digest_files(digest_dir: str, service_name: str) -> t.Tuple[str, str]:
+    """Paths kaniko writes the digest and the image names with digest to."""
+    safe_name = re.sub(r"[^a-zA-Z0-9_.-]", "-", service_name)
+    return (
+        os.path.join(digest_dir, f"{safe_name}.digest"),
+        os.path.join(digest_dir, f"{safe_name}.image"),
+    )
+
+
+def kaniko_flags(
+    image: str,
+    build_args: t.Dict[str, str],
+    push: bool,
+    cache_flags: t.Sequence[str],
+    target: t.Optional[str] = None,
+    destinations: t.Sequence[str] = (),
+    digest_paths: t.Optional[t.Tuple[str, str]] = None,
+    tar_path: t.Optional[str] = None,
+) -> t.List[str]:
+    """Executor flags that follow ``--context`` and ``--dockerfile``.
+
+    ``destinations`` are pushed to in addition to ``image``; ``digest_paths``
+    and ``tar_path`` are the digest file paths and the path the image is saved
+    to before it is pushed, as seen by the executor.
+    """
+    flags = [*(["--target", target] if target else []), *cache_flags, "--cleanup"]
+    if tar_path:
+        flags.append(f"--tar-path={tar_path}")
+    if digest_paths:
+        flags.extend(
+            [
+                f"--digest-file={digest_paths[0]}",
+                f"--image-name-with-digest-file={digest_paths[1]}",
+            ]
+        )
+    if push:
+        for destination in dict.fromkeys([image, *destinations]):
+            flags.extend(["--destination", destination])
+    else:
+        flags.append("--no-push")
+
+    for arg, value in build_args.items():
+        flags.extend(["--build-arg", f"{arg}={value}"])
+    return flags
+
+
+class KanikoCommandBuilder:
+    def __init__(self, kaniko_image: str):
+        self.kaniko_image = kaniko_image
+
+    def build_command(
+        self,
+        context: str,
+        dockerfile: str,
+        image: str,
+        build_args: t.Dict[str, str],
+        push: bool,
+        cache_options: t.Optional[KanikoCacheOptions] = None,
+        resources: t.Optional[ResourceRequest] = None,
+        container_name: t.Optional[str] = None,
+        labels: t.Optional[t.Dict[str, str]] = None,
+        cidfile: t.Optional[str] = None,
+        context_archive: t.Optional[str] = None,
+        target: t.Optional[str] = None,
+        destinations: t.Sequence[str] = (),
+        digest_paths: t.Optional[t.Tuple[str, str]] = None,
+        tar_path: t.Optional[str] = None,
+    ) -> t.List[str]:
+        """Build the ``docker run`` command for one kaniko build.
+
+        The context directory is mounted as ``/workspace`` unless
+        ``context_archive`` points to a packed context, which is mounted alone
+        and passed to kaniko as a ``tar://`` context. The directories of
+        ``digest_paths`` and ``tar_path`` are mounted as ``/digests`` and
+        ``/tarball``.
+        """
+        cache_options = cache_options or KanikoCacheOptions()
+        if context_archive:
+            context_mount = f"{os.path.abspath(context_archive)}:{ARCHIVE_MOUNT}:ro"
+            context_flags = ["--context", f"tar://{ARCHIVE_MOUNT}"]
+            dockerfile_flag = dockerfile
+        else:
+            context_mount = f"{os.path.abspath(context)}:/workspace"
+            context_flags = ["--context", "/workspace"]
+            dockerfile_flag = f"/workspace/{dockerfile}"
+        output_mounts: t.List[str] = []
+        if digest_paths:
+            digest_dir = os.path.abspath(os.path.dirname(digest_paths[0]))
+            output_mounts = ["-v", f"{digest_dir}:{DIGESTS_MOUNT}"]
+            digest_paths = (
+                f"{DIGESTS_MOUNT}/{os.path.basename(digest_paths[0])}",
+                f"{DIGESTS_MOUNT}/{os.path.basename(digest_paths[1])}",
+            )
+        if tar_path:
+            tarball_dir = os.path.abspath(os.path.dirname(tar_path))
+            output_mounts.extend(["-v", f"{tarball_dir}:{TARBALL_MOUNT}"])
+            tar_path = f"{TARBALL_MOUNT}/{os.path.basename(tar_path)}"
+        return [
+            "docker",
+            "run",
+            "--rm",
+            *(["--name", container_name] if container_name else []),
+            *(
+                arg
+                for key, value in (labels or {}).items()
+                for arg in ("--label", f"{key}={value}")
+            ),
+            *(["--cidfile", cidfile] if cidfile else []),
+            *(resources.docker_flags() if resources else []),
+            "-v",
+            context_mount,
+            "-v",
+            f"{os.path.expanduser('~')}/.docker:/kaniko/.docker:ro",
+            *cache_options.docker_mounts(),
+            *output_mounts,
+            self.kaniko_image,
+            *context_flags,
+            "--dockerfile",
+            dockerfile_flag,
+            *kaniko_flags(
+                image,
+                build_args,
+                push,
+                cache_options.to_flags(),
+                target,
+                destinations,
+                digest_paths,
+                tar_path,
+            ),
+        ]
+
+    def _crane_command(self, *args: str, mounts: t.Sequence[str] = ()) -> t.List[str]:
+        return [
+            "docker",
+            "run",
+            "--rm",
+            "-e",
+            "DOCKER_CONFIG=/docker-config",
+            "-v",
+            f"{os.path.expanduser('~')}/.docker:/docker-config:ro",
+            *mounts,
+            CRANE_IMAGE,
+            *args,
+        ]
+
+    def retag_command(self, source: str, destination: str) -> t.List[str]:
+        """Copy an already pushed image to a new reference without rebuilding it."""
+        return self._crane_command("copy", source, destination)
+
+    def push_tarball_command(self, tarball: str, destination: str) -> t.List[str]:
+        """Push an image saved with ``--tar-path`` without rebuilding it."""
+        return self._crane_command(
+            "push",
+            "/image.tar",
+            destination,
+            mounts=["-v", f"{os.path.abspath(tarball)}:/image.tar:ro"],
+        )
+
+
+class BuildRequest(t.NamedTuple):
+    """Everything a backend needs to start the build of one service."""
+
+    service_name: str
+    context: str
+    dockerfile: str
+    image: str
+    build_args: t.Dict[str, str]
+    push: bool
+    cache_options: KanikoCacheOptions
+    resources: t.Optional[ResourceRequest] = None
+    target: t.Optional[str] = None
+    context_archive: t.Optional[str] = None
+    destinations: t.Tuple[str, ...] = ()
+    digest_paths: t.Optional[t.Tuple[str, str]] = None
+    tar_path: t.Optional[str] = None
+
+
+class ExecutorBackend(abc.ABC):
+    """How kaniko builds are started, monitored and stopped.
+
+    ``kaniko_image`` identifies the executor in build fingerprints and
+    ``max_parallel`` caps concurrent builds when the backend cannot isolate
+    them, ``None`` meaning no limit of its own. ``warmer`` is the command of a
+    local kaniko warmer, ``None`` to run the warmer image with Docker.
+    """
+
+    name: str = ""
+    kaniko_image: str = ""
+    max_parallel: t.Optional[int] = None
+    warmer: t.Optional[t.List[str]] = None
+
+    @abc.abstractmethod
+    def build_command(self, request: BuildRequest, run_id: str) -> t.List[str]:
+        """Command that builds ``request``, streaming kaniko's output."""
+
+    @abc.abstractmethod
+    def retag_command(self, source: str, destination: str) -> t.Optional[t.List[str]]:
+        """Command copying a pushed image to a new reference, ``None`` when the
+        backend cannot retag and the service has to be rebuilt."""
+
+    def push_tarball_command(
+        self, tarball: str, destination: str
+    ) -> t.Optional[t.List[str]]:
+        """Command pushing an image saved with ``--tar-path``, ``None`` when the
+        backend cannot and a failed push has to be retried by rebuilding."""
+        return None
+
+    def memory_sampler(
+        self, service_name: str, run_id: str
+    ) -> t.Optional[MemoryPeakSampler]:
+        return None
+
+    def cleanup(self, service_name: str, run_id: str) -> None:
+        """Release what ``build_command`` set up once the build has ended."""
+
+    @abc.abstractmethod
+    def kill_running(
+        self, run_id: str, processes: t.Sequence[subprocess.Popen]
+    ) -> None:
+        """Stop every build of ``run_id``; ``processes`` are their local processes."""
+
+
+class DockerRunBackend(ExecutorBackend):
+    """Run each build in its own ``docker run`` kaniko container."""
+
+    name = "docker"
+
+    def __init__(self, kaniko_image: str):
+        self.kaniko_image = kaniko_image
+        self.commands = KanikoCommandBuilder(kaniko_image)
+
+    @staticmethod
+    def cidfile(service_name: str, run_id: str) -> str:
+        name = container_name(run_id, service_name)
+        return os.path.join(tempfile.gettempdir(), f"{name}.cid")
+
+    def build_command(self, request: BuildRequest, run_id: str) -> t.List[str]:
+        return self.commands.build_command(
+            request.context,
+            request.dockerfile,
+            request.image,
+            request.build_args,
+            request.push,
+            request.cache_options,
+            request.resources,
+            container_name(run_id, request.service_name),
+            {RUN_LABEL: run_id, SERVICE_LABEL: request.service_name},
+            self.cidfile(request.service_name, run_id),
+            request.context_archive,
+            request.target,
+            request.destinations,
+            request.digest_paths,
+            request.tar_path,
+        )
+
+    def retag_command(self, source: str, destination: str) -> t.List[str]:
+        return self.commands.retag_command(source, destination)
+
+    def push_tarball_command(self, tarball: str, destination: str) -> t.List[str]:
+        return self.commands.push_tarball_command(tarball, destination)
+
+    def memory_sampler(self, service_name: str, run_id: str) -> MemoryPeakSampler:
+        return MemoryPeakSampler(self.cidfile(service_name, run_id))
+
+    def cleanup(self, service_name: str, run_id: str) -> None:
+        cidfile = self.cidfile(service_name, run_id)
+        if os.path.exists(cidfile):
+            os.remove(cidfile)
+
+    def kill_running(
+        self, run_id: str, processes: t.Sequence[subprocess.Popen]
+    ) -> None:
+        listed = subprocess.run(
+            ["docker", "ps", "-q", "--filter", f"label={RUN_LABEL}={run_id}"],
+            capture_output=True,
+            text=True,
+        )
+        container_ids = listed.stdout.split()
+        if not container_ids:
+            return
+        logger.warning(f"Killing {len(container_ids)} running kaniko containers.")
+        subprocess.run(["docker", "kill", *container_ids], capture_output=True)
+
+
+class DirectExecutorBackend(ExecutorBackend):
+    """Run the kaniko executor as a child process, without a Docker daemon.
+
+    Meant for runners that already are the kaniko image. Kaniko unpacks base
+    images into the root filesystem it runs in, so builds are run one at a
+    time. ``executor``, ``warmer`` and ``crane`` may be command prefixes, e.g.
+    an interpreter and script; ``crane`` is looked up on ``PATH`` by default.
+    """
+
+    name = "direct"
+    max_parallel = 1
+
+    def __init__(
+        self,
+        executor: t.Union[str, t.Sequence[str]] = KANIKO_EXECUTOR,
+        warmer: t.Union[str, t.Sequence[str]] = KANIKO_WARMER,
+        crane: t.Optional[t.Union[str, t.Sequence[str]]] = None,
+    ):
+        self.executor = [executor] if isinstance(executor, str) else list(executor)
+        self.kaniko_image = " ".join(self.executor)
+        self.warmer = [warmer] if isinstance(warmer, str) else list(warmer)
+        if isinstance(crane, str):
+            crane = [crane]
+        self.crane = list(crane) if crane is not None else None
+
+    def build_command(self, request: BuildRequest, run_id: str) -> t.List[str]:
+        if request.context_archive:
+            context = f"tar://{os.path.abspath(request.context_archive)}"
+            dockerfile = request.dockerfile
+        else:
+            context = os.path.abspath(request.context)
+            dockerfile = os.path.join(context, request.dockerfile)
+        return [
+            *self.executor,
+            "--context",
+            context,
+            "--dockerfile",
+            dockerfile,
+            *kaniko_flags(
+                request.image,
+                request.build_args,
+                request.push,
+                request.cache_options.to_flags(mounted=False),
+                request.target,
+                request.destinations,
+                request.digest_paths,
+                request.tar_path,
+            ),
+        ]
+
+    def _crane(self) -> t.Optional[t.List[str]]:
+        if self.crane is not None:
+            return self.crane
+        crane = shutil.which("crane")
+        return [crane] if crane else None
+
+    def retag_command(self, source: str, destination: str) -> t.Optional[t.List[str]]:
+        crane = self._crane()
+        return [*crane, "copy", source, destination] if crane else None
+
+    def push_tarball_command(
+        self, tarball: str, destination: str
+    ) -> t.Optional[t.List[str]]:
+        crane = self._crane()
+        return (
+            [*crane, "push", os.path.abspath(tarball), destination] if crane else None
+        )
+
+    def kill_running(
+        self, run_id: str, processes: t.Sequence[subprocess.Popen]
+    ) -> None:
+        if processes:
+            logger.warning(f"Killing {len(processes)} running kaniko executors.")
+        for process in processes:
+            process.kill()
+
+
+BACKENDS = ("docker", "direct")
+
+
+def create_backend(
+    name: str, kaniko_image: str, executor: str = KANIKO_EXECUTOR
+) -> ExecutorBackend:
+    if name == "docker":
+        return DockerRunBackend(kaniko_image)
+    if name == "direct":
+        return DirectExecutorBackend(executor)
+    raise ValueError(
+        f"Invalid executor backend '{name}', expected one of: {', '.join(BACKENDS)}"
+    )
@@ -0,0 +1,126 @@
+import os
+import typing as t
+
+SNAPSHOT_MODES = ("full", "redo", "time")
+
+# Mount point of the host --cache-dir inside the kaniko container.
+CONTAINER_CACHE_DIR = "/cache"
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def _as_bool(value: t.Any) -> t.Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE_VALUES
+
+
+class KanikoCacheOptions:
+    """Layer caching and snapshot settings passed to the kaniko executor.
+
+    ``None`` means "not set", so options from the compose file can be layered
+    over the global ones from the command line with :meth:`merged`.
+    """
+
+    FIELDS = (
+        "cache",
+        "cache_repo",
+        "cache_dir",
+        "cache_ttl",
+        "cache_copy_layers",
+        "use_new_run",
+        "snapshot_mode",
+    )
+
+    def __init__(
+        self,
+        cache: t.Optional[bool] = None,
+        cache_repo: t.Optional[str] = None,
+        cache_dir: t.Optional[str] = None,
+        cache_ttl: t.Optional[str] = None,
+        cache_copy_layers: t.Optional[bool] = None,
+        use_new_run: t.Optional[bool] = None,
+        snapshot_mode: t.Optional[str] = None,
+    ):
+        self.cache = _as_bool(cache)
+        self.cache_repo = cache_repo
+        self.cache_dir = cache_dir
+        self.cache_ttl = None if cache_ttl is None else str(cache_ttl)
+        self.cache_copy_layers = _as_bool(cache_copy_layers)
+        self.use_new_run = _as_bool(use_new_run)
+        self.snapshot_mode = snapshot_mode
+        if snapshot_mode is not None and snapshot_mode not in SNAPSHOT_MODES:
+            raise ValueError(
+                f"Invalid snapshot mode '{snapshot_mode}', "
+                f"expected one of: {', '.join(SNAPSHOT_MODES)}"
+            )
+
+    @classmethod
+    def from_extension(cls, extension: t.Dict[str, t.Any]) -> "KanikoCacheOptions":
+        """Read options from ``x-kaniko`` keys, e.g. ``cache-repo`` or ``cache_repo``."""
+        values = {key.replace("-", "_"): value for key, value in extension.items()}
+        return cls(**{field: values.get(field) for field in cls.FIELDS})
+
+    @classmethod
+    def from_cli(cls, opts: t.Dict[str, t.Any]) -> "KanikoCacheOptions":
+        # Absent docopt flags are False; treat them as unset, not as "disabled".
+        return cls(
+            cache=opts.get("--cache") or None,
+            cache_repo=opts.get("--cache-repo"),
+            cache_dir=opts.get("--cache-dir"),
+            cache_ttl=opts.get("--cache-ttl"),
+            cache_copy_layers=opts.get("--cache-copy-layers") or None,
+            use_new_run=opts.get("--use-new-run") or None,
+            snapshot_mode=opts.get("--snapshot-mode"),
+        )
+
+    def merged(
+        self, override: t.Optional["KanikoCacheOptions"]
+    ) -> "KanikoCacheOptions":
+        if override is None:
+            return self
+        values = {}
+        for field in self.FIELDS:
+            value = getattr(override, field)
+            values[field] = getattr(self, field) if value is None else value
+        return KanikoCacheOptions(**values)
+
+    def docker_mounts(self) -> t.List[str]:
+        if not self.cache_dir:
+            return []
+        return ["-v", f"{os.path.abspath(self.cache_dir)}:{CONTAINER_CACHE_DIR}:ro"]
+
+    def to_flags(self, mounted: bool = True) -> t.List[str]:
+        """Executor flags; ``mounted`` refers to ``cache_dir`` by its mount point
+        from :meth:`docker_mounts`, otherwise by its host path."""
+        flags = [
+            f"--snapshot-mode={self.snapshot_mode or 'redo'}",
+            f"--cache={'true' if self.cache else 'false'}",
+        ]
+        if self.cache_repo:
+            flags.append(f"--cache-repo={self.cache_repo}")
+        if self.cache_dir:
+            cache_dir = (
+                CONTAINER_CACHE_DIR if mounted else os.path.abspath(self.cache_dir)
+            )
+            flags.append(f"--cache-dir={cache_dir}")
+        if self.cache_ttl:
+            flags.append(f"--cache-ttl={self.cache_ttl}")
+        if self.cache_copy_layers:
+            flags.append("--cache-copy-layers")
+        if self.use_new_run:
+            flags.append("--use-new-run")
+        return flags
+
+    def __eq__(self, other):
+        if not isinstance(other, KanikoCacheOptions):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{field}={getattr(self, field)!r}"
+            for field in self.FIELDS
+            if getattr(self, field) is not None
+        )
+        return f"KanikoCacheOptions({values})"
@@ -0,0 +1,138 @@
+import os
+import shutil
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from kaniko.commands.build.kaniko.cache_options import CONTAINER_CACHE_DIR
+from kaniko.commands.build.kaniko.output import (
+    DEFAULT_TAIL_LINES,
+    ServiceOutput,
+    run_streaming,
+)
+from kaniko.commands.build.kaniko.scheduler import (
+    BuildGraph,
+    default_parallelism,
+    normalize_image,
+)
+from kaniko.helpers.logger_file import _init_log
+
+logger = _init_log()
+
+WARMER_IMAGE = "gcr.io/kaniko-project/warmer:latest"
+
+# Name the warmer's output is shown and logged under, like a service.
+WARMER_OUTPUT = "warmer"
+
+
+def collect_base_images(graph: BuildGraph) -> t.List[str]:
+    """Return the distinct external base images of all services in the graph.
+
+    Images produced by the build itself and references with unresolved build
+    arguments are left out, since the warmer cannot pull them.
+    """
+    produced = {normalize_image(service.image) for service in graph.services.values()}
+    images: t.Dict[str, str] = {}
+    for bases in graph.base_images.values():
+        for image in bases:
+            key = normalize_image(image)
+            if not image or key in produced or "$" in image:
+                continue
+            images.setdefault(key, image)
+    return list(images.values())
+
+
+class CacheWarmer:
+    """Pre-pull base images into a host directory shared by all kaniko builds.
+
+    The warmer image is run with Docker unless ``warmer`` gives the command of
+    a local warmer, as for the direct backend; warming is skipped when that
+    command is not installed. The warmer's output goes through ``ServiceOutput``
+    like a build's, under the name ``warmer``.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        warmer_image: str = WARMER_IMAGE,
+        max_parallel: t.Optional[int] = None,
+        dry_run: bool = False,
+        warmer: t.Optional[t.Sequence[str]] = None,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        echo: bool = True,
+    ):
+        self.cache_dir = cache_dir
+        self.warmer_image = warmer_image
+        self.max_parallel = max_parallel or default_parallelism()
+        self.dry_run = dry_run
+        self.warmer = list(warmer) if warmer else None
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.echo = echo
+
+    def warm_command(self, image: str) -> t.List[str]:
+        if self.warmer:
+            return [
+                *self.warmer,
+                f"--cache-dir={os.path.abspath(self.cache_dir)}",
+                f"--image={image}",
+            ]
+        return [
+            "docker",
+            "run",
+            "--rm",
+            "-v",
+            f"{os.path.abspath(self.cache_dir)}:{CONTAINER_CACHE_DIR}",
+            "-v",
+            f"{os.path.expanduser('~')}/.docker:/kaniko/.docker:ro",
+            self.warmer_image,
+            f"--cache-dir={CONTAINER_CACHE_DIR}",
+            f"--image={image}",
+        ]
+
+    def _warm_one(self, image: str) -> bool:
+        command = self.warm_command(image)
+        if self.dry_run:
+            logger.info(f"[Dry-Run] Warm cache for {image}: {' '.join(command)}")
+            return True
+        output = ServiceOutput(
+            WARMER_OUTPUT, self.log_dir, self.tail_lines, echo=self.echo
+        )
+        # Builds still pull the image themselves, so failures are not fatal.
+        try:
+            returncode = run_streaming(command, output)
+        except OSError as e:
+            logger.warning(f"Failed to warm cache for {image}: {e}")
+            return False
+        finally:
+            output.close()
+        if returncode != 0:
+            tail = output.tail()
+            logger.warning(
+                f"Failed to warm cache for {image}: exit status {returncode}"
+            )
+            if tail:
+                logger.warning(
+                    f"Last {len(tail)} lines of the warmer:\n" + "\n".join(tail)
+                )
+            return False
+        return True
+
+    def warm(self, images: t.Sequence[str]) -> t.List[str]:
+        """Warm every image in parallel and return the ones that were cached."""
+        if not images:
+            return []
+        if self.warmer and not self.dry_run and shutil.which(self.warmer[0]) is None:
+            logger.warning(
+                f"Kaniko warmer {self.warmer[0]} not found, not warming the cache."
+            )
+            return []
+        if not self.dry_run:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        logger.info(
+            f"Warming base image cache in {self.cache_dir}: {', '.join(images)}"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            results = list(pool.map(self._warm_one, images))
+        return [image for image, warmed in zip(images, results) if warmed]
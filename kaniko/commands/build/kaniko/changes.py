@@ -0,0 +1,88 @@
+import os
+import subprocess
+import typing as t
+
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.helpers.castom_exeption import ChangeDetectionFailed
+from kaniko.helpers.dockerignore import DOCKERIGNORE, DockerIgnore
+from kaniko.helpers.logger_file import _init_log
+
+logger = _init_log()
+
+
+def _git(repo_dir: str, ref: str, *args: str) -> bytes:
+    try:
+        return subprocess.run(
+            ["git", "-C", repo_dir, *args],
+            check=True,
+            capture_output=True,
+        ).stdout
+    except FileNotFoundError as e:
+        raise ChangeDetectionFailed(ref, "git is not installed") from e
+    except subprocess.CalledProcessError as e:
+        reason = e.stderr.decode(errors="replace").strip()
+        raise ChangeDetectionFailed(ref, reason) from e
+
+
+def changed_paths(ref: str, repo_dir: str = ".") -> t.List[str]:
+    """Absolute paths changed since ``ref`` in the local repository.
+
+    Covers commits since the merge base with ``ref`` as well as staged,
+    unstaged and untracked files. Renames are listed under both names.
+    """
+    top = os.fsdecode(_git(repo_dir, ref, "rev-parse", "--show-toplevel").strip())
+    base = os.fsdecode(_git(top, ref, "merge-base", ref, "HEAD").strip())
+    listed = _git(top, ref, "diff", "--name-only", "--no-renames", "-z", base)
+    listed += b"\0" + _git(top, ref, "ls-files", "--others", "--exclude-standard", "-z")
+    paths = {
+        os.path.normpath(os.path.join(top, os.fsdecode(path)))
+        for path in listed.split(b"\0")
+        if path
+    }
+    return sorted(paths)
+
+
+def _is_within(path: str, directory: str) -> bool:
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+class ChangeDetector:
+    """Map changed paths onto the services whose build they can affect."""
+
+    def __init__(self, compose_files: t.Sequence[str] = ()):
+        self.compose_files = {os.path.realpath(path) for path in compose_files}
+
+    def directly_affected(
+        self, graph: BuildGraph, paths: t.Iterable[str]
+    ) -> t.Set[str]:
+        paths = [os.path.realpath(path) for path in paths]
+        if self.compose_files.intersection(paths):
+            logger.info("Compose file changed, every service is affected.")
+            return set(graph.services)
+
+        affected = set()
+        for name, service in graph.services.items():
+            context = os.path.realpath(service.context)
+            dockerfile = os.path.realpath(service.dockerfile_path)
+            inside = [path for path in paths if _is_within(path, context)]
+            if dockerfile in paths or os.path.join(context, DOCKERIGNORE) in inside:
+                affected.add(name)
+                continue
+            ignore = DockerIgnore.from_context(context) if inside else None
+            if any(
+                not ignore.is_excluded(os.path.relpath(path, context))
+                for path in inside
+            ):
+                affected.add(name)
+        return affected
+
+    def affected(self, graph: BuildGraph, paths: t.Iterable[str]) -> t.Set[str]:
+        """Directly affected services plus everything that depends on them."""
+        pending = list(self.directly_affected(graph, paths))
+        affected = set(pending)
+        while pending:
+            for child in graph.dependents[pending.pop()]:
+                if child not in affected:
+                    affected.add(child)
+                    pending.append(child)
+        return affected
@@ -0,0 +1,105 @@
+import os
+import re
+import typing as t
+
+from kaniko.helpers.castom_exeption import UnsetVariable
+
+# Sequences that replace, rather than extend, the value of an earlier file.
+OVERRIDE_KEYS = frozenset({"command", "entrypoint", "test"})
+
+_VARIABLE_RE = re.compile(
+    r"\$(?:(?P<escaped>\$)|(?P<plain>[A-Za-z_][A-Za-z0-9_]*)|"
+    r"\{(?P<braced>[A-Za-z_][A-Za-z0-9_]*)(?:(?P<op>:?[-?])(?P<arg>[^}]*))?\})"
+)
+
+
+def _normalize_service(service: t.Any) -> t.Any:
+    """Turn short forms into mappings so that overlays merge key by key."""
+    if not isinstance(service, dict):
+        return service
+    service = dict(service)
+
+    build = service.get("build")
+    if isinstance(build, str):
+        build = {"context": build}
+    if isinstance(build, dict):
+        build = dict(build)
+        args = build.get("args")
+        if isinstance(args, list):
+            build["args"] = dict(
+                item.split("=", 1) if "=" in item else (item, None) for item in args
+            )
+        service["build"] = build
+
+    depends_on = service.get("depends_on")
+    if isinstance(depends_on, list):
+        service["depends_on"] = {
+            name: {"condition": "service_started"} for name in depends_on
+        }
+    return service
+
+
+def _normalize(document: t.Any) -> t.Dict[str, t.Any]:
+    if not isinstance(document, dict):
+        return {}
+    services = document.get("services")
+    if isinstance(services, dict):
+        document = dict(document)
+        document["services"] = {
+            name: _normalize_service(service) for name, service in services.items()
+        }
+    return document
+
+
+def _merge(base: t.Any, override: t.Any, key: t.Optional[str] = None) -> t.Any:
+    if isinstance(base, dict) and isinstance(override, dict):
+        merged = dict(base)
+        for name, value in override.items():
+            merged[name] = _merge(base[name], value, name) if name in base else value
+        return merged
+    if (
+        isinstance(base, list)
+        and isinstance(override, list)
+        and key not in OVERRIDE_KEYS
+    ):
+        return base + [item for item in override if item not in base]
+    return override
+
+
+def merge_compose_documents(documents: t.Iterable[t.Any]) -> t.Dict[str, t.Any]:
+    """Merge parsed compose files the way ``docker compose -f a -f b`` does.
+
+    Mappings are merged recursively with later files winning, sequences are
+    appended (except ``command``, ``entrypoint`` and healthcheck ``test``) and
+    short forms of ``build``, ``build.args`` and ``depends_on`` are expanded
+    first so that they merge with the long forms.
+    """
+    merged: t.Dict[str, t.Any] = {}
+    for document in documents:
+        merged = _merge(merged, _normalize(document))
+    return merged
+
+
+def interpolate(value: str, environ: t.Optional[t.Mapping[str, str]] = None) -> str:
+    """Substitute ``$VAR``, ``${VAR}``, ``${VAR:-default}`` and ``${VAR:?error}``.
+
+    Follows the compose syntax, including ``$$`` for a literal ``$``, except
+    that unset variables without a default raise ``UnsetVariable`` instead of
+    turning into empty strings.
+    """
+    environ = os.environ if environ is None else environ
+
+    def substitute(match: "re.Match") -> str:
+        if match.group("escaped"):
+            return "$"
+        name = match.group("plain") or match.group("braced")
+        op, arg = match.group("op"), match.group("arg")
+        current = environ.get(name)
+        missing = current is None or (current == "" and op and op.startswith(":"))
+        if not missing:
+            return current
+        if op in ("-", ":-"):
+            return arg
+        raise UnsetVariable(name, value, arg if op in ("?", ":?") else None)
+
+    return _VARIABLE_RE.sub(substitute, value)
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import mmap
+import os
+import stat
+import threading
+import time
+import typing as t
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from kaniko.helpers.dockerignore import DockerIgnore
+from kaniko.helpers.logger_file import _init_log
+from kaniko.settings import CACHE_DIR
+
+logger = _init_log()
+
+# Below this size a plain read is cheaper than setting up a mapping.
+_MMAP_THRESHOLD = 64 * 1024
+
+# Files modified this recently may still change within the same mtime tick,
+# so their digests are not cached (the "racy git" problem).
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _MMAP_THRESHOLD:
+            digest.update(file.read())
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    digest.update(view)
+    return digest.hexdigest()
+
+
+class FileEntry(t.NamedTuple):
+    relpath: str
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    executable: bool
+    link_target: t.Optional[str]
+
+
+class HashStats:
+    def __init__(self):
+        self.files = 0
+        self.hashed_files = 0
+        self.bytes = 0
+        self.hashed_bytes = 0
+        self.elapsed = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.files} files ({self.hashed_files} read, "
+            f"{self.files - self.hashed_files} cached), {self.bytes} bytes "
+            f"in {self.elapsed:.2f}s: {self.files_per_second:.0f} files/s, "
+            f"{self.bytes_per_second / (1024 * 1024):.1f} MiB/s"
+        )
+
+
+class FileDigestCache:
+    """Persistent ``(path, size, mtime_ns, inode) -> digest`` cache."""
+
+    def __init__(self, path: t.Optional[str] = None):
+        self.path = path or os.path.join(CACHE_DIR, "file-digests.json")
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: t.Dict[str, t.List] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as file:
+                    self._entries = json.load(file)
+            except ValueError:
+                logger.warning(f"Ignoring corrupted digest cache: {self.path}")
+
+    def get(self, entry: FileEntry) -> t.Optional[str]:
+        with self._lock:
+            cached = self._entries.get(entry.path)
+        if cached and cached[:3] == [entry.size, entry.mtime_ns, entry.inode]:
+            return cached[3]
+        return None
+
+    def put(self, entry: FileEntry, digest: str) -> None:
+        if time.time_ns() - entry.mtime_ns < _RACY_WINDOW_NS:
+            return
+        with self._lock:
+            self._entries[entry.path] = [
+                entry.size,
+                entry.mtime_ns,
+                entry.inode,
+                digest,
+            ]
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(self._entries, file, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+class ContextHasher:
+    """Hash a build context, reading only files that changed since the last run.
+
+    The tree is walked with ``os.scandir``; files missing from the digest cache
+    are hashed concurrently in a thread pool, or a process pool when
+    ``use_processes`` is set.
+    """
+
+    def __init__(
+        self,
+        cache: t.Optional[FileDigestCache] = None,
+        workers: t.Optional[int] = None,
+        use_processes: bool = False,
+    ):
+        self.cache = cache if cache is not None else FileDigestCache()
+        self.workers = workers
+        self.use_processes = use_processes
+        self.last_stats = HashStats()
+
+    def scan(self, context: str, ignore: DockerIgnore) -> t.List[FileEntry]:
+        entries = []
+        stack = [(os.path.abspath(context), "")]
+        while stack:
+            directory, reldir = stack.pop()
+            with os.scandir(directory) as iterator:
+                for item in iterator:
+                    relpath = f"{reldir}{item.name}"
+                    if item.is_dir(follow_symlinks=False):
+                        if not ignore.can_skip_dir(relpath):
+                            stack.append((item.path, relpath + "/"))
+                        continue
+                    if ignore.is_excluded(relpath):
+                        continue
+                    info = item.stat(follow_symlinks=False)
+                    is_link = stat.S_ISLNK(info.st_mode)
+                    entries.append(
+                        FileEntry(
+                            relpath,
+                            item.path,
+                            info.st_size,
+                            info.st_mtime_ns,
+                            info.st_ino,
+                            bool(info.st_mode & stat.S_IXUSR),
+                            os.readlink(item.path) if is_link else None,
+                        )
+                    )
+        entries.sort(key=lambda entry: entry.relpath)
+        return entries
+
+    def _pool(self) -> Executor:
+        if self.use_processes:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def digest(self, context: str, ignore: t.Optional[DockerIgnore] = None) -> str:
+        """Return a digest over paths, modes and contents of non-ignored files."""
+        started = time.perf_counter()
+        ignore = ignore if ignore is not None else DockerIgnore.from_context(context)
+        entries = self.scan(context, ignore)
+
+        stats = HashStats()
+        digests: t.Dict[str, str] = {}
+        missing = []
+        for entry in entries:
+            stats.files += 1
+            if entry.link_target is not None:
+                digests[entry.relpath] = "link:" + entry.link_target
+                continue
+            stats.bytes += entry.size
+            cached = self.cache.get(entry)
+            if cached is not None:
+                digests[entry.relpath] = cached
+            else:
+                missing.append(entry)
+
+        if missing:
+            with self._pool() as pool:
+                paths = [entry.path for entry in missing]
+                for entry, digest in zip(missing, pool.map(hash_file, paths)):
+                    digests[entry.relpath] = digest
+                    self.cache.put(entry, digest)
+                    stats.hashed_files += 1
+                    stats.hashed_bytes += entry.size
+            self.cache.save()
+
+        tree = hashlib.sha256()
+        for entry in entries:
+            executable = "x" if entry.executable else "-"
+            tree.update(
+                f"{entry.relpath}\0{executable}\0{digests[entry.relpath]}\n".encode()
+            )
+
+        stats.elapsed = time.perf_counter() - started
+        self.last_stats = stats
+        logger.info(f"Hashed context {context}: {stats}")
+        return tree.hexdigest()
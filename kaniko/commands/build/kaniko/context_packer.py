@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import os
+import stat
+import tarfile
+import threading
+import typing as t
+
+from kaniko.commands.build.kaniko.context_hasher import (
+    ContextHasher,
+    FileEntry,
+    hash_file,
+)
+from kaniko.helpers.dockerignore import DOCKERIGNORE, DockerIgnore
+from kaniko.helpers.logger_file import _init_log
+from kaniko.settings import CACHE_DIR
+
+logger = _init_log()
+
+# Bump when the archive layout changes so stale tarballs are not reused.
+ARCHIVE_VERSION = "1"
+# Number of most recently used archives kept in the cache directory.
+MAX_ARCHIVES = 20
+
+
+def _tar_info(name: str, kind: bytes, mode: int) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.type = kind
+    info.mode = mode
+    info.mtime = 0
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+class ContextPacker:
+    """Pack build contexts into filtered, reproducible ``tar.gz`` archives.
+
+    Only files kept by ``.dockerignore`` are archived, plus the Dockerfile and
+    the ``.dockerignore`` itself. Archives are named after a digest of their
+    contents, so services sharing a context reuse the same tarball.
+    """
+
+    def __init__(
+        self,
+        cache_dir: t.Optional[str] = None,
+        hasher: t.Optional[ContextHasher] = None,
+        max_archives: int = MAX_ARCHIVES,
+    ):
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, "contexts")
+        self.hasher = hasher if hasher is not None else ContextHasher()
+        self.max_archives = max_archives
+        self._lock = threading.Lock()
+        self._key_locks: t.Dict[str, threading.Lock] = {}
+
+    def key(
+        self, context: str, dockerfile: str, context_digest: t.Optional[str] = None
+    ) -> str:
+        """Digest of the archive contents.
+
+        Files kept by ``.dockerignore`` are covered by the context digest, so
+        Dockerfiles of the same context only change the key when ignored.
+        """
+        ignore = DockerIgnore.from_context(context)
+        if context_digest is None:
+            context_digest = self.hasher.digest(context, ignore)
+        digest = hashlib.sha256()
+        digest.update(f"v{ARCHIVE_VERSION}\n".encode())
+        digest.update(f"context:{context_digest}\n".encode())
+        for name in (dockerfile, DOCKERIGNORE):
+            path = os.path.join(context, name)
+            if ignore.is_excluded(name.replace(os.sep, "/")) and os.path.isfile(path):
+                digest.update(f"file:{name}:{hash_file(path)}\n".encode())
+        return digest.hexdigest()
+
+    def archive_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.tar.gz")
+
+    def pack(
+        self,
+        context: str,
+        dockerfile: str,
+        dry_run: bool = False,
+        context_digest: t.Optional[str] = None,
+    ) -> str:
+        """Return the archive of ``context``, packing it unless already cached.
+
+        ``dockerfile`` must be relative to and inside the context;
+        ``context_digest`` may be passed when already known.
+        """
+        relpath = os.path.normpath(dockerfile)
+        if os.path.isabs(relpath) or relpath.startswith(os.pardir):
+            raise ValueError(f"Dockerfile {dockerfile} is outside of {context}")
+
+        key = self.key(context, relpath, context_digest)
+        path = self.archive_path(key)
+        if dry_run:
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if os.path.exists(path):
+                os.utime(path)
+                logger.info(f"Reusing packed context {path}")
+                return path
+            self._write(context, relpath, path)
+        self.prune()
+        return path
+
+    def _members(self, context: str, dockerfile: str) -> t.List[tarfile.TarInfo]:
+        entries = {
+            entry.relpath: entry
+            for entry in self.hasher.scan(context, DockerIgnore.from_context(context))
+        }
+        for name in (dockerfile, DOCKERIGNORE):
+            relpath = name.replace(os.sep, "/")
+            path = os.path.join(context, name)
+            if relpath not in entries and os.path.isfile(path):
+                info = os.stat(path)
+                entries[relpath] = FileEntry(
+                    relpath,
+                    path,
+                    info.st_size,
+                    info.st_mtime_ns,
+                    info.st_ino,
+                    bool(info.st_mode & stat.S_IXUSR),
+                    None,
+                )
+
+        directories = set()
+        for relpath in entries:
+            parent = os.path.dirname(relpath)
+            while parent and parent not in directories:
+                directories.add(parent)
+                parent = os.path.dirname(parent)
+
+        members = [_tar_info(name, tarfile.DIRTYPE, 0o755) for name in directories]
+        for relpath, entry in entries.items():
+            if entry.link_target is not None:
+                info = _tar_info(relpath, tarfile.SYMTYPE, 0o777)
+                info.linkname = entry.link_target
+            else:
+                mode = 0o755 if entry.executable else 0o644
+                info = _tar_info(relpath, tarfile.REGTYPE, mode)
+                info.size = entry.size
+            members.append(info)
+        members.sort(key=lambda info: info.name)
+        return members
+
+    def _write(self, context: str, dockerfile: str, path: str) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        members = self._members(context, dockerfile)
+        try:
+            with open(tmp_path, "wb") as raw, gzip.GzipFile(
+                filename="", mode="wb", fileobj=raw, mtime=0
+            ) as compressed, tarfile.open(
+                fileobj=compressed, mode="w", format=tarfile.PAX_FORMAT
+            ) as archive:
+                for info in members:
+                    if info.isreg():
+                        with open(os.path.join(context, info.name), "rb") as file:
+                            archive.addfile(info, file)
+                    else:
+                        archive.addfile(info)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(
+            f"Packed context {context} into {path} "
+            f"({len(members)} entries, {os.path.getsize(path)} bytes)"
+        )
+
+    def prune(self) -> None:
+        """Remove all but the ``max_archives`` most recently used archives."""
+        try:
+            archives = [
+                entry
+                for entry in os.scandir(self.cache_dir)
+                if entry.name.endswith(".tar.gz")
+            ]
+            archives.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in archives[self.max_archives :]:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Cannot prune packed contexts in {self.cache_dir}: {e}")
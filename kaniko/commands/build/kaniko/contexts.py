@@ -0,0 +1,74 @@
+import os
+import threading
+import typing as t
+
+from kaniko.commands.build.kaniko.context_hasher import ContextHasher
+from kaniko.commands.build.kaniko.context_packer import ContextPacker
+from kaniko.commands.build.kaniko.services import ServiceSpec
+from kaniko.helpers.dockerignore import DockerIgnore
+
+
+def group_by_context(services: t.Mapping[str, ServiceSpec]) -> t.Dict[str, t.List[str]]:
+    """Service names keyed by their resolved build context, in compose order."""
+    groups: t.Dict[str, t.List[str]] = {}
+    for name, service in services.items():
+        groups.setdefault(os.path.realpath(service.context), []).append(name)
+    return groups
+
+
+class SharedContexts:
+    """Context-level preparation done once per distinct build context.
+
+    Services are often built from the same context with another Dockerfile or
+    ``target``. The ``.dockerignore`` rules, the context digest and packed
+    archives are computed on first use and shared for the rest of the run;
+    concurrent requests for the same context wait for the first one.
+    """
+
+    def __init__(
+        self,
+        hasher: t.Optional[ContextHasher] = None,
+        packer: t.Optional[ContextPacker] = None,
+    ):
+        self.hasher = hasher if hasher is not None else ContextHasher()
+        self.packer = packer
+        self._lock = threading.Lock()
+        self._context_locks: t.Dict[str, threading.Lock] = {}
+        self._ignores: t.Dict[str, DockerIgnore] = {}
+        self._digests: t.Dict[str, str] = {}
+        self._archives: t.Dict[t.Tuple[str, str], str] = {}
+
+    def _context_lock(self, context: str) -> threading.Lock:
+        with self._lock:
+            return self._context_locks.setdefault(context, threading.Lock())
+
+    def ignore(self, context: str) -> DockerIgnore:
+        context = os.path.realpath(context)
+        with self._context_lock(context):
+            if context not in self._ignores:
+                self._ignores[context] = DockerIgnore.from_context(context)
+            return self._ignores[context]
+
+    def digest(self, context: str) -> str:
+        context = os.path.realpath(context)
+        ignore = self.ignore(context)
+        with self._context_lock(context):
+            if context not in self._digests:
+                self._digests[context] = self.hasher.digest(context, ignore)
+            return self._digests[context]
+
+    def archive(
+        self, context: str, dockerfile: str, dry_run: bool = False
+    ) -> t.Optional[str]:
+        """Packed archive of ``context`` with ``dockerfile``, if packing is on."""
+        if self.packer is None:
+            return None
+        context = os.path.realpath(context)
+        digest = self.digest(context)
+        with self._context_lock(context):
+            key = (context, dockerfile)
+            if key not in self._archives:
+                self._archives[key] = self.packer.pack(
+                    context, dockerfile, dry_run, digest
+                )
+            return self._archives[key]
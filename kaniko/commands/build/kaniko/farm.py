@@ -0,0 +1,451 @@
+import collections
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import typing as t
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from kaniko.commands.build.kaniko.backends import ExecutorBackend
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoExecutor
+from kaniko.commands.build.kaniko.output import DEFAULT_TAIL_LINES, ServiceOutput
+from kaniko.commands.build.kaniko.plan import BuildPlan, PlannedBuild
+from kaniko.helpers.castom_exeption import FailedBuild
+from kaniko.helpers.logger_file import _init_log
+
+logger = _init_log()
+
+DEFAULT_ADDRESS = "tcp://127.0.0.1:7464"
+# How often workers report in, and after how long a silent one is given up on.
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 30.0
+# How long an idle worker waits before asking for work again.
+POLL_INTERVAL = 1.0
+
+# Job outcomes reported by workers.
+SUCCESS = "success"
+FAILED = "failed"
+
+
+def parse_address(address: str) -> t.Tuple[int, t.Any]:
+    """Socket family and address of ``unix:///path`` or ``[tcp://]host:port``."""
+    if address.startswith("unix://"):
+        return socket.AF_UNIX, address[len("unix://") :]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://") :]
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(
+            f"Invalid address '{address}', expected unix:///path or tcp://host:port"
+        )
+    return socket.AF_INET, (host or "0.0.0.0", int(port))
+
+
+def connect(address: str) -> socket.socket:
+    family, target = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(target)
+    return sock
+
+
+class Connection:
+    """Newline-delimited JSON messages over a stream socket.
+
+    Sending is thread-safe; only one thread may receive.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._reader = sock.makefile("rb")
+        self._lock = threading.Lock()
+
+    def send(self, message: t.Dict[str, t.Any]) -> None:
+        data = json.dumps(message).encode() + b"\n"
+        with self._lock:
+            self.sock.sendall(data)
+
+    def receive(self) -> t.Optional[t.Dict[str, t.Any]]:
+        """Next message, ``None`` once the peer has closed the connection."""
+        line = self._reader.readline()
+        if not line:
+            return None
+        return json.loads(line)
+
+    def close(self) -> None:
+        self._reader.close()
+        self.sock.close()
+
+
+class _WorkerState:
+    def __init__(self, name: str):
+        self.name = name
+        self.last_seen = time.monotonic()
+        self.leased: t.List[str] = []
+        self.running: t.Set[str] = set()
+
+
+class Coordinator:
+    """Hand the builds of a plan out to workers that pull them over a socket.
+
+    A build is leased to a worker once its dependencies are built; the worker
+    confirms it is starting it and reports the result. Workers may lease
+    ahead of their free slots: an idle worker steals such a not yet started
+    build when nothing else is ready. The builds of a worker that disconnects
+    or misses heartbeats for ``heartbeat_timeout`` seconds are queued again.
+    Services depending on a failed build are skipped, the others are built.
+    """
+
+    def __init__(
+        self,
+        plan: BuildPlan,
+        push: bool = False,
+        heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+    ):
+        self.plan = plan
+        self.push = push
+        self.heartbeat_timeout = heartbeat_timeout
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.builds = {build.service_name: build for build in plan.builds}
+        self.done: t.List[str] = []
+        self.failures: t.Dict[str, str] = {}
+        self.skipped: t.List[str] = []
+        self._dependents = plan.graph().dependents
+        self._waiting_on = {
+            name: set(build.depends_on) for name, build in self.builds.items()
+        }
+        self._ready = collections.deque(
+            name for name, parents in self._waiting_on.items() if not parents
+        )
+        self._workers: t.Dict[str, _WorkerState] = {}
+        self._outputs: t.Dict[str, t.Tuple[str, ServiceOutput]] = {}
+        self._lock = threading.Lock()
+        self._connections = 0
+        self.finished = threading.Event()
+        if not self.builds:
+            self.finished.set()
+
+    def _settled(self) -> bool:
+        settled = len(self.done) + len(self.failures) + len(self.skipped)
+        return settled == len(self.builds)
+
+    def handle(
+        self, worker_name: str, message: t.Dict[str, t.Any]
+    ) -> t.Optional[t.Dict[str, t.Any]]:
+        """Apply one message of ``worker_name`` and return the reply, if any."""
+        kind = message.get("type")
+        service = message.get("service")
+        if kind == "log":
+            owner, output = self._outputs.get(service, (None, None))
+            if owner == worker_name:
+                output.write_line(message.get("line", ""))
+            return None
+
+        with self._lock:
+            worker = self._workers.get(worker_name)
+            if worker is None:
+                worker = self._workers[worker_name] = _WorkerState(worker_name)
+            worker.last_seen = time.monotonic()
+            if kind == "hello":
+                logger.info(f"Worker {worker_name} connected.")
+                return {
+                    "type": "welcome",
+                    "push": self.push,
+                    "heartbeat": min(HEARTBEAT_INTERVAL, self.heartbeat_timeout / 3),
+                }
+            if kind == "lease":
+                return self._lease(worker)
+            if kind == "start":
+                if service not in worker.leased:
+                    return {"type": "stolen"}
+                worker.leased.remove(service)
+                worker.running.add(service)
+                self._outputs[service] = (
+                    worker_name,
+                    ServiceOutput(service, self.log_dir, self.tail_lines),
+                )
+                logger.info(f"Worker {worker_name} is building {service}.")
+                return {"type": "ok"}
+            if kind == "result" and service in worker.running:
+                worker.running.discard(service)
+                self._close_output(service)
+                self._complete(service, message.get("status"), message.get("error"))
+        return None
+
+    def _lease(self, worker: _WorkerState) -> t.Dict[str, t.Any]:
+        if self._ready:
+            name = max(self._ready, key=lambda name: self.builds[name].priority)
+            self._ready.remove(name)
+        else:
+            victims = [
+                other
+                for other in self._workers.values()
+                if other is not worker and other.leased
+            ]
+            if not victims:
+                return {"type": "finished" if self._settled() else "wait"}
+            victim = max(victims, key=lambda other: len(other.leased))
+            name = victim.leased.pop()
+            logger.info(f"Worker {worker.name} steals {name} from {victim.name}.")
+        worker.leased.append(name)
+        return {"type": "job", "job": self.builds[name].to_dict()}
+
+    def _complete(
+        self, service: str, status: t.Optional[str], error: t.Optional[str]
+    ) -> None:
+        if status == SUCCESS:
+            logger.info(f"Service {service} built successfully.")
+            self.done.append(service)
+            for child in self._dependents[service]:
+                self._waiting_on[child].discard(service)
+                if not self._waiting_on[child]:
+                    self._ready.append(child)
+        else:
+            logger.error(f"Error during build for service {service}: {error}")
+            self.failures[service] = error or "build failed"
+            pending = list(self._dependents[service])
+            while pending:
+                child = pending.pop()
+                if child not in self.skipped:
+                    self.skipped.append(child)
+                    pending.extend(self._dependents[child])
+        if self._settled():
+            self.finished.set()
+
+    def _requeue(self, worker: _WorkerState, reason: str) -> None:
+        orphans = [*worker.running, *worker.leased]
+        del self._workers[worker.name]
+        if orphans:
+            logger.warning(
+                f"Worker {worker.name} {reason}, queueing {', '.join(orphans)} again."
+            )
+        for name in orphans:
+            self._close_output(name)
+            self._ready.appendleft(name)
+
+    def _close_output(self, service: str) -> None:
+        _, output = self._outputs.pop(service, (None, None))
+        if output is not None:
+            output.close()
+
+    def assignments(self) -> t.Dict[str, t.List[str]]:
+        """Services each known worker is building."""
+        with self._lock:
+            return {
+                name: sorted(worker.running) for name, worker in self._workers.items()
+            }
+
+    def disconnect(self, worker_name: str) -> None:
+        with self._lock:
+            worker = self._workers.get(worker_name)
+            if worker is not None:
+                self._requeue(worker, "disconnected")
+
+    def reap(self) -> None:
+        """Queue the builds of workers that stopped sending heartbeats again."""
+        deadline = time.monotonic() - self.heartbeat_timeout
+        with self._lock:
+            for worker in list(self._workers.values()):
+                if worker.last_seen < deadline:
+                    self._requeue(worker, "missed its heartbeats")
+
+    def serve(self, address: str = DEFAULT_ADDRESS) -> None:
+        """Serve workers on ``address`` until every build has ended.
+
+        Raises ``FailedBuild`` when a build failed.
+        """
+        server = _server(address, self)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        logger.info(f"Serving {len(self.builds)} builds on {address}")
+        try:
+            while not self.finished.wait(min(1.0, self.heartbeat_timeout / 3)):
+                self.reap()
+            # Let connected workers hear that the run is over.
+            deadline = time.monotonic() + 2 * POLL_INTERVAL
+            while self._connections and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            server.shutdown()
+            server.server_close()
+            if server.address_family == socket.AF_UNIX:
+                os.remove(server.server_address)
+
+        if self.failures:
+            if self.skipped:
+                logger.error(
+                    f"Skipped services after failure: {', '.join(self.skipped)}"
+                )
+            raise FailedBuild(next(iter(self.failures)), self.failures, self.skipped)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        coordinator: Coordinator = self.server.coordinator
+        connection = Connection(self.request)
+        worker_name = None
+        with coordinator._lock:
+            coordinator._connections += 1
+        try:
+            while True:
+                message = connection.receive()
+                if message is None:
+                    break
+                if message.get("type") == "hello":
+                    worker_name = message.get("worker")
+                if worker_name is None:
+                    continue
+                reply = coordinator.handle(worker_name, message)
+                if reply is not None:
+                    connection.send(reply)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Lost worker {worker_name}: {e}")
+        finally:
+            with coordinator._lock:
+                coordinator._connections -= 1
+            if worker_name is not None:
+                coordinator.disconnect(worker_name)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _server(address: str, coordinator: Coordinator) -> socketserver.BaseServer:
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(target):
+            os.remove(target)
+        server = _UnixServer(target, _Handler)
+    else:
+        server = _TCPServer(target, _Handler)
+    server.coordinator = coordinator
+    return server
+
+
+class Worker:
+    """Pull builds from a ``Coordinator`` and run them with a ``KanikoExecutor``.
+
+    Up to ``slots`` builds run at once and ``prefetch`` more are leased ahead
+    so the next build starts without a round trip. Output lines and results
+    are streamed back to the coordinator.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        backend: ExecutorBackend,
+        name: t.Optional[str] = None,
+        slots: int = 1,
+        prefetch: int = 1,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        if slots < 1 or prefetch < 0:
+            raise ValueError("slots must be positive and prefetch not negative")
+        self.address = address
+        self.backend = backend
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.slots = min(slots, backend.max_parallel or slots)
+        self.prefetch = prefetch
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.poll_interval = poll_interval
+        self.built: t.List[str] = []
+        self.failed: t.List[str] = []
+
+    def _request(
+        self, connection: Connection, message: t.Dict[str, t.Any]
+    ) -> t.Dict[str, t.Any]:
+        connection.send(message)
+        reply = connection.receive()
+        if reply is None:
+            raise ConnectionError("The coordinator closed the connection")
+        return reply
+
+    def _build(
+        self, executor: KanikoExecutor, connection: Connection, build: PlannedBuild
+    ) -> None:
+        try:
+            executor.run_planned(build)
+        except Exception as e:
+            self.failed.append(build.service_name)
+            result = {"status": FAILED, "error": str(e)}
+        else:
+            self.built.append(build.service_name)
+            result = {"status": SUCCESS}
+        connection.send({"type": "result", "service": build.service_name, **result})
+
+    def run(self) -> None:
+        """Build leased jobs until the coordinator reports the run finished."""
+        connection = Connection(connect(self.address))
+        try:
+            welcome = self._request(
+                connection, {"type": "hello", "worker": self.name, "slots": self.slots}
+            )
+            executor = KanikoExecutor(
+                self.backend.kaniko_image,
+                welcome["push"],
+                False,
+                log_dir=self.log_dir,
+                tail_lines=self.tail_lines,
+                backend=self.backend,
+                on_line=lambda service, line: connection.send(
+                    {"type": "log", "service": service, "line": line}
+                ),
+            )
+            self._work(connection, executor, welcome["heartbeat"])
+        finally:
+            connection.close()
+
+    def _work(
+        self, connection: Connection, executor: KanikoExecutor, heartbeat: float
+    ) -> None:
+        backlog: t.Deque[PlannedBuild] = collections.deque()
+        running: t.Dict[Future, str] = {}
+        finished = False
+        last_heartbeat = time.monotonic()
+        tick = min(self.poll_interval, heartbeat)
+        with ThreadPoolExecutor(max_workers=self.slots) as pool:
+            while True:
+                while not finished and len(backlog) + len(running) < (
+                    self.slots + self.prefetch
+                ):
+                    reply = self._request(connection, {"type": "lease"})
+                    if reply["type"] == "job":
+                        backlog.append(PlannedBuild.from_dict(reply["job"]))
+                        continue
+                    finished = reply["type"] == "finished"
+                    break
+
+                while backlog and len(running) < self.slots:
+                    build = backlog.popleft()
+                    reply = self._request(
+                        connection, {"type": "start", "service": build.service_name}
+                    )
+                    if reply["type"] == "ok":
+                        future = pool.submit(self._build, executor, connection, build)
+                        running[future] = build.service_name
+
+                if finished and not running and not backlog:
+                    return
+                if running:
+                    done, _ = wait(running, tick, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        running.pop(future)
+                        future.result()
+                else:
+                    time.sleep(tick)
+                if time.monotonic() - last_heartbeat >= heartbeat:
+                    connection.send({"type": "heartbeat"})
+                    last_heartbeat = time.monotonic()
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import typing as t
+
+from kaniko.commands.build.kaniko.context_hasher import ContextHasher, hash_file
+from kaniko.helpers.logger_file import _init_log
+from kaniko.settings import CACHE_DIR
+
+logger = _init_log()
+
+# Bump when the fingerprint layout changes so old index entries stop matching.
+FINGERPRINT_VERSION = "3"
+
+
+class ContextFingerprinter:
+    """Compute a content address for everything that determines a built image.
+
+    A service built on top of other services is only unchanged when they are,
+    so the fingerprints of its ``parents`` are part of its own.
+    """
+
+    def __init__(self, hasher: t.Optional[ContextHasher] = None):
+        self.hasher = hasher if hasher is not None else ContextHasher()
+
+    def fingerprint(
+        self,
+        context: str,
+        dockerfile: str,
+        build_args: t.Dict[str, str],
+        kaniko_image: str,
+        target: t.Optional[str] = None,
+        context_digest: t.Optional[str] = None,
+        parents: t.Sequence[str] = (),
+    ) -> str:
+        dockerfile_path = os.path.join(context, dockerfile)
+        digest = hashlib.sha256()
+        digest.update(f"v{FINGERPRINT_VERSION}\n".encode())
+        digest.update(f"kaniko-image:{kaniko_image}\n".encode())
+        digest.update(
+            f"dockerfile:{dockerfile}:{hash_file(dockerfile_path)}\n".encode()
+        )
+        digest.update(f"target:{target or ''}\n".encode())
+        for key, value in sorted(build_args.items()):
+            digest.update(f"arg:{key}={value}\n".encode())
+        if context_digest is None:
+            context_digest = self.hasher.digest(context)
+        digest.update(f"context:{context_digest}\n".encode())
+        for parent in parents:
+            digest.update(f"parent:{parent}\n".encode())
+        return digest.hexdigest()
+
+
+class BuildIndex:
+    """On-disk mapping from build fingerprints to the images pushed for them.
+
+    An entry lists every image reference pushed for the fingerprint; a
+    reference recorded for another fingerprint is dropped from the older
+    entries, since the tag no longer points to their image.
+    """
+
+    def __init__(self, path: t.Optional[str] = None):
+        self.path = path or os.path.join(CACHE_DIR, "build-index.json")
+        self._lock = threading.Lock()
+        self._entries: t.Dict[str, t.Dict[str, t.Any]] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as file:
+                    self._entries = json.load(file)
+            except ValueError:
+                logger.warning(f"Ignoring corrupted build index: {self.path}")
+
+    def lookup(self, fingerprint: str) -> t.Optional[t.Dict[str, t.Any]]:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None or "images" in entry:
+                return entry
+            # Written before every reference was recorded.
+            return dict(entry, images=[entry["image"]])
+
+    def record(
+        self,
+        fingerprint: str,
+        service_name: str,
+        images: t.Sequence[str],
+        digest: t.Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                if "images" in entry:
+                    entry["images"] = [i for i in entry["images"] if i not in images]
+                elif entry.get("image") in images:
+                    entry["images"] = []
+            self._entries[fingerprint] = {
+                "service": service_name,
+                "images": list(images),
+                "digest": digest,
+                "built_at": time.time(),
+            }
+            self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self._entries, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
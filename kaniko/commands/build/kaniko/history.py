@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import statistics
+import typing as t
+
+from kaniko.settings import CACHE_DIR
+
+# Number of recent successful builds a duration estimate is based on.
+HISTORY_WINDOW = 20
+# Number of recent successful builds the percentiles of ``kaniko stats`` cover.
+STATS_WINDOW = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    service TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    exit_code INTEGER,
+    peak_memory INTEGER,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS builds_by_service ON builds (service, started_at);
+"""
+
+
+class BuildRecord(t.NamedTuple):
+    service: str
+    started_at: float
+    duration: float
+    success: bool
+    exit_code: t.Optional[int] = None
+    peak_memory: t.Optional[int] = None
+    fingerprint: t.Optional[str] = None
+
+
+class ServiceStats(t.NamedTuple):
+    service: str
+    builds: int
+    failures: int
+    p50: t.Optional[float]
+    p95: t.Optional[float]
+    peak_memory: t.Optional[int]
+    last_build: t.Optional[float]
+
+
+def percentile(values: t.Sequence[float], q: float) -> t.Optional[float]:
+    """Nearest-rank percentile, ``q`` in ``[0, 100]``."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class BuildHistory:
+    """SQLite record of past builds, kept under the wrapper cache dir."""
+
+    def __init__(self, path: t.Optional[str] = None):
+        self.path = path or os.path.join(CACHE_DIR, "history.sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def record(self, records: t.Iterable[BuildRecord]) -> None:
+        rows = [tuple(record) for record in records]
+        if not rows:
+            return
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO builds (service, started_at, duration, success,"
+                    " exit_code, peak_memory, fingerprint)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        finally:
+            connection.close()
+
+    def durations(
+        self, services: t.Iterable[str], window: int = HISTORY_WINDOW
+    ) -> t.Dict[str, t.List[float]]:
+        """Durations of the latest successful builds of each service."""
+        connection = self._connect()
+        try:
+            durations = {}
+            for service in services:
+                rows = connection.execute(
+                    "SELECT duration FROM builds WHERE service = ? AND success"
+                    " ORDER BY started_at DESC LIMIT ?",
+                    (service, window),
+                ).fetchall()
+                if rows:
+                    durations[service] = [row[0] for row in rows]
+            return durations
+        finally:
+            connection.close()
+
+    def expected_durations(self, services: t.Iterable[str]) -> t.Dict[str, float]:
+        """Median recent duration per service; services without history get
+        the mean of the others, or are left out when nothing is known."""
+        services = list(services)
+        expected = {
+            service: statistics.median(values)
+            for service, values in self.durations(services).items()
+        }
+        if expected:
+            fallback = statistics.mean(expected.values())
+            for service in services:
+                expected.setdefault(service, fallback)
+        return expected
+
+    def stats(self, services: t.Sequence[str] = ()) -> t.List[ServiceStats]:
+        connection = self._connect()
+        try:
+            query = (
+                "SELECT service, duration, success, peak_memory, started_at FROM builds"
+            )
+            params: t.Tuple = ()
+            if services:
+                query += f" WHERE service IN ({', '.join('?' for _ in services)})"
+                params = tuple(services)
+            rows = connection.execute(query + " ORDER BY started_at", params).fetchall()
+        finally:
+            connection.close()
+
+        grouped: t.Dict[str, t.List[t.Tuple]] = {}
+        for row in rows:
+            grouped.setdefault(row[0], []).append(row)
+
+        result = []
+        for service in sorted(grouped):
+            builds = grouped[service]
+            succeeded = [row[1] for row in builds if row[2]][-STATS_WINDOW:]
+            peaks = [row[3] for row in builds if row[3] is not None]
+            result.append(
+                ServiceStats(
+                    service=service,
+                    builds=len(builds),
+                    failures=sum(1 for row in builds if not row[2]),
+                    p50=percentile(succeeded, 50),
+                    p95=percentile(succeeded, 95),
+                    peak_memory=max(peaks) if peaks else None,
+                    last_build=builds[-1][4],
+                )
+            )
+        return result
@@ -1,75 +1,573 @@
+import functools
+import logging
 import os
+import re
+import shutil
+import tempfile
+import uuid
 import yaml
+import sqlite3
 import subprocess
+import threading
+import time
 import typing as t
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from kaniko.helpers.logger_file import _init_log
+from kaniko.commands.build.kaniko import metrics as build_metrics
+from kaniko.commands.build.kaniko.backends import (
+    BuildRequest,
+    DockerRunBackend,
+    ExecutorBackend,
+    KanikoCommandBuilder,
+    container_name,
+    digest_files,
+)
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.cache_warmer import (
+    WARMER_IMAGE,
+    CacheWarmer,
+    collect_base_images,
+)
+from kaniko.commands.build.kaniko.context_packer import ContextPacker
+from kaniko.commands.build.kaniko.contexts import SharedContexts, group_by_context
+from kaniko.commands.build.kaniko.fingerprint import BuildIndex, ContextFingerprinter
+from kaniko.commands.build.kaniko.output import (
+    DEFAULT_TAIL_LINES,
+    ServiceOutput,
+    run_streaming,
+)
+from kaniko.commands.build.kaniko.history import BuildHistory, BuildRecord
+from kaniko.commands.build.kaniko.plan import BuildPlan, PlannedBuild, create_plan
+from kaniko.commands.build.kaniko.progress import (
+    BUILDING,
+    QUEUED,
+    WAITING,
+    WARMING,
+    BuildProgress,
+)
+from kaniko.commands.build.kaniko.resources import ResourcePool, ResourceRequest
+from kaniko.commands.build.kaniko.retry import (
+    TRANSIENT_PUSH,
+    FailureClassifier,
+    RetryPolicy,
+)
+from kaniko.commands.build.kaniko.scheduler import (
+    STOP,
+    BuildGraph,
+    DagScheduler,
+    dockerfile_steps,
+)
+from kaniko.commands.build.kaniko.changes import ChangeDetector, changed_paths
+from kaniko.commands.build.kaniko.compose import merge_compose_documents
+from kaniko.commands.build.kaniko.services import (
+    ComposeCache,
+    ServiceSpec,
+    active_services,
+    image_repository,
+)
+from kaniko.helpers.castom_exeption import InvalidComposeFile, UnknownProfile
+from kaniko.helpers.logger_file import _init_log, service_logger
+from kaniko.settings import CACHE_DIR
 
 logger = _init_log()
 
+_DIGEST_REFERENCE_RE = re.compile(r"@(sha256:[0-9a-f]{64})\s*$")
+
+
+def _pushed_digest(lines: t.Sequence[str]) -> t.Optional[str]:
+    """Digest of the ``<image>@sha256:...`` reference ``crane push`` prints."""
+    for line in reversed(lines):
+        match = _DIGEST_REFERENCE_RE.search(line)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _image_with_digest(image: str, digest: t.Optional[str]) -> str:
+    if not digest:
+        return image
+    return f"{image_repository(image)}@{digest}"
+
 
 class DockerComposeLoader:
+    """Load the services of one or more compose files as ``ServiceSpec`` objects.
 
-    def __init__(self, compose_file: str):
-        self.compose_file = compose_file
+    Several files are merged in order, like ``docker compose -f a -f b`` does.
+    Parsed specs are cached by the hash of the file contents, so unchanged files
+    are neither parsed nor validated again; ``use_cache=False`` always parses.
+    """
 
-    def load(self) -> t.Dict[str, t.Dict]:
-        if not os.path.exists(self.compose_file):
-            logger.error(f"Compose file not found: {self.compose_file}")
-            raise FileNotFoundError(f"Compose file not found: {self.compose_file}")
+    def __init__(
+        self,
+        compose_files: t.Union[str, t.Sequence[str]],
+        cache: t.Optional[ComposeCache] = None,
+        use_cache: bool = True,
+    ):
+        if isinstance(compose_files, str):
+            compose_files = [compose_files]
+        self.compose_files = list(compose_files)
+        self.compose_file = ", ".join(self.compose_files)
+        self.cache = (cache or ComposeCache()) if use_cache else None
 
+    def load(self) -> t.Dict[str, ServiceSpec]:
+        sources = []
+        for compose_file in self.compose_files:
+            if not os.path.exists(compose_file):
+                logger.error(f"Compose file not found: {compose_file}")
+                raise FileNotFoundError(f"Compose file not found: {compose_file}")
+            with open(compose_file, "rb") as file:
+                sources.append(file.read())
         logger.info(f"Loading compose file: {self.compose_file}")
-        with open(self.compose_file, "r") as file:
-            data = yaml.safe_load(file)
-            return data.get("services", {})
 
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(sources)
+            specs = self.cache.get(key)
+            if specs is not None:
+                return specs
+
+        specs = self.parse(sources)
+        if self.cache is not None:
+            self.cache.put(key, specs)
+        return specs
+
+    def parse(self, sources: t.Sequence[bytes]) -> t.Dict[str, ServiceSpec]:
+        """Parse with libyaml when available, merge, and validate in one pass."""
+        from pydantic.v1 import ValidationError
 
-class KanikoCommandBuilder:
-    def __init__(self, kaniko_image: str):
+        from kaniko.models.model_wrapper import DockerComposeFile
+
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        data = merge_compose_documents(
+            yaml.load(source, Loader=loader) for source in sources
+        )
+        try:
+            compose = DockerComposeFile.parse_obj(data)
+        except ValidationError as e:
+            raise InvalidComposeFile(self.compose_file, e) from e
+        return {
+            name: ServiceSpec.from_dict(
+                name, service.dict(by_alias=True, exclude_none=True)
+            )
+            for name, service in compose.services.items()
+        }
+
+
+def load_build_graph(
+    compose_files: t.Union[str, t.Sequence[str]],
+    profiles: t.Sequence[str] = (),
+    services: t.Sequence[str] = (),
+    with_dependencies: bool = False,
+    changed_since: t.Optional[str] = None,
+) -> BuildGraph:
+    """Return the graph of the services to build.
+
+    Explicitly named ``services`` are built regardless of profiles, together with
+    the services they depend on when ``with_dependencies`` is set. Without names,
+    every service enabled by ``profiles`` is built. With ``changed_since``, only
+    services affected by changes since that git ref are kept.
+    """
+    loader = DockerComposeLoader(compose_files)
+    specs = loader.load()
+    declared = {profile for spec in specs.values() for profile in spec.profiles}
+    unknown = [p for p in profiles if p != "*" and p not in declared]
+    if unknown:
+        raise UnknownProfile(unknown, sorted(declared))
+    if services:
+        graph = BuildGraph.from_services(
+            specs, targets=services, with_dependencies=with_dependencies
+        )
+    else:
+        graph = BuildGraph.from_services(active_services(specs, profiles))
+
+    if changed_since is not None:
+        detector = ChangeDetector(loader.compose_files)
+        affected = detector.affected(graph, changed_paths(changed_since))
+        logger.info(
+            f"{len(affected)} of {len(graph.services)} services changed since "
+            f"{changed_since}: {', '.join(sorted(affected)) or 'none'}"
+        )
+        graph = graph.subgraph(affected)
+    return graph
+
+
+class KanikoExecutor:
+
+    def __init__(
+        self,
+        kaniko_image: str,
+        push: bool,
+        dry_run: bool,
+        build_index: t.Optional[BuildIndex] = None,
+        cache_options: t.Optional[KanikoCacheOptions] = None,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        metrics: t.Optional[build_metrics.BuildMetrics] = None,
+        context_packer: t.Optional[ContextPacker] = None,
+        backend: t.Optional[ExecutorBackend] = None,
+        retry_policy: t.Optional[RetryPolicy] = None,
+        digest_dir: t.Optional[str] = None,
+        contexts: t.Optional[SharedContexts] = None,
+        on_line: t.Optional[t.Callable[[str, str], None]] = None,
+        echo: bool = True,
+    ):
         self.kaniko_image = kaniko_image
+        self.push = push
+        self.dry_run = dry_run
+        self.build_index = build_index
+        self.cache_options = cache_options or KanikoCacheOptions()
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.metrics = metrics
+        self.contexts = contexts or SharedContexts(packer=context_packer)
+        self.backend = backend or DockerRunBackend(kaniko_image)
+        self.fingerprinter = ContextFingerprinter(self.contexts.hasher)
+        self.run_id = uuid.uuid4().hex[:12]
+        self._processes: t.Dict[str, subprocess.Popen] = {}
+        self._processes_lock = threading.Lock()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.digest_dir = digest_dir
+        self._aborted = threading.Event()
+        self.on_line = on_line
+        self.echo = echo
+
+    def container_name(self, service_name: str) -> str:
+        return container_name(self.run_id, service_name)
 
-    def build_command(
+    def service_log(self, service_name: str) -> logging.LoggerAdapter:
+        """Logger whose records carry the service and the id of this run."""
+        return service_logger(service_name, self.run_id)
+
+    def kill_running(self) -> None:
+        """Kill every kaniko build started by this executor."""
+        if self.dry_run:
+            return
+        self._aborted.set()
+        with self._processes_lock:
+            processes = list(self._processes.values())
+        self.backend.kill_running(self.run_id, processes)
+
+    def _track(self, service_name: str, process: subprocess.Popen) -> None:
+        with self._processes_lock:
+            self._processes[service_name] = process
+
+    def fingerprint(
         self,
+        service_name: str,
         context: str,
         dockerfile: str,
-        image: str,
         build_args: t.Dict[str, str],
-        push: bool,
-    ) -> t.List[str]:
-        command = [
-            "docker",
-            "run",
-            "--rm",
-            "-v",
-            f"{os.path.abspath(context)}:/workspace",
-            "-v",
-            f"{os.path.expanduser('~')}/.docker:/kaniko/.docker:ro",
-            self.kaniko_image,
-            "--context",
-            "/workspace",
-            "--dockerfile",
-            f"/workspace/{dockerfile}",
-            "--snapshot-mode=redo",
-            "--cache=false",
-            "--cleanup",
-        ]
-        if push:
-            command.extend(["--destination", image])
+        target: t.Optional[str] = None,
+        parents: t.Sequence[str] = (),
+    ) -> t.Optional[str]:
+        try:
+            return self.fingerprinter.fingerprint(
+                context,
+                dockerfile,
+                build_args,
+                self.backend.kaniko_image,
+                target,
+                self.contexts.digest(context),
+                parents,
+            )
+        except OSError as e:
+            self.service_log(service_name).warning(
+                f"Cannot fingerprint service {service_name}: {e}"
+            )
+            return None
+
+    def _pack_context(
+        self, service_name: str, context: str, dockerfile: str
+    ) -> t.Optional[str]:
+        try:
+            return self.contexts.archive(context, dockerfile, self.dry_run)
+        except (OSError, ValueError) as e:
+            self.service_log(service_name).warning(
+                f"Cannot pack context of service {service_name}, mounting it: {e}"
+            )
+            return None
+
+    def _reuse_previous_build(
+        self, service_name: str, fingerprint: str, images: t.Sequence[str]
+    ) -> bool:
+        """Skip or retag an unchanged service; ``images`` are all its destinations."""
+        entry = self.build_index.lookup(fingerprint)
+        if entry is None:
+            return False
+
+        known = entry["images"]
+        missing = [image for image in images if image not in known]
+        if not missing:
+            self.service_log(service_name).info(
+                f"Service {service_name} is unchanged, skipping build."
+            )
+            self._write_digest_files(service_name, images, entry.get("digest"))
+            return True
+
+        if not known:
+            # Every tag of the image now points to a later build.
+            return False
+        source = _image_with_digest(known[0], entry.get("digest"))
+        commands = [self.backend.retag_command(source, image) for image in missing]
+        if any(command is None for command in commands):
+            self.service_log(service_name).info(
+                f"Service {service_name} is unchanged but the {self.backend.name} "
+                "backend cannot retag images, rebuilding."
+            )
+            return False
+        if self.dry_run:
+            for command in commands:
+                self.service_log(service_name).info(
+                    f"[Dry-Run] Retag command for service {service_name}: "
+                    f"{' '.join(command)}"
+                )
+            return True
+
+        try:
+            self.service_log(service_name).info(
+                f"Service {service_name} is unchanged, retagging {source}."
+            )
+            for command in commands:
+                subprocess.run(command, check=True)
+        except subprocess.CalledProcessError as e:
+            self.service_log(service_name).warning(
+                f"Retag failed for service {service_name}, rebuilding: {e}"
+            )
+            return False
+
+        self.build_index.record(
+            fingerprint, service_name, known + missing, entry.get("digest")
+        )
+        self._write_digest_files(service_name, images, entry.get("digest"))
+        return True
+
+    def _write_digest_files(
+        self, service_name: str, images: t.Sequence[str], digest: t.Optional[str]
+    ) -> None:
+        """Write the files kaniko would have written for a build it did not run."""
+        if not self.digest_dir or not digest or self.dry_run:
+            return
+        digest_path, image_path = digest_files(self.digest_dir, service_name)
+        references = dict.fromkeys(
+            _image_with_digest(image, digest) for image in images
+        )
+        try:
+            os.makedirs(self.digest_dir, exist_ok=True)
+            with open(digest_path, "w") as file:
+                file.write(digest)
+            with open(image_path, "w") as file:
+                file.write("\n".join(references))
+        except OSError as e:
+            self.service_log(service_name).warning(
+                f"Cannot write digest files of {service_name}: {e}"
+            )
+
+    def _digest_paths(self, service_name: str) -> t.Optional[t.Tuple[str, str]]:
+        if not self.digest_dir:
+            return None
+        if not self.dry_run:
+            os.makedirs(self.digest_dir, exist_ok=True)
+        return digest_files(self.digest_dir, service_name)
+
+    def _build_request(
+        self,
+        service_name: str,
+        context: str,
+        dockerfile: str,
+        images: t.Sequence[str],
+        build_args: t.Dict[str, str],
+        cache_options: t.Optional[KanikoCacheOptions],
+        resources: t.Optional[ResourceRequest],
+        target: t.Optional[str],
+    ) -> BuildRequest:
+        return BuildRequest(
+            service_name,
+            context,
+            dockerfile,
+            images[0],
+            build_args,
+            self.push,
+            self.cache_options.merged(cache_options),
+            resources,
+            target,
+            self._pack_context(service_name, context, dockerfile),
+            tuple(images[1:]),
+            self._digest_paths(service_name),
+        )
+
+    def command(self, build: PlannedBuild) -> t.List[str]:
+        """Command that would build ``build``, packing its context if enabled."""
+        request = self._build_request(
+            build.service_name,
+            build.context,
+            build.dockerfile,
+            build.images,
+            dict(build.build_args),
+            build.cache_options,
+            build.resources,
+            build.target,
+        )
+        return self.backend.build_command(request, self.run_id)
+
+    def run_planned(self, build: PlannedBuild) -> None:
+        self.run_build(
+            build.service_name,
+            build.context,
+            build.dockerfile,
+            build.image,
+            dict(build.build_args),
+            build.cache_options,
+            build.resources,
+            build.target,
+            build.retry_policy,
+            build.destinations,
+            build.fingerprint,
+            # Without the fingerprints of its parents, a dependent service
+            # cannot tell whether it is unchanged.
+            reuse=build.fingerprint is not None or not build.depends_on,
+        )
+
+    def _run_attempt(
+        self,
+        service_name: str,
+        command: t.List[str],
+        service_metrics: build_metrics.ServiceMetrics,
+        classifier: FailureClassifier,
+        repushing: bool = False,
+    ) -> t.Tuple[int, ServiceOutput]:
+        log = self.service_log(service_name)
+        if repushing:
+            log.info(f"Pushing the saved image of service: {service_name}")
         else:
-            command.append("--no-push")
+            log.info(f"Building service: {service_name}")
+        log.info(f"Executing command: {' '.join(command)}")
+        listeners = [service_metrics.observe_line, classifier.observe_line]
+        if self.on_line is not None:
+            listeners.append(functools.partial(self.on_line, service_name))
+        output = ServiceOutput(
+            service_name,
+            self.log_dir,
+            self.tail_lines,
+            listeners=listeners,
+            echo=self.echo,
+        )
+        sampler = self.backend.memory_sampler(service_name, self.run_id)
+        if sampler is not None:
+            sampler.start()
+        try:
+            returncode = run_streaming(
+                command,
+                output,
+                on_start=lambda process: self._track(service_name, process),
+            )
+        except BaseException:
+            service_metrics.finish(build_metrics.FAILED)
+            raise
+        finally:
+            output.close()
+            with self._processes_lock:
+                self._processes.pop(service_name, None)
+            if sampler is not None:
+                peak = sampler.stop()
+                if peak is not None:
+                    service_metrics.peak_memory = max(
+                        peak, service_metrics.peak_memory or 0
+                    )
+            self.backend.cleanup(service_name, self.run_id)
+        return returncode, output
 
-        for arg, value in build_args.items():
-            command.extend(["--build-arg", f"{arg}={value}"])
+    def _repush_commands(
+        self, tarball: str, images: t.Sequence[str]
+    ) -> t.Optional[t.List[t.List[str]]]:
+        commands = [self.backend.push_tarball_command(tarball, i) for i in images]
+        if any(command is None for command in commands):
+            return None
+        return t.cast(t.List[t.List[str]], commands)
 
-        return command
+    def _tar_path(self, service_name: str, images: t.Sequence[str]) -> t.Optional[str]:
+        """Where kaniko saves the image so a failed push is retried without
+        rebuilding, ``None`` when the backend cannot push a saved image."""
+        tar_path = os.path.join(
+            tempfile.mkdtemp(prefix=f"{self.container_name(service_name)}-"),
+            "image.tar",
+        )
+        if self._repush_commands(tar_path, images) is None:
+            os.rmdir(os.path.dirname(tar_path))
+            return None
+        return tar_path
 
+    def _run_with_retries(
+        self,
+        service_name: str,
+        command: t.List[str],
+        images: t.Sequence[str],
+        policy: RetryPolicy,
+        tar_path: t.Optional[str],
+        service_metrics: build_metrics.ServiceMetrics,
+    ) -> None:
+        """Run ``command`` until it succeeds or fails for good.
 
-class KanikoExecutor:
+        Once kaniko has built the image and saved it to ``tar_path``, a push
+        that failed is retried by pushing the saved image again.
+        """
+        commands = [command]
+        repushing = False
+        attempt = 1
+        while True:
+            classifier = FailureClassifier(kaniko=not repushing)
+            for command in commands:
+                returncode, output = self._run_attempt(
+                    service_name, command, service_metrics, classifier, repushing
+                )
+                if returncode != 0:
+                    break
+            if returncode == 0:
+                break
+            failure = classifier.kind
+            if failure is None or attempt > policy.retries or self._aborted.is_set():
+                self._fail(service_name, returncode, command, output, service_metrics)
 
-    def __init__(self, kaniko_image: str, push: bool, dry_run: bool):
-        self.kaniko_image = kaniko_image
-        self.push = push
-        self.dry_run = dry_run
+            delay = policy.delay(attempt)
+            self.service_log(service_name).warning(
+                f"Build of service {service_name} hit a {failure} failure, "
+                f"retry {attempt}/{policy.retries} in {delay:.1f}s"
+            )
+            if self._aborted.wait(delay):
+                # kill_running() has already run, nothing would stop a new attempt.
+                self._fail(service_name, returncode, command, output, service_metrics)
+            if failure == TRANSIENT_PUSH and tar_path and os.path.exists(tar_path):
+                # The image was built and saved; push it instead of rebuilding.
+                commands = self._repush_commands(tar_path, images) or commands
+                repushing = True
+            service_metrics.retry()
+            attempt += 1
+
+        if repushing:
+            digest = _pushed_digest(output.tail())
+            if digest is not None:
+                service_metrics.digest = digest
+                self._write_digest_files(service_name, images, digest)
+
+    def _fail(
+        self,
+        service_name: str,
+        returncode: int,
+        command: t.List[str],
+        output: ServiceOutput,
+        service_metrics: build_metrics.ServiceMetrics,
+    ) -> t.NoReturn:
+        """Record the failed build of ``service_name`` and raise its error."""
+        service_metrics.finish(build_metrics.FAILED, returncode)
+        tail = output.tail()
+        error = subprocess.CalledProcessError(
+            returncode, command, output="\n".join(tail)
+        )
+        self.service_log(service_name).error(
+            f"Failed to build service {service_name}: {error}"
+        )
+        if tail:
+            self.service_log(service_name).error(
+                f"Last {len(tail)} lines of {service_name}:\n" + "\n".join(tail)
+            )
+        raise error
 
     def run_build(
         self,
@@ -78,57 +576,349 @@ class KanikoExecutor:
         dockerfile: str,
         image: str,
         build_args: t.Dict[str, str],
+        cache_options: t.Optional[KanikoCacheOptions] = None,
+        resources: t.Optional[ResourceRequest] = None,
+        target: t.Optional[str] = None,
+        retry_policy: t.Optional[RetryPolicy] = None,
+        destinations: t.Sequence[str] = (),
+        fingerprint: t.Optional[str] = None,
+        reuse: bool = True,
     ):
-        command_builder = KanikoCommandBuilder(self.kaniko_image)
-        command = command_builder.build_command(
-            service_name, context, dockerfile, image, build_args, self.push
+        """Build one service and push it to ``image`` and ``destinations``.
+
+        ``fingerprint`` is computed unless the caller already knows it; with
+        ``reuse=False`` the service is built even if it looks unchanged.
+        """
+        if self.metrics is not None:
+            service_metrics = self.metrics.service(service_name)
+        else:
+            service_metrics = build_metrics.ServiceMetrics(service_name)
+        service_metrics.started_at = time.time()
+
+        if fingerprint is None and self.build_index is not None and reuse:
+            fingerprint = self.fingerprint(
+                service_name, context, dockerfile, build_args, target
+            )
+        service_metrics.fingerprint = fingerprint
+        images = list(dict.fromkeys([image, *destinations]))
+        reusable = fingerprint is not None and self.build_index is not None
+        if reusable and self._reuse_previous_build(service_name, fingerprint, images):
+            service_metrics.finish(build_metrics.SKIPPED)
+            return
+
+        request = self._build_request(
+            service_name,
+            context,
+            dockerfile,
+            images,
+            build_args,
+            cache_options,
+            resources,
+            target,
         )
+        command = self.backend.build_command(request, self.run_id)
 
         if self.dry_run:
-            logger.info(
+            self.service_log(service_name).info(
                 f"[Dry-Run] Command for service {service_name}: {' '.join(command)}"
             )
+            service_metrics.finish(build_metrics.DRY_RUN)
             return
 
+        policy = retry_policy or self.retry_policy
+        tar_path = None
+        if self.push and policy.retries:
+            tar_path = self._tar_path(service_name, images)
+        if tar_path is not None:
+            request = request._replace(tar_path=tar_path)
+            command = self.backend.build_command(request, self.run_id)
         try:
-            logger.info(f"Building service: {service_name}")
-            logger.info(f"Executing command: {' '.join(command)}")
-            subprocess.run(command, check=True)
-            logger.info(f"Service {service_name} built successfully.")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to build service {service_name}: {e}")
-            raise
+            self._run_with_retries(
+                service_name, command, images, policy, tar_path, service_metrics
+            )
+        finally:
+            if tar_path is not None:
+                shutil.rmtree(os.path.dirname(tar_path), ignore_errors=True)
+
+        service_metrics.finish(build_metrics.SUCCESS, 0)
+        self.service_log(service_name).info(
+            f"Service {service_name} built successfully."
+        )
+
+        if reusable and self.push:
+            self.build_index.record(
+                fingerprint, service_name, images, service_metrics.digest
+            )
 
 
 class KanikoBuilder:
-    def __init__(self, compose_file: str, kaniko_image: str, push: bool, dry_run: bool):
+    def __init__(
+        self,
+        compose_file: t.Union[str, t.Sequence[str]],
+        kaniko_image: str,
+        push: bool,
+        dry_run: bool,
+        max_parallel: t.Optional[int] = None,
+        skip_unchanged: bool = False,
+        build_index_path: t.Optional[str] = None,
+        cache_options: t.Optional[KanikoCacheOptions] = None,
+        warm_cache: bool = False,
+        warmer_image: str = WARMER_IMAGE,
+        resource_pool: t.Optional[ResourcePool] = None,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        failure_mode: str = STOP,
+        metrics_out: t.Optional[str] = None,
+        metrics_prom: t.Optional[str] = None,
+        profiles: t.Sequence[str] = (),
+        services: t.Sequence[str] = (),
+        with_dependencies: bool = False,
+        changed_since: t.Optional[str] = None,
+        history_path: t.Optional[str] = None,
+        record_history: bool = True,
+        pack_context: bool = False,
+        backend: t.Optional[ExecutorBackend] = None,
+        retry_policy: t.Optional[RetryPolicy] = None,
+        digest_dir: t.Optional[str] = None,
+        progress: t.Optional[BuildProgress] = None,
+    ):
         self.compose_file = compose_file
         self.kaniko_image = kaniko_image
         self.push = push
         self.dry_run = dry_run
+        self.max_parallel = max_parallel
+        self.skip_unchanged = skip_unchanged
+        self.build_index_path = build_index_path
+        self.cache_options = cache_options or KanikoCacheOptions()
+        self.warm_cache = warm_cache
+        self.warmer_image = warmer_image
+        self.resource_pool = resource_pool
+        self.log_dir = log_dir
+        self.tail_lines = tail_lines
+        self.failure_mode = failure_mode
+        self.metrics_out = metrics_out
+        self.metrics_prom = metrics_prom
+        self.metrics = build_metrics.BuildMetrics()
+        self.profiles = list(profiles)
+        self.services = list(services)
+        self.with_dependencies = with_dependencies
+        self.changed_since = changed_since
+        self.history = BuildHistory(history_path) if record_history else None
+        self.pack_context = pack_context
+        self.backend = backend or DockerRunBackend(kaniko_image)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.digest_dir = digest_dir
+        self.progress = progress
+        self.executor = KanikoExecutor(
+            kaniko_image,
+            push,
+            dry_run,
+            BuildIndex(build_index_path) if skip_unchanged else None,
+            self.cache_options,
+            log_dir,
+            tail_lines,
+            self.metrics,
+            ContextPacker() if pack_context else None,
+            self.backend,
+            self.retry_policy,
+            digest_dir,
+            on_line=progress.line if progress is not None else None,
+            echo=progress is None or not progress.live,
+        )
+
+    def _max_parallel(self) -> t.Optional[int]:
+        limit = self.backend.max_parallel
+        if limit is None:
+            return self.max_parallel
+        if self.max_parallel is not None and self.max_parallel > limit:
+            logger.info(
+                f"The {self.backend.name} backend runs at most {limit} builds "
+                "at a time."
+            )
+        return min(self.max_parallel or limit, limit)
+
+    def _expected_durations(self, graph: BuildGraph) -> t.Dict[str, float]:
+        if self.history is None:
+            return {}
+        try:
+            return self.history.expected_durations(graph.services)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Cannot read build history {self.history.path}: {e}")
+            return {}
+
+    def _record_history(self) -> None:
+        if self.history is None or self.dry_run:
+            return
+        records = [
+            BuildRecord(
+                metrics.service_name,
+                metrics.started_at,
+                metrics.duration,
+                metrics.status == build_metrics.SUCCESS,
+                metrics.exit_code,
+                metrics.peak_memory,
+                metrics.fingerprint,
+            )
+            for metrics in self.metrics.services()
+            if metrics.status in (build_metrics.SUCCESS, build_metrics.FAILED)
+            and metrics.duration is not None
+        ]
+        try:
+            self.history.record(records)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Cannot write build history {self.history.path}: {e}")
+
+    def _warm_cache_dir(self) -> str:
+        return self.cache_options.cache_dir or os.path.join(CACHE_DIR, "base-images")
+
+    def _warm_base_images(self, plan: BuildPlan) -> None:
+        """Pull the external base images of ``plan`` into the warm cache."""
+        warmer = CacheWarmer(
+            self._warm_cache_dir(),
+            self.warmer_image,
+            self.max_parallel,
+            self.dry_run,
+            self.executor.backend.warmer,
+            self.log_dir,
+            self.tail_lines,
+            self.executor.echo,
+        )
+        images = collect_base_images(plan.graph())
+        warming = [
+            build.service_name
+            for build in plan.builds
+            if set(build.base_images) & set(images)
+        ]
+        self._set_state(warming, WARMING)
+        warmer.warm(images)
+        self._set_state(warming, WAITING)
+
+    def _set_state(self, service_names: t.Iterable[str], state: str) -> None:
+        if self.progress is not None:
+            for name in service_names:
+                self.progress.set_state(name, state)
+
+    def _mark_ready(self, service_name: str) -> None:
+        self.metrics.mark_queued(service_name)
+        self._set_state([service_name], QUEUED)
+
+    def _build(self, build: PlannedBuild) -> None:
+        if self.progress is None:
+            self.executor.run_planned(build)
+            return
+        self.progress.set_state(build.service_name, BUILDING)
+        try:
+            self.executor.run_planned(build)
+        finally:
+            status = self.metrics.service(build.service_name).status
+            self.progress.finished(build.service_name, status)
+
+    def _start_progress(self, plan: BuildPlan) -> None:
+        if self.progress is None:
+            return
+        for build in plan.builds:
+            self.progress.add(
+                build.service_name,
+                dockerfile_steps(os.path.join(build.context, build.dockerfile)),
+                build.duration,
+            )
+        self.progress.start()
+
+    def _fingerprint(
+        self, service: ServiceSpec, parents: t.Sequence[str]
+    ) -> t.Optional[str]:
+        return self.executor.fingerprint(
+            service.name,
+            service.context,
+            service.dockerfile,
+            service.build_args(),
+            service.target,
+            parents,
+        )
+
+    def plan(self, fingerprints: bool = False) -> BuildPlan:
+        """Parse the compose files once and resolve the builds of this run.
 
-    def execute(self):
-        loader = DockerComposeLoader(self.compose_file)
-        services = loader.load()
-        executor = KanikoExecutor(self.kaniko_image, self.push, self.dry_run)
-
-        with ThreadPoolExecutor() as pool:
-            tasks = [
-                pool.submit(
-                    executor.run_build,
-                    service_name,
-                    service.get("build", {}).get("context", "."),
-                    service.get("build", {}).get("dockerfile", "Dockerfile"),
-                    service["image"],
-                    service.get("build", {}).get("args", {}),
+        Builds are fingerprinted with ``--skip-unchanged`` or ``fingerprints``.
+        """
+        graph = load_build_graph(
+            self.compose_file,
+            self.profiles,
+            self.services,
+            self.with_dependencies,
+            self.changed_since,
+        )
+        for context, names in group_by_context(graph.services).items():
+            if len(names) > 1:
+                logger.info(
+                    f"Services {', '.join(names)} share the context {context}, "
+                    "preparing it once."
                 )
-                for service_name, service in services.items()
-                if "image" in service
-            ]
-
-            for future in as_completed(tasks):
-                try:
-                    future.result()
-                except Exception as e:
-                    logger.error(f"Error during build for service: {e}")
-                    raise
+        cache_options = self.cache_options
+        if self.warm_cache:
+            cache_options = cache_options.merged(
+                KanikoCacheOptions(cache_dir=self._warm_cache_dir())
+            )
+        return create_plan(
+            graph,
+            cache_options,
+            self.retry_policy,
+            self._expected_durations(graph),
+            (
+                self._fingerprint
+                if fingerprints or self.executor.build_index is not None
+                else None
+            ),
+        )
+
+    def show(self, plan: BuildPlan) -> None:
+        """Print ``plan`` with the command of every build, starting nothing."""
+        print(plan.describe(self.executor.command))
+        for build in plan.builds:
+            self.metrics.service(build.service_name).finish(build_metrics.DRY_RUN)
+        self._write_metrics()
+
+    def run(self, plan: BuildPlan) -> None:
+        """Build ``plan``, each service as soon as its dependencies are built."""
+        self._start_progress(plan)
+        try:
+            if self.warm_cache:
+                self._warm_base_images(plan)
+            graph = plan.graph()
+            resource_pool = self.resource_pool
+            if resource_pool is None and not self.dry_run:
+                resource_pool = ResourcePool.from_host()
+            scheduler = DagScheduler(
+                self._max_parallel(),
+                resource_pool,
+                self.failure_mode,
+                on_abort=self.executor.kill_running,
+                on_ready=self._mark_ready,
+                priorities=plan.priorities(),
+                admission=plan.admission(),
+            )
+            scheduler.run(graph, lambda name: self._build(graph.services[name]))
+        finally:
+            if self.progress is not None:
+                self.progress.stop()
+            self._write_metrics()
+            self._record_history()
+
+    def execute(self) -> None:
+        plan = self.plan()
+        if self.dry_run:
+            self.show(plan)
+        else:
+            self.run(plan)
+
+    def _write_metrics(self) -> None:
+        self.metrics.finished_at = time.time()
+        try:
+            if self.metrics_out:
+                self.metrics.write_json(self.metrics_out)
+                logger.info(f"Build metrics written to {self.metrics_out}")
+            if self.metrics_prom:
+                self.metrics.write_prometheus(self.metrics_prom)
+                logger.info(f"Prometheus metrics written to {self.metrics_prom}")
+        except OSError as e:
+            logger.warning(f"Cannot write build metrics: {e}")
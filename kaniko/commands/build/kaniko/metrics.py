@@ -0,0 +1,250 @@
+import json
+import os
+import re
+import threading
+import time
+import typing as t
+
+_KANIKO_LOG_RE = re.compile(r"^(?:INFO|DEBU|WARN)\[\d+\]\s+(?P<message>.*)$")
+_STEP_RE = re.compile(
+    r"^(?P<instruction>FROM|RUN|COPY|ADD|ENV|ARG|WORKDIR|USER|EXPOSE|LABEL|CMD|"
+    r"ENTRYPOINT|VOLUME|SHELL|HEALTHCHECK|ONBUILD|STOPSIGNAL)\b\s*(?P<args>.*)$"
+)
+_PUSHED_RE = re.compile(r"^Pushed (?P<image>\S+)@(?P<digest>sha256:[0-9a-f]{64})")
+
+SUCCESS = "success"
+FAILED = "failed"
+SKIPPED = "skipped"
+DRY_RUN = "dry-run"
+
+# Phases of a build recognized from its output by ``line_phase``.
+STEP = "step"
+PUSH = "push"
+
+
+def parse_pushed_digest(line: str) -> t.Optional[str]:
+    """Return the digest from kaniko's ``Pushed <image>@sha256:...`` line."""
+    match = _KANIKO_LOG_RE.match(line)
+    if match:
+        pushed = _PUSHED_RE.match(match.group("message"))
+        if pushed:
+            return pushed.group("digest")
+    return None
+
+
+def line_phase(line: str) -> t.Optional[str]:
+    """``STEP`` when kaniko starts a Dockerfile step, ``PUSH`` when it pushes."""
+    match = _KANIKO_LOG_RE.match(line)
+    if not match:
+        return None
+    message = match.group("message")
+    if _STEP_RE.match(message):
+        return STEP
+    if message.startswith("Pushing image to"):
+        return PUSH
+    return None
+
+
+class ServiceMetrics:
+    """Timings and results of one service build.
+
+    Timestamps are ``time.time()`` values; per-step timings are derived from
+    the moment each kaniko step line is received.
+    """
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.status: t.Optional[str] = None
+        self.queued_at: t.Optional[float] = None
+        self.started_at: t.Optional[float] = None
+        self.container_started_at: t.Optional[float] = None
+        self.push_started_at: t.Optional[float] = None
+        self.finished_at: t.Optional[float] = None
+        self.exit_code: t.Optional[int] = None
+        self.digest: t.Optional[str] = None
+        self.peak_memory: t.Optional[int] = None
+        self.fingerprint: t.Optional[str] = None
+        self.steps: t.List[t.Dict[str, t.Any]] = []
+        self.attempts = 1
+
+    @property
+    def queue_wait(self) -> t.Optional[float]:
+        if self.queued_at is None or self.started_at is None:
+            return None
+        return self.started_at - self.queued_at
+
+    @property
+    def container_start_latency(self) -> t.Optional[float]:
+        if self.started_at is None or self.container_started_at is None:
+            return None
+        return self.container_started_at - self.started_at
+
+    @property
+    def duration(self) -> t.Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def observe_line(self, line: str) -> None:
+        now = time.time()
+        if self.container_started_at is None:
+            self.container_started_at = now
+
+        match = _KANIKO_LOG_RE.match(line)
+        if not match:
+            return
+        message = match.group("message")
+
+        step = _STEP_RE.match(message)
+        if step:
+            self._close_step(now)
+            self.steps.append(
+                {
+                    "index": len(self.steps) + 1,
+                    "instruction": step.group("instruction"),
+                    "arguments": step.group("args")[:200],
+                    "started_at": now,
+                    "duration": None,
+                }
+            )
+        elif message.startswith("Pushing image to"):
+            self._close_step(now)
+            self.push_started_at = self.push_started_at or now
+        else:
+            pushed = _PUSHED_RE.match(message)
+            if pushed:
+                self.digest = pushed.group("digest")
+
+    def _close_step(self, now: float) -> None:
+        if self.steps and self.steps[-1]["duration"] is None:
+            self.steps[-1]["duration"] = now - self.steps[-1]["started_at"]
+
+    def retry(self) -> None:
+        """Start over for another attempt, keeping the original start time."""
+        self.attempts += 1
+        self.push_started_at = None
+        self.digest = None
+        self.steps = []
+
+    def finish(self, status: str, exit_code: t.Optional[int] = None) -> None:
+        self.finished_at = time.time()
+        self.status = status
+        self.exit_code = exit_code
+        self._close_step(self.push_started_at or self.finished_at)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        push_duration = None
+        if self.push_started_at is not None and self.finished_at is not None:
+            push_duration = self.finished_at - self.push_started_at
+        return {
+            "status": self.status,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait": self.queue_wait,
+            "container_start_latency": self.container_start_latency,
+            "duration": self.duration,
+            "push_duration": push_duration,
+            "exit_code": self.exit_code,
+            "attempts": self.attempts,
+            "digest": self.digest,
+            "peak_memory": self.peak_memory,
+            "fingerprint": self.fingerprint,
+            "steps": self.steps,
+        }
+
+
+class BuildMetrics:
+    """Thread-safe collection of ``ServiceMetrics`` for one run."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at: t.Optional[float] = None
+        self._services: t.Dict[str, ServiceMetrics] = {}
+        self._lock = threading.Lock()
+
+    def service(self, service_name: str) -> ServiceMetrics:
+        with self._lock:
+            if service_name not in self._services:
+                self._services[service_name] = ServiceMetrics(service_name)
+            return self._services[service_name]
+
+    def mark_queued(self, service_name: str) -> None:
+        self.service(service_name).queued_at = time.time()
+
+    def services(self) -> t.List[ServiceMetrics]:
+        with self._lock:
+            return list(self._services.values())
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        finished_at = self.finished_at or time.time()
+        return {
+            "started_at": self.started_at,
+            "finished_at": finished_at,
+            "duration": finished_at - self.started_at,
+            "services": {
+                metrics.service_name: metrics.to_dict() for metrics in self.services()
+            },
+        }
+
+    def write_json(self, path: str) -> None:
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str) -> None:
+        """Write a node_exporter textfile-collector compatible report."""
+        gauges = [
+            ("duration_seconds", "Total build duration.", "duration"),
+            (
+                "queue_wait_seconds",
+                "Time spent ready but waiting for a slot.",
+                "queue_wait",
+            ),
+            (
+                "container_start_seconds",
+                "Time until the build produced its first output.",
+                "container_start_latency",
+            ),
+            ("exit_code", "Exit code of the build.", "exit_code"),
+            ("peak_memory_bytes", "Peak memory of the build container.", "peak_memory"),
+        ]
+        services = self.services()
+        lines = []
+        for name, help_text, attribute in gauges:
+            lines.append(f"# HELP kaniko_build_{name} {help_text}")
+            lines.append(f"# TYPE kaniko_build_{name} gauge")
+            for metrics in services:
+                value = getattr(metrics, attribute)
+                if value is not None:
+                    lines.append(
+                        f'kaniko_build_{name}{{service="{metrics.service_name}"}} {value}'
+                    )
+
+        lines.append("# HELP kaniko_build_success Whether the build succeeded.")
+        lines.append("# TYPE kaniko_build_success gauge")
+        for metrics in services:
+            success = 1 if metrics.status in (SUCCESS, SKIPPED) else 0
+            lines.append(
+                f'kaniko_build_success{{service="{metrics.service_name}"}} {success}'
+            )
+
+        lines.append("# HELP kaniko_build_step_duration_seconds Duration of a step.")
+        lines.append("# TYPE kaniko_build_step_duration_seconds gauge")
+        for metrics in services:
+            for step in metrics.steps:
+                if step["duration"] is None:
+                    continue
+                lines.append(
+                    "kaniko_build_step_duration_seconds{"
+                    f'service="{metrics.service_name}",step="{step["index"]}",'
+                    f'instruction="{step["instruction"]}"}} {step["duration"]}'
+                )
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _write_atomic(path: str, content: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
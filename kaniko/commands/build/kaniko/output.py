@@ -0,0 +1,104 @@
+import collections
+import logging
+import os
+import selectors
+import subprocess
+import typing as t
+
+from kaniko.helpers.logger_file import OUTPUT_LOGGER_NAME, Logger
+
+DEFAULT_TAIL_LINES = 50
+
+_READ_SIZE = 64 * 1024
+
+_output_logger = logging.getLogger(OUTPUT_LOGGER_NAME)
+
+
+class ServiceOutput:
+    """Destination of one build's output.
+
+    Each line is logged like the wrapper's messages, so it is written by the
+    logging thread: echoed to stdout with a ``[service]`` prefix unless
+    ``echo`` is off, e.g. while a live progress view is shown, or ``--quiet``
+    is given, and appended to the service's log file in ``log_dir`` when it
+    is set. Lines are also kept in a bounded ring buffer so the end of a
+    failed build can be reported, and every callable in ``listeners`` is
+    given each line, e.g. to collect metrics.
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        log_dir: t.Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        listeners: t.Sequence[t.Callable[[str], None]] = (),
+        echo: bool = True,
+    ):
+        self.service_name = service_name
+        self.echo = echo
+        self.listeners = list(listeners)
+        self._tail: t.Deque[str] = collections.deque(maxlen=tail_lines)
+        self._fields = {"service": service_name, "echo": echo, "log_dir": None}
+        if log_dir:
+            self._fields["log_dir"] = os.path.abspath(log_dir)
+            Logger.log_to_service_files(log_dir)
+        self._logged = echo or bool(log_dir)
+
+    def write_line(self, line: str) -> None:
+        self._tail.append(line)
+        if self._logged:
+            _output_logger.info(line, extra=self._fields)
+        for listener in self.listeners:
+            listener(line)
+
+    def tail(self) -> t.List[str]:
+        return list(self._tail)
+
+    def close(self) -> None:
+        if self._fields["log_dir"] is not None:
+            _output_logger.info("", extra=dict(self._fields, echo=False, closing=True))
+            self._fields["log_dir"] = None
+        self._logged = False
+
+
+def run_streaming(
+    command: t.List[str],
+    output: ServiceOutput,
+    on_start: t.Optional[t.Callable[[subprocess.Popen], None]] = None,
+) -> int:
+    """Run ``command``, streaming stdout and stderr line by line into ``output``.
+
+    Both pipes are multiplexed with a selector, so neither of them can fill up
+    and stall the child while the other one is being read. ``on_start`` is
+    given the child process as soon as it is started.
+    """
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if on_start is not None:
+        on_start(process)
+    pending: t.Dict[int, bytes] = {}
+    with selectors.DefaultSelector() as selector:
+        for pipe in (process.stdout, process.stderr):
+            selector.register(pipe, selectors.EVENT_READ)
+            pending[pipe.fileno()] = b""
+
+        while selector.get_map():
+            for key, _ in selector.select():
+                fd = key.fileobj.fileno()
+                chunk = os.read(fd, _READ_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    if pending[fd]:
+                        output.write_line(pending[fd].decode(errors="replace"))
+                    continue
+
+                *lines, pending[fd] = (pending[fd] + chunk).split(b"\n")
+                for line in lines:
+                    output.write_line(line.rstrip(b"\r").decode(errors="replace"))
+
+    return process.wait()
@@ -0,0 +1,285 @@
+import json
+import os
+import typing as t
+
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.resources import ResourceRequest
+from kaniko.commands.build.kaniko.retry import RetryPolicy
+from kaniko.commands.build.kaniko.scheduler import BuildGraph, charged_resources
+from kaniko.commands.build.kaniko.services import ServiceSpec
+from kaniko.helpers.castom_exeption import InvalidBuildPlan
+
+# Bump when the layout of exported plans changes.
+PLAN_FORMAT_VERSION = 1
+
+
+class PlannedBuild(t.NamedTuple):
+    """One service of a ``BuildPlan`` with everything resolved from compose.
+
+    ``destinations`` are pushed to in addition to ``image``, ``cache_options``
+    already include the global ones, ``duration`` is the expected build time
+    and ``priority`` the expected time to the end of the longest chain of
+    builds waiting on this one.
+    """
+
+    service_name: str
+    context: str
+    dockerfile: str
+    image: str
+    build_args: t.Tuple[t.Tuple[str, str], ...]
+    cache_options: KanikoCacheOptions
+    resources: t.Optional[ResourceRequest]
+    target: t.Optional[str]
+    retry_policy: RetryPolicy
+    destinations: t.Tuple[str, ...] = ()
+    depends_on: t.Tuple[str, ...] = ()
+    base_images: t.Tuple[str, ...] = ()
+    fingerprint: t.Optional[str] = None
+    priority: float = 0.0
+    duration: float = 0.0
+
+    @property
+    def images(self) -> t.List[str]:
+        return list(dict.fromkeys([self.image, *self.destinations]))
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "service": self.service_name,
+            "context": self.context,
+            "dockerfile": self.dockerfile,
+            "target": self.target,
+            "image": self.image,
+            "destinations": list(self.destinations),
+            "build_args": dict(self.build_args),
+            "cache_options": {
+                field: getattr(self.cache_options, field)
+                for field in KanikoCacheOptions.FIELDS
+            },
+            "resources": self.resources._asdict() if self.resources else None,
+            "retry_policy": {
+                "retries": self.retry_policy.retries,
+                "base_delay": self.retry_policy.base_delay,
+                "max_delay": self.retry_policy.max_delay,
+            },
+            "depends_on": list(self.depends_on),
+            "base_images": list(self.base_images),
+            "fingerprint": self.fingerprint,
+            "priority": self.priority,
+            "duration": self.duration,
+        }
+
+    @classmethod
+    def from_dict(cls, data: t.Mapping[str, t.Any]) -> "PlannedBuild":
+        resources = data.get("resources")
+        return cls(
+            data["service"],
+            data["context"],
+            data["dockerfile"],
+            data["image"],
+            tuple((str(key), str(value)) for key, value in data["build_args"].items()),
+            KanikoCacheOptions(**data.get("cache_options", {})),
+            ResourceRequest(**resources) if resources else None,
+            data.get("target"),
+            RetryPolicy(**data.get("retry_policy", {})),
+            tuple(data.get("destinations", ())),
+            tuple(data.get("depends_on", ())),
+            tuple(data.get("base_images", ())),
+            data.get("fingerprint"),
+            float(data.get("priority", 0.0)),
+            float(data.get("duration", 0.0)),
+        )
+
+
+class BuildPlan(t.NamedTuple):
+    """The builds of one run, parents first, computed once before any starts."""
+
+    builds: t.Tuple[PlannedBuild, ...]
+
+    def build(self, service_name: str) -> PlannedBuild:
+        for build in self.builds:
+            if build.service_name == service_name:
+                return build
+        raise KeyError(service_name)
+
+    def graph(self) -> BuildGraph:
+        """Dependency graph over the planned builds, for the schedulers.
+
+        Its ``services`` map names to their ``PlannedBuild``.
+        """
+        return BuildGraph(
+            {build.service_name: build for build in self.builds},
+            {build.service_name: set(build.depends_on) for build in self.builds},
+            {build.service_name: list(build.base_images) for build in self.builds},
+        )
+
+    def priorities(self) -> t.Dict[str, float]:
+        return {build.service_name: build.priority for build in self.builds}
+
+    def admission(self) -> t.Dict[str, ResourceRequest]:
+        """Resources each build is charged for by the scheduler."""
+        return {
+            build.service_name: charged_resources(build.resources)
+            for build in self.builds
+        }
+
+    def shard(self, index: int, count: int) -> "BuildPlan":
+        """Builds of shard ``index`` (counted from 1) out of ``count``.
+
+        Services connected by dependencies stay in the same shard, so that
+        every shard can be built on its own. Groups are handed out longest
+        first to the shard with the least expected work; services without
+        history weigh as much as the average one.
+        """
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Invalid shard {index}/{count}")
+        groups: t.Dict[str, t.List[PlannedBuild]] = {}
+        for build, root in zip(self.builds, self._components()):
+            groups.setdefault(root, []).append(build)
+
+        known = [build.duration for build in self.builds if build.duration > 0]
+        fallback = sum(known) / len(known) if known else 1.0
+        weights = {
+            root: sum(build.duration or fallback for build in builds)
+            for root, builds in groups.items()
+        }
+        loads = [0.0] * count
+        selected: t.Set[str] = set()
+        # Groups are in plan order, so ties are broken deterministically.
+        for root in sorted(groups, key=lambda root: -weights[root]):
+            shard = min(range(count), key=lambda shard: loads[shard])
+            loads[shard] += weights[root]
+            if shard == index - 1:
+                selected.update(build.service_name for build in groups[root])
+        return BuildPlan(
+            tuple(build for build in self.builds if build.service_name in selected)
+        )
+
+    def _components(self) -> t.List[str]:
+        """Name of a representative of each build's dependency group."""
+        parent = {build.service_name: build.service_name for build in self.builds}
+
+        def find(name: str) -> str:
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        for build in self.builds:
+            for dependency in build.depends_on:
+                if dependency in parent:
+                    parent[find(build.service_name)] = find(dependency)
+        return [find(build.service_name) for build in self.builds]
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "version": PLAN_FORMAT_VERSION,
+            "order": [build.service_name for build in self.builds],
+            "builds": [build.to_dict() for build in self.builds],
+        }
+
+    @classmethod
+    def from_dict(cls, data: t.Mapping[str, t.Any]) -> "BuildPlan":
+        return cls(tuple(PlannedBuild.from_dict(build) for build in data["builds"]))
+
+    def write(self, path: str) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path: str) -> "BuildPlan":
+        """Load a plan written by :meth:`write`, raising ``InvalidBuildPlan``."""
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except ValueError as e:
+            raise InvalidBuildPlan(path, e) from e
+        if not isinstance(data, dict) or data.get("version") != PLAN_FORMAT_VERSION:
+            raise InvalidBuildPlan(
+                path, f"expected a plan of format version {PLAN_FORMAT_VERSION}"
+            )
+        try:
+            plan = cls.from_dict(data)
+            plan.graph().topological_order()
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise InvalidBuildPlan(path, repr(e)) from e
+        return plan
+
+    def describe(self, command: t.Callable[[PlannedBuild], t.Sequence[str]]) -> str:
+        """Human readable plan, with the ``command`` each build would run."""
+        lines = [f"Build plan for {len(self.builds)} services:"]
+        for index, build in enumerate(self.builds, 1):
+            lines.append(f"[{index}/{len(self.builds)}] {build.service_name}")
+            lines.append(f"  images: {', '.join(build.images)}")
+            lines.append(
+                f"  context: {build.context}, dockerfile: {build.dockerfile}"
+                + (f", target: {build.target}" if build.target else "")
+            )
+            if build.depends_on:
+                lines.append(f"  after: {', '.join(build.depends_on)}")
+            if build.priority:
+                lines.append(f"  critical path: {build.priority:.1f}s")
+            if build.fingerprint:
+                lines.append(f"  fingerprint: {build.fingerprint}")
+            lines.append(f"  command: {' '.join(command(build))}")
+        return "\n".join(lines)
+
+
+def create_plan(
+    graph: BuildGraph,
+    cache_options: t.Optional[KanikoCacheOptions] = None,
+    retry_policy: t.Optional[RetryPolicy] = None,
+    durations: t.Optional[t.Mapping[str, float]] = None,
+    fingerprint: t.Optional[
+        t.Callable[[ServiceSpec, t.Sequence[str]], t.Optional[str]]
+    ] = None,
+) -> BuildPlan:
+    """Resolve every service of ``graph`` into a ``BuildPlan``.
+
+    Image references and build arguments are interpolated here, so an unset
+    variable fails the run before any build starts. ``durations`` are the
+    expected build times used to prioritize long chains, ``fingerprint`` is
+    called for services that may be skipped when unchanged, with the
+    fingerprints of the services they depend on. A service whose dependency
+    has no fingerprint gets none either.
+    """
+    cache_options = cache_options or KanikoCacheOptions()
+    retry_policy = retry_policy or RetryPolicy()
+    durations = durations or {}
+    priorities = graph.critical_paths(durations)
+    builds = []
+    fingerprints: t.Dict[str, t.Optional[str]] = {}
+    for name in graph.topological_order():
+        service = graph.services[name]
+        depends_on = tuple(sorted(graph.dependencies[name]))
+        if fingerprint is not None:
+            parents = [fingerprints.get(parent) for parent in depends_on]
+            fingerprints[name] = (
+                None if None in parents else fingerprint(service, parents)
+            )
+        image, *destinations = service.destinations() or [None]
+        builds.append(
+            PlannedBuild(
+                name,
+                service.context,
+                service.dockerfile,
+                image,
+                tuple(service.build_args().items()),
+                cache_options.merged(
+                    KanikoCacheOptions.from_extension(service.extension)
+                ),
+                ResourceRequest.from_service(service),
+                service.target,
+                RetryPolicy.from_extension(service.extension, retry_policy),
+                tuple(destinations),
+                depends_on,
+                tuple(graph.base_images.get(name, ())),
+                fingerprints.get(name),
+                priorities.get(name, 0.0),
+                durations.get(name, 0.0),
+            )
+        )
+    return BuildPlan(tuple(builds))
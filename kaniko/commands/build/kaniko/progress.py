@@ -0,0 +1,294 @@
+import logging
+import queue
+import sys
+import threading
+import time
+import typing as t
+
+from kaniko.commands.build.kaniko import metrics as build_metrics
+from kaniko.helpers.logger_file import Logger
+
+WAITING = "waiting"
+QUEUED = "queued"
+WARMING = "warming"
+BUILDING = "building"
+PUSHING = "pushing"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+AUTO = "auto"
+LIVE = "live"
+PLAIN = "plain"
+PROGRESS_MODES = (AUTO, LIVE, PLAIN)
+
+REFRESH_INTERVAL = 0.25
+# Characters of the last output line shown in a row.
+LAST_LINE_WIDTH = 80
+
+_LINE = "line"
+_FINISHED = "finished"
+_STOP = "stop"
+
+_FINAL_STATES = {
+    build_metrics.SUCCESS: DONE,
+    build_metrics.SKIPPED: SKIPPED,
+    build_metrics.DRY_RUN: DONE,
+}
+
+
+class ProgressEvent(t.NamedTuple):
+    service_name: str
+    kind: str
+    value: t.Optional[str]
+    at: float
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class ServiceProgress:
+    """What the progress view knows about one service.
+
+    Only the thread of ``BuildProgress`` updates it, from queued events.
+    ``steps`` is the number of Dockerfile instructions and ``expected`` the
+    duration expected from the build history, both 0 when unknown.
+    """
+
+    def __init__(self, service_name: str, steps: int = 0, expected: float = 0.0):
+        self.service_name = service_name
+        self.steps = steps
+        self.expected = expected
+        self.state = WAITING
+        self.step = 0
+        self.started_at: t.Optional[float] = None
+        self.finished_at: t.Optional[float] = None
+        self.last_line = ""
+
+    def apply(self, event: ProgressEvent) -> bool:
+        """Update from ``event``, returning whether the state changed."""
+        previous = self.state
+        if event.kind == _LINE:
+            self.last_line = event.value or ""
+            phase = build_metrics.line_phase(self.last_line)
+            if phase == build_metrics.STEP and self.state == BUILDING:
+                self.step += 1
+            elif phase == build_metrics.PUSH:
+                self.state = PUSHING
+        elif event.kind == _FINISHED:
+            self.state = _FINAL_STATES.get(event.value or "", FAILED)
+            self.finished_at = event.at
+        else:
+            if event.kind == BUILDING:
+                self.started_at = event.at
+                self.step = 0
+            self.state = event.kind
+        return self.state != previous
+
+    @property
+    def running(self) -> bool:
+        return self.state in (BUILDING, PUSHING)
+
+    def elapsed(self, now: float) -> t.Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or now) - self.started_at
+
+    def eta(self, now: float) -> t.Optional[float]:
+        """Expected seconds left, negative once the build runs late."""
+        if not self.running or not self.expected:
+            return None
+        return self.expected - (self.elapsed(now) or 0.0)
+
+    def describe(self) -> str:
+        if self.state == BUILDING and self.step:
+            total = max(self.steps, self.step)
+            return f"building step {self.step} of {total}"
+        return self.state
+
+
+class BuildProgress:
+    """Live view of a run, one row per service.
+
+    Builds report through ``set_state``, ``line`` and ``finished``, which only
+    put an event on a ``queue.SimpleQueue``, so a busy build never waits for
+    the display. One thread applies the events and redraws a ``rich`` table
+    when ``console`` is a terminal (or ``mode`` is ``LIVE``); otherwise each
+    state change is printed as a plain line.
+    """
+
+    def __init__(
+        self,
+        mode: str = AUTO,
+        console: t.Optional[t.TextIO] = None,
+        refresh_interval: float = REFRESH_INTERVAL,
+    ):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Invalid progress mode: {mode}")
+        self.console = console or sys.stdout
+        isatty = getattr(self.console, "isatty", lambda: False)
+        self.live = mode == LIVE or (mode == AUTO and isatty())
+        self.refresh_interval = refresh_interval
+        self.services: t.Dict[str, ServiceProgress] = {}
+        self._events: "queue.SimpleQueue[ProgressEvent]" = queue.SimpleQueue()
+        self._thread: t.Optional[threading.Thread] = None
+
+    def add(self, service_name: str, steps: int = 0, expected: float = 0.0) -> None:
+        """Show a row for ``service_name``; called before ``start``."""
+        self.services[service_name] = ServiceProgress(service_name, steps, expected)
+
+    def _put(self, service_name: str, kind: str, value: t.Optional[str]) -> None:
+        self._events.put(ProgressEvent(service_name, kind, value, time.time()))
+
+    def set_state(self, service_name: str, state: str) -> None:
+        self._put(service_name, state, None)
+
+    def line(self, service_name: str, line: str) -> None:
+        self._put(service_name, _LINE, line)
+
+    def finished(self, service_name: str, status: t.Optional[str]) -> None:
+        """``status`` is the ``metrics`` status of the build, ``None`` if unknown."""
+        self._put(service_name, _FINISHED, status)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="kaniko-progress", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Show the final state of every service and stop the view."""
+        if self._thread is None:
+            return
+        self._put("", _STOP, None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "BuildProgress":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: t.Any) -> None:
+        self.stop()
+
+    def _drain(self, timeout: float) -> t.Tuple[t.List[ServiceProgress], bool]:
+        """Apply the queued events, returning changed services and whether to stop."""
+        changed: t.List[ServiceProgress] = []
+        try:
+            event = self._events.get(timeout=timeout)
+            while True:
+                if event.kind == _STOP:
+                    return changed, True
+                service = self.services.get(event.service_name)
+                if service is None:
+                    service = ServiceProgress(event.service_name)
+                    self.services[event.service_name] = service
+                if service.apply(event) and service not in changed:
+                    changed.append(service)
+                event = self._events.get_nowait()
+        except queue.Empty:
+            return changed, False
+
+    def _run(self) -> None:
+        if self.live:
+            self._run_live()
+            return
+        stopping = False
+        while not stopping:
+            changed, stopping = self._drain(self.refresh_interval)
+            now = time.time()
+            for service in changed:
+                if service.state in (WAITING, QUEUED):
+                    continue
+                self.console.write(self.plain_line(service, now) + "\n")
+            self.console.flush()
+
+    def _run_live(self) -> None:
+        from rich.console import Console
+        from rich.live import Live
+
+        live = Live(
+            console=Console(file=self.console, force_terminal=True),
+            auto_refresh=False,
+            redirect_stdout=True,
+            redirect_stderr=True,
+        )
+        with live:
+            restore = _redirect_log_handlers(sys.stderr)
+            try:
+                stopping = False
+                while not stopping:
+                    _, stopping = self._drain(self.refresh_interval)
+                    live.update(self.table(time.time()), refresh=True)
+            finally:
+                restore()
+
+    def plain_line(self, service: ServiceProgress, now: float) -> str:
+        parts = [f"[{service.service_name}] {service.describe()}"]
+        elapsed = service.elapsed(now)
+        if elapsed is not None and service.state not in (BUILDING, WARMING):
+            parts.append(f"after {_duration(elapsed)}")
+        eta = service.eta(now)
+        if eta is not None and eta > 0:
+            parts.append(f"ETA {_duration(eta)}")
+        return ", ".join(parts)
+
+    def table(self, now: float) -> t.Any:
+        """``rich`` table of every service; running builds that are late stand out."""
+        from rich.table import Table
+        from rich.text import Text
+
+        table = Table(box=None, pad_edge=False, expand=False)
+        for column in ("service", "state", "elapsed", "ETA", "last output"):
+            table.add_column(column, no_wrap=True)
+        styles = {DONE: "green", FAILED: "bold red", SKIPPED: "dim", PUSHING: "cyan"}
+        for service in self.services.values():
+            elapsed = service.elapsed(now)
+            eta = service.eta(now)
+            if eta is None:
+                eta_text = Text("")
+            elif eta >= 0:
+                eta_text = Text(_duration(eta))
+            else:
+                eta_text = Text(f"+{_duration(-eta)} late", style="bold yellow")
+            table.add_row(
+                service.service_name,
+                Text(service.describe(), style=styles.get(service.state, "")),
+                _duration(elapsed) if elapsed is not None else "",
+                eta_text,
+                Text(service.last_line[:LAST_LINE_WIDTH], style="dim"),
+            )
+        return table
+
+
+def _redirect_log_handlers(stream: t.TextIO) -> t.Callable[[], None]:
+    """Point console log handlers at ``stream`` until the returned callable is called.
+
+    Handlers keep the stream they were created with, so without this their
+    lines would be drawn over the live view instead of above it.
+    """
+    consoles = (sys.__stdout__, sys.__stderr__)
+    loggers = [logging.getLogger()] + [
+        logger
+        for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    handlers = [handler for logger in loggers for handler in logger.handlers]
+    redirected: t.List[t.Tuple[logging.StreamHandler, t.TextIO]] = []
+    for handler in [*handlers, *Logger.console_handlers()]:
+        if (
+            isinstance(handler, logging.StreamHandler)
+            and not isinstance(handler, logging.FileHandler)
+            and handler.stream in consoles
+        ):
+            previous = handler.setStream(stream)
+            if previous is not None:
+                redirected.append((handler, previous))
+
+    def restore() -> None:
+        for handler, previous in redirected:
+            handler.setStream(previous)
+
+    return restore
@@ -0,0 +1,209 @@
+import os
+import re
+import threading
+import typing as t
+
+from kaniko.commands.build.kaniko.services import ServiceSpec
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+PROC_MEMINFO = "/proc/meminfo"
+
+_MEMORY_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*$", re.IGNORECASE)
+_MEMORY_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+def parse_memory(value: t.Union[str, int, float]) -> int:
+    """Parse docker-style memory sizes such as ``512m``, ``2G`` or ``1.5GiB``."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _MEMORY_RE.match(value)
+    if not match:
+        raise ValueError(f"Invalid memory size: {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * _MEMORY_UNITS[unit.lower()])
+
+
+class ResourceRequest(t.NamedTuple):
+    cpus: float
+    memory: int
+
+    @classmethod
+    def from_service(cls, service: ServiceSpec) -> t.Optional["ResourceRequest"]:
+        """Read ``x-kaniko.resources`` or, failing that, ``deploy.resources``.
+
+        Limits are preferred over reservations. Returns ``None`` when the
+        service declares nothing; such a build is charged ``DEFAULT_REQUEST``
+        by the scheduler but its container is not limited.
+        """
+        declared = service.extension.get("resources") or service.deploy_resources
+        if not declared:
+            return None
+
+        cpus = declared.get("cpus")
+        memory = declared.get("memory")
+        return cls(
+            cpus=float(cpus) if cpus is not None else 0.0,
+            memory=parse_memory(memory) if memory is not None else 0,
+        )
+
+    def docker_flags(self) -> t.List[str]:
+        flags = []
+        if self.cpus:
+            flags.extend(["--cpus", f"{self.cpus:g}"])
+        if self.memory:
+            flags.extend(["--memory", str(self.memory)])
+        return flags
+
+
+# Admission weight of services that do not declare resources. It only decides
+# when they start: their containers get no --cpus/--memory, since a guessed
+# limit would kill builds that need more memory than it.
+DEFAULT_REQUEST = ResourceRequest(cpus=1.0, memory=parse_memory("1g"))
+
+
+def _read(path: str) -> t.Optional[str]:
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+class HostResources(t.NamedTuple):
+    cpus: float
+    memory: int
+
+    @classmethod
+    def detect(cls, cgroup_root: str = CGROUP_ROOT) -> "HostResources":
+        """Read CPU and available memory, honouring cgroup v2 limits."""
+        if hasattr(os, "sched_getaffinity"):
+            cpus = float(len(os.sched_getaffinity(0)))
+        else:
+            cpus = float(os.cpu_count() or 1)
+
+        cpu_max = _read(os.path.join(cgroup_root, "cpu.max"))
+        if cpu_max:
+            quota, _, period = cpu_max.partition(" ")
+            if quota != "max" and period:
+                cpus = min(cpus, int(quota) / int(period))
+
+        memory = cls._meminfo_available()
+        memory_max = _read(os.path.join(cgroup_root, "memory.max"))
+        if memory_max and memory_max != "max":
+            used = int(_read(os.path.join(cgroup_root, "memory.current")) or 0)
+            available = int(memory_max) - used
+            memory = min(memory, available) if memory else available
+
+        return cls(cpus=cpus, memory=memory)
+
+    @staticmethod
+    def _meminfo_available() -> int:
+        meminfo = _read(PROC_MEMINFO) or ""
+        for line in meminfo.splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+        return 0
+
+
+class ResourcePool:
+    """Track CPU and memory handed out to running builds.
+
+    Requests larger than the whole pool are clamped to it, so a single large
+    build can still run once everything else has finished.
+    """
+
+    def __init__(self, cpus: float, memory: int):
+        self.cpus = cpus
+        self.memory = memory
+        self._free_cpus = cpus
+        self._free_memory = memory
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_host(
+        cls, cpus: t.Optional[float] = None, memory: t.Optional[int] = None
+    ) -> "ResourcePool":
+        """Size the pool from the host, unless ``cpus``/``memory`` override it."""
+        host = HostResources.detect()
+        return cls(cpus or host.cpus, memory or host.memory)
+
+    def _clamp(self, request: ResourceRequest) -> ResourceRequest:
+        return ResourceRequest(
+            min(request.cpus, self.cpus), min(request.memory, self.memory)
+        )
+
+    def try_acquire(self, request: ResourceRequest) -> bool:
+        request = self._clamp(request)
+        with self._lock:
+            if request.cpus > self._free_cpus or request.memory > self._free_memory:
+                return False
+            self._free_cpus -= request.cpus
+            self._free_memory -= request.memory
+            return True
+
+    def release(self, request: ResourceRequest) -> None:
+        request = self._clamp(request)
+        with self._lock:
+            self._free_cpus = min(self.cpus, self._free_cpus + request.cpus)
+            self._free_memory = min(self.memory, self._free_memory + request.memory)
+
+
+# Memory high-water mark files of a container's cgroup, for cgroup v2 and v1
+# with either the systemd or the cgroupfs driver.
+_CONTAINER_MEMORY_PEAK = (
+    "system.slice/docker-{id}.scope/memory.peak",
+    "docker/{id}/memory.peak",
+    "memory/system.slice/docker-{id}.scope/memory.max_usage_in_bytes",
+    "memory/docker/{id}/memory.max_usage_in_bytes",
+)
+
+
+def container_memory_peak(
+    container_id: str, cgroup_root: str = CGROUP_ROOT
+) -> t.Optional[int]:
+    for template in _CONTAINER_MEMORY_PEAK:
+        value = _read(os.path.join(cgroup_root, template.format(id=container_id)))
+        if value and value.isdigit():
+            return int(value)
+    return None
+
+
+class MemoryPeakSampler:
+    """Track the peak memory of the container whose id docker writes to ``cidfile``.
+
+    Only works when the docker daemon runs on this host; otherwise ``stop()``
+    returns ``None``.
+    """
+
+    def __init__(
+        self, cidfile: str, interval: float = 1.0, cgroup_root: str = CGROUP_ROOT
+    ):
+        self.cidfile = cidfile
+        self.interval = interval
+        self.cgroup_root = cgroup_root
+        self.peak: t.Optional[int] = None
+        self._container_id: t.Optional[str] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "MemoryPeakSampler":
+        self._thread.start()
+        return self
+
+    def sample(self) -> None:
+        if self._container_id is None:
+            self._container_id = _read(self.cidfile) or None
+            if self._container_id is None:
+                return
+        value = container_memory_peak(self._container_id, self.cgroup_root)
+        if value is not None and (self.peak is None or value > self.peak):
+            self.peak = value
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> t.Optional[int]:
+        self._stopped.set()
+        self._thread.join()
+        return self.peak
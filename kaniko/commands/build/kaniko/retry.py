@@ -0,0 +1,138 @@
+import random
+import re
+import typing as t
+
+DEFAULT_RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 120.0
+
+# Failure kinds reported by ``FailureClassifier``.
+TRANSIENT = "transient"
+TRANSIENT_PUSH = "transient-push"
+
+_TRANSIENT_RE = re.compile(
+    "|".join(
+        [
+            r"\b50[0234]\b",
+            r"(?:internal server error|bad gateway|service unavailable|gateway timeout)",
+            r"\b429\b",
+            r"too\s?many\s?requests",
+            r"rate limit",
+            r"connection reset by peer",
+            r"connection refused",
+            r"broken pipe",
+            r"tls handshake timeout",
+            r"tls: ",
+            r"i/o timeout",
+            r"unexpected eof",
+            r"context deadline exceeded",
+            r"temporary failure in name resolution",
+            r"net/http: request canceled",
+        ]
+    ),
+    re.IGNORECASE,
+)
+# Registry answers that no retry can fix, even when a 5xx shows up as well.
+_PERMANENT_RE = re.compile(
+    r"unauthorized|\bdenied\b|manifest[ _]unknown|name[ _]unknown|name[ _]invalid",
+    re.IGNORECASE,
+)
+# Prefix of kaniko's own log lines, e.g. ``ERRO[0012]`` or, with
+# ``--log-format=text``, ``time=... level=error msg=``.
+_LOG_RE = re.compile(
+    r'^(?:(INFO|WARN|ERRO|FATA)\[\d+\]|time=\S+ level=(\w+) msg=)"?\s*'
+)
+# The error kaniko exits with, e.g. ``error building image: ...``.
+_EXIT_ERROR_RE = re.compile(r"^error [a-z ]+: ")
+_ERROR_LEVELS = {"ERRO", "FATA", "error", "fatal"}
+_PUSH_RE = re.compile(r"^(?:pushing image to|error pushing image)", re.IGNORECASE)
+
+
+class FailureClassifier:
+    """Watch a build's output and tell whether a failure is worth retrying.
+
+    Only the errors kaniko reports itself count, never the output of ``RUN``
+    steps; with ``kaniko=False`` every line does, for commands such as
+    ``crane push`` that only print their own messages. A failure is transient
+    when they mention a registry or network hiccup (HTTP 5xx or 429, TLS or
+    connection resets, timeouts) and nothing permanent such as an
+    authorization error. It is a push failure when kaniko had already started
+    pushing, i.e. the image itself was built.
+    """
+
+    def __init__(self, kaniko: bool = True):
+        self.kaniko = kaniko
+        self.transient = False
+        self.permanent = False
+        self.pushing = False
+
+    def observe_line(self, line: str) -> None:
+        match = _LOG_RE.match(line)
+        if match:
+            level = match.group(1) or match.group(2)
+            message = line[match.end() :]
+        elif _EXIT_ERROR_RE.match(line) or not self.kaniko:
+            level, message = "error", line
+        else:
+            return
+        if _PUSH_RE.match(message):
+            self.pushing = True
+        if level not in _ERROR_LEVELS:
+            return
+        if _PERMANENT_RE.search(message):
+            self.permanent = True
+        elif _TRANSIENT_RE.search(message):
+            self.transient = True
+
+    @property
+    def kind(self) -> t.Optional[str]:
+        """``TRANSIENT_PUSH``, ``TRANSIENT`` or ``None`` for permanent failures."""
+        if self.permanent or not self.transient:
+            return None
+        return TRANSIENT_PUSH if self.pushing else TRANSIENT
+
+
+class RetryPolicy:
+    """How often and how patiently transient build failures are retried.
+
+    The n-th retry waits ``base_delay * 2 ** (n - 1)`` seconds, capped at
+    ``max_delay``, of which a random half is dropped so parallel builds hitting
+    the same registry do not retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        retries: int = 0,
+        base_delay: float = DEFAULT_RETRY_DELAY,
+        max_delay: float = MAX_RETRY_DELAY,
+    ):
+        if retries < 0:
+            raise ValueError(f"Invalid retry count {retries}, expected 0 or more")
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_extension(
+        cls, extension: t.Dict[str, t.Any], default: "RetryPolicy"
+    ) -> "RetryPolicy":
+        """Apply ``x-kaniko`` ``retries`` and ``retry-delay`` over ``default``."""
+        values = {key.replace("-", "_"): value for key, value in extension.items()}
+        retries = values.get("retries")
+        delay = values.get("retry_delay")
+        if retries is None and delay is None:
+            return default
+        return cls(
+            default.retries if retries is None else int(retries),
+            default.base_delay if delay is None else float(delay),
+            default.max_delay,
+        )
+
+    def delay(
+        self, attempt: int, jitter: t.Callable[[], float] = random.random
+    ) -> float:
+        """Seconds to wait before retry number ``attempt`` (starting at 1)."""
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return delay / 2 + delay / 2 * jitter()
+
+    def __repr__(self) -> str:
+        return f"RetryPolicy(retries={self.retries}, base_delay={self.base_delay})"
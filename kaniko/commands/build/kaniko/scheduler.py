@@ -0,0 +1,390 @@
+import os
+import re
+import typing as t
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from kaniko.commands.build.kaniko.resources import (
+    DEFAULT_REQUEST,
+    ResourcePool,
+    ResourceRequest,
+)
+from kaniko.commands.build.kaniko.services import ServiceSpec
+from kaniko.helpers.castom_exeption import (
+    CyclicDependency,
+    FailedBuild,
+    UnknownService,
+)
+from kaniko.helpers.logger_file import _init_log
+
+logger = _init_log()
+
+# What the scheduler does once a build fails.
+STOP = "stop"  # start nothing new, let running builds finish, re-raise the error
+FAIL_FAST = "fail-fast"  # also abort running builds right away
+KEEP_GOING = "keep-going"  # build everything that does not depend on a failure
+FAILURE_MODES = (STOP, FAIL_FAST, KEEP_GOING)
+
+_ARG_REF_RE = re.compile(r"\$(?:\{(\w+)(?::?-([^}]*))?\}|(\w+))")
+
+
+def _dockerfile_instructions(text: str) -> t.Iterator[t.Tuple[str, str]]:
+    """Yield ``(INSTRUCTION, arguments)`` pairs, joining continuation lines."""
+    buffer = ""
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not buffer and (not line or line.startswith("#")):
+            continue
+        if line.endswith("\\"):
+            buffer += line[:-1] + " "
+            continue
+        buffer += line
+        parts = buffer.split(None, 1)
+        buffer = ""
+        if parts:
+            yield parts[0].upper(), parts[1] if len(parts) > 1 else ""
+
+
+def _substitute_args(value: str, args: t.Dict[str, str]) -> str:
+    def replace(match: "re.Match") -> str:
+        name = match.group(1) or match.group(3)
+        default = match.group(2) or ""
+        return args.get(name) or default
+
+    return _ARG_REF_RE.sub(replace, value)
+
+
+def parse_dockerfile_bases(
+    dockerfile: str, build_args: t.Optional[t.Dict[str, str]] = None
+) -> t.List[str]:
+    """Return images a Dockerfile pulls via ``FROM`` or ``COPY --from``.
+
+    References to earlier build stages are skipped, and global ``ARG`` defaults
+    (overridden by ``build_args``) are substituted into image names.
+    """
+    if not os.path.isfile(dockerfile):
+        return []
+
+    with open(dockerfile, "r") as file:
+        text = file.read()
+
+    overrides = build_args or {}
+    args: t.Dict[str, str] = {}
+    stages: t.Set[str] = set()
+    images: t.List[str] = []
+    seen_from = False
+
+    for instruction, arguments in _dockerfile_instructions(text):
+        if instruction == "ARG" and not seen_from:
+            name, _, default = arguments.partition("=")
+            name = name.strip()
+            args[name] = overrides.get(name, default.strip().strip("\"'"))
+        elif instruction == "FROM":
+            seen_from = True
+            tokens = [tok for tok in arguments.split() if not tok.startswith("--")]
+            if not tokens:
+                continue
+            image = _substitute_args(tokens[0], args)
+            if len(tokens) >= 3 and tokens[1].upper() == "AS":
+                stages.add(tokens[2].lower())
+            if image.lower() not in stages and image != "scratch":
+                images.append(image)
+        elif instruction == "COPY":
+            for token in arguments.split():
+                if not token.startswith("--from="):
+                    continue
+                source = _substitute_args(token[len("--from=") :], args)
+                if source.lower() not in stages and not source.isdigit():
+                    images.append(source)
+
+    return list(dict.fromkeys(images))
+
+
+def dockerfile_steps(dockerfile: str) -> int:
+    """Number of instructions in a Dockerfile, 0 when it cannot be read."""
+    try:
+        with open(dockerfile, "r") as file:
+            return sum(1 for _ in _dockerfile_instructions(file.read()))
+    except OSError:
+        return 0
+
+
+def normalize_image(image: str) -> str:
+    """Add the implicit ``latest`` tag so image references compare equal."""
+    if "@" in image or ":" in image.rsplit("/", 1)[-1]:
+        return image
+    return f"{image}:latest"
+
+
+def default_parallelism() -> int:
+    # Same default as ThreadPoolExecutor, which used to run the builds.
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class BuildGraph:
+    """Dependency graph between the buildable services of a compose file.
+
+    A service depends on another one when it lists it in ``depends_on`` or when
+    its Dockerfile builds ``FROM`` the image that service produces.
+    """
+
+    def __init__(
+        self,
+        services: t.Dict[str, ServiceSpec],
+        dependencies: t.Dict[str, t.Set[str]],
+        base_images: t.Dict[str, t.List[str]],
+    ):
+        self.services = services
+        self.dependencies = dependencies
+        self.base_images = base_images
+        self.dependents: t.Dict[str, t.List[str]] = {name: [] for name in services}
+        for name, parents in dependencies.items():
+            for parent in parents:
+                self.dependents[parent].append(name)
+
+    @classmethod
+    def from_services(
+        cls,
+        services: t.Dict[str, ServiceSpec],
+        dockerfile_bases: t.Callable[..., t.List[str]] = parse_dockerfile_bases,
+        targets: t.Optional[t.Sequence[str]] = None,
+        with_dependencies: bool = True,
+    ) -> "BuildGraph":
+        """Build the graph of every buildable service, or only of ``targets``.
+
+        With ``targets``, the services they depend on are added as well unless
+        ``with_dependencies`` is false. Dockerfiles of services outside of the
+        selection are never read.
+        """
+        buildable = {
+            name: service for name, service in services.items() if service.image
+        }
+        producers = {
+            normalize_image(service.image): name for name, service in buildable.items()
+        }
+
+        pending = deque(buildable if targets is None else targets)
+        unknown = [name for name in pending if name not in buildable]
+        if unknown:
+            raise UnknownService(unknown, sorted(buildable))
+        allowed = buildable if with_dependencies else set(pending)
+
+        dependencies: t.Dict[str, t.Set[str]] = {}
+        base_images: t.Dict[str, t.List[str]] = {}
+        while pending:
+            name = pending.popleft()
+            if name in dependencies:
+                continue
+            service = buildable[name]
+            parents = {dep for dep in service.depends_on if dep in allowed}
+            bases = dockerfile_bases(service.dockerfile_path, service.build_args())
+            for image in bases:
+                producer = producers.get(normalize_image(image))
+                if producer in allowed and producer != name:
+                    parents.add(producer)
+            parents.discard(name)
+            dependencies[name] = parents
+            base_images[name] = bases
+            pending.extend(parents)
+
+        selected = {
+            name: service for name, service in buildable.items() if name in dependencies
+        }
+        graph = cls(selected, dependencies, base_images)
+        graph.topological_order()
+        return graph
+
+    def topological_order(self) -> t.List[str]:
+        """Return services parents-first, raising ``CyclicDependency`` on cycles."""
+        remaining = {name: len(parents) for name, parents in self.dependencies.items()}
+        queue = deque(name for name, count in remaining.items() if count == 0)
+        order = []
+        while queue:
+            name = queue.popleft()
+            order.append(name)
+            for child in self.dependents[name]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    queue.append(child)
+
+        if len(order) != len(self.services):
+            raise CyclicDependency(name for name in self.services if name not in order)
+        return order
+
+    def critical_paths(self, durations: t.Mapping[str, float]) -> t.Dict[str, float]:
+        """Expected time from the start of each service to the end of the longest
+        chain of builds waiting on it.
+
+        Starting the longest chains first shortens the whole run; for services
+        without dependents this is longest-processing-time-first ordering.
+        """
+        lengths: t.Dict[str, float] = {}
+        for name in reversed(self.topological_order()):
+            tail = max((lengths[child] for child in self.dependents[name]), default=0.0)
+            lengths[name] = durations.get(name, 0.0) + tail
+        return lengths
+
+    def subgraph(self, names: t.Iterable[str]) -> "BuildGraph":
+        """Return the graph restricted to ``names``, keeping edges between them."""
+        selected = set(names)
+        return BuildGraph(
+            {name: spec for name, spec in self.services.items() if name in selected},
+            {
+                name: parents & selected
+                for name, parents in self.dependencies.items()
+                if name in selected
+            },
+            {
+                name: bases
+                for name, bases in self.base_images.items()
+                if name in selected
+            },
+        )
+
+
+def admission_request(service: ServiceSpec) -> ResourceRequest:
+    """Resources a build is charged for, falling back to ``DEFAULT_REQUEST``."""
+    return charged_resources(ResourceRequest.from_service(service))
+
+
+def charged_resources(declared: t.Optional[ResourceRequest]) -> ResourceRequest:
+    """Fill what a service does not declare from ``DEFAULT_REQUEST``."""
+    if declared is None:
+        return DEFAULT_REQUEST
+    return ResourceRequest(
+        declared.cpus or DEFAULT_REQUEST.cpus,
+        declared.memory or DEFAULT_REQUEST.memory,
+    )
+
+
+class DagScheduler:
+    """Run builds as soon as every service they depend on has been built.
+
+    When a ``ResourcePool`` is given, a ready build only starts once the CPU and
+    memory it declares are free. ``failure_mode`` is one of ``FAILURE_MODES``;
+    with ``FAIL_FAST``, ``on_abort`` is called to stop builds already running.
+    ``on_ready`` is called with each service once its dependencies are built.
+    Ready services start in descending order of ``priorities``, then in the
+    order they became ready. ``admission`` gives the resources a service is
+    charged for when its ``graph.services`` entry is not a ``ServiceSpec``.
+    """
+
+    def __init__(
+        self,
+        max_parallel: t.Optional[int] = None,
+        resources: t.Optional[ResourcePool] = None,
+        failure_mode: str = STOP,
+        on_abort: t.Optional[t.Callable[[], None]] = None,
+        on_ready: t.Optional[t.Callable[[str], None]] = None,
+        priorities: t.Optional[t.Mapping[str, float]] = None,
+        admission: t.Optional[t.Mapping[str, ResourceRequest]] = None,
+    ):
+        if max_parallel is not None and max_parallel < 1:
+            raise ValueError("max_parallel must be a positive integer")
+        if failure_mode not in FAILURE_MODES:
+            raise ValueError(f"Unknown failure mode: {failure_mode}")
+        self.max_parallel = max_parallel or default_parallelism()
+        self.resources = resources
+        self.failure_mode = failure_mode
+        self.on_abort = on_abort
+        self.on_ready = on_ready
+        self.priorities = priorities or {}
+        self.admission = admission or {}
+
+    def _request(self, graph: BuildGraph, name: str) -> ResourceRequest:
+        if name in self.admission:
+            return self.admission[name]
+        return admission_request(graph.services[name])
+
+    def _mark_ready(self, ready: t.Deque[str], name: str) -> None:
+        if self.on_ready is not None:
+            self.on_ready(name)
+        ready.append(name)
+
+    def _next_admissible(
+        self, ready: t.Deque[str], graph: BuildGraph
+    ) -> t.Optional[str]:
+        order = sorted(
+            range(len(ready)), key=lambda index: -self.priorities.get(ready[index], 0.0)
+        )
+        for index in order:
+            name = ready[index]
+            request = self._request(graph, name)
+            if self.resources is None or self.resources.try_acquire(request):
+                del ready[index]
+                return name
+        return None
+
+    def _release(self, graph: BuildGraph, name: str) -> None:
+        if self.resources is not None:
+            self.resources.release(self._request(graph, name))
+
+    def _abort(self, running: t.Dict[Future, str]) -> None:
+        logger.error("Fail-fast: aborting running builds.")
+        for future in running:
+            future.cancel()
+        if self.on_abort is not None:
+            self.on_abort()
+
+    def run(self, graph: BuildGraph, build: t.Callable[[str], None]) -> None:
+        waiting_on = {
+            name: set(parents) for name, parents in graph.dependencies.items()
+        }
+        ready: t.Deque[str] = deque()
+        for name, parents in waiting_on.items():
+            if not parents:
+                self._mark_ready(ready, name)
+        running: t.Dict[Future, str] = {}
+        started: t.Set[str] = set()
+        aborted: t.Set[str] = set()
+        failures: t.Dict[str, BaseException] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            while True:
+                while len(running) < self.max_parallel and (
+                    not failures or self.failure_mode == KEEP_GOING
+                ):
+                    name = self._next_admissible(ready, graph)
+                    if name is None:
+                        break
+                    started.add(name)
+                    running[pool.submit(build, name)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    self._release(graph, name)
+                    if future.cancelled():
+                        aborted.add(name)
+                        continue
+                    try:
+                        future.result()
+                    except Exception as e:
+                        if failures and self.failure_mode == FAIL_FAST:
+                            aborted.add(name)
+                            continue
+                        logger.error(f"Error during build for service {name}: {e}")
+                        failures[name] = e
+                        if self.failure_mode == FAIL_FAST:
+                            self._abort(running)
+                        continue
+
+                    for child in graph.dependents[name]:
+                        waiting_on[child].discard(name)
+                        if not waiting_on[child]:
+                            self._mark_ready(ready, child)
+
+        if not failures:
+            return
+
+        skipped = [
+            name for name in graph.services if name not in started or name in aborted
+        ]
+        if skipped:
+            logger.error(f"Skipped services after failure: {', '.join(skipped)}")
+        if self.failure_mode == STOP:
+            raise next(iter(failures.values()))
+        raise FailedBuild(next(iter(failures)), failures, skipped)
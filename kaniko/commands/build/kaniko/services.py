@@ -0,0 +1,239 @@
+import hashlib
+import marshal
+import os
+import sys
+import typing as t
+
+from kaniko.commands.build.kaniko.compose import interpolate
+from kaniko.helpers.logger_file import _init_log
+from kaniko.settings import CACHE_DIR
+
+logger = _init_log()
+
+# Bump when the fields of ``ServiceSpec`` change, invalidating cached specs.
+SPEC_FORMAT_VERSION = 3
+
+
+def image_repository(image: str) -> str:
+    """``image`` without its tag or digest."""
+    repository = image.split("@", 1)[0]
+    if ":" in repository.rsplit("/", 1)[-1]:
+        repository = repository.rsplit(":", 1)[0]
+    return repository
+
+
+def _as_list(value: t.Any) -> t.List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
+class ServiceSpec:
+    """A compose service reduced to what a build needs.
+
+    ``args`` keeps build arguments as declared; they are interpolated and
+    arguments without a value are resolved from the environment by
+    ``build_args()`` at build time, so specs can be cached independently of
+    the environment.
+    """
+
+    __slots__ = (
+        "name",
+        "image",
+        "context",
+        "dockerfile",
+        "args",
+        "depends_on",
+        "extension",
+        "deploy_resources",
+        "profiles",
+        "target",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        image: t.Optional[str] = None,
+        context: str = ".",
+        dockerfile: str = "Dockerfile",
+        args: t.Optional[t.Dict[str, t.Optional[str]]] = None,
+        depends_on: t.Sequence[str] = (),
+        extension: t.Optional[t.Dict[str, t.Any]] = None,
+        deploy_resources: t.Optional[t.Dict[str, t.Any]] = None,
+        profiles: t.Sequence[str] = (),
+        target: t.Optional[str] = None,
+    ):
+        self.name = name
+        self.image = image
+        self.context = context
+        self.dockerfile = dockerfile
+        self.args = dict(args or {})
+        self.depends_on = list(depends_on)
+        self.extension = dict(extension or {})
+        self.deploy_resources = deploy_resources
+        self.profiles = list(profiles)
+        self.target = target
+
+    @classmethod
+    def from_dict(cls, name: str, service: t.Mapping[str, t.Any]) -> "ServiceSpec":
+        """Normalize a raw compose service.
+
+        ``build`` may be a context path or a mapping, ``build.args`` a mapping or a
+        ``KEY=VALUE`` list and ``depends_on`` a list or a mapping. ``x-kaniko`` on
+        the ``build`` level overrides the one on the service level.
+        """
+        build = service.get("build") or {}
+        if isinstance(build, str):
+            build = {"context": build}
+
+        args = build.get("args") or {}
+        if isinstance(args, list):
+            args = dict(
+                item.split("=", 1) if "=" in item else (item, None) for item in args
+            )
+
+        extension = dict(service.get("x-kaniko") or {})
+        extension.update(build.get("x-kaniko") or {})
+
+        deploy = (service.get("deploy") or {}).get("resources") or {}
+        return cls(
+            name,
+            image=service.get("image"),
+            context=build.get("context") or ".",
+            dockerfile=build.get("dockerfile") or "Dockerfile",
+            args={
+                key: str(value) if value is not None else None
+                for key, value in args.items()
+            },
+            depends_on=list(service.get("depends_on") or []),
+            extension=extension,
+            deploy_resources=deploy.get("limits") or deploy.get("reservations"),
+            profiles=list(service.get("profiles") or []),
+            target=build.get("target"),
+        )
+
+    @property
+    def dockerfile_path(self) -> str:
+        return os.path.join(self.context, self.dockerfile)
+
+    def build_args(
+        self, environ: t.Optional[t.Mapping[str, str]] = None
+    ) -> t.Dict[str, str]:
+        """Return build arguments with variables such as ``${GIT_SHA}``
+        interpolated from ``environ``, taking missing values from it."""
+        environ = os.environ if environ is None else environ
+        resolved = {}
+        for key, value in self.args.items():
+            if value is None:
+                value = environ.get(key)
+                if value is None:
+                    continue
+            else:
+                value = interpolate(value, environ)
+            resolved[key] = value
+        return resolved
+
+    def destinations(
+        self, environ: t.Optional[t.Mapping[str, str]] = None
+    ) -> t.List[str]:
+        """Every reference the image is pushed to, ``image`` first.
+
+        ``x-kaniko.tags`` are applied to the repository of ``image`` and
+        ``x-kaniko.destinations`` are complete references. Variables such as
+        ``${GIT_SHA}`` are interpolated from ``environ``.
+        """
+        destinations = []
+        if self.image:
+            destinations.append(interpolate(self.image, environ))
+            repository = image_repository(destinations[0])
+            for tag in _as_list(self.extension.get("tags")):
+                destinations.append(f"{repository}:{interpolate(tag, environ)}")
+        for destination in _as_list(self.extension.get("destinations")):
+            destinations.append(interpolate(destination, environ))
+        return list(dict.fromkeys(destinations))
+
+    def to_tuple(self) -> t.Tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values: t.Sequence) -> "ServiceSpec":
+        return cls(*values)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ServiceSpec):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __repr__(self) -> str:
+        return f"ServiceSpec({self.name!r}, image={self.image!r})"
+
+
+def specs_from_dicts(
+    services: t.Mapping[str, t.Mapping[str, t.Any]]
+) -> t.Dict[str, ServiceSpec]:
+    return {name: ServiceSpec.from_dict(name, data) for name, data in services.items()}
+
+
+def active_services(
+    services: t.Mapping[str, ServiceSpec], profiles: t.Iterable[str] = ()
+) -> t.Dict[str, ServiceSpec]:
+    """Services without ``profiles`` plus those in one of the enabled profiles."""
+    enabled = set(profiles)
+    return {
+        name: spec
+        for name, spec in services.items()
+        if not spec.profiles or "*" in enabled or enabled.intersection(spec.profiles)
+    }
+
+
+class ComposeCache:
+    """Parsed and validated services stored by the hash of the compose sources.
+
+    Specs are serialized with ``marshal``: compact, fast to load and unable to
+    execute code. The key includes the Python version since the ``marshal``
+    format is only stable within one.
+    """
+
+    def __init__(self, directory: t.Optional[str] = None):
+        self.directory = directory or os.path.join(CACHE_DIR, "compose")
+
+    @staticmethod
+    def key(sources: t.Sequence[bytes]) -> str:
+        digest = hashlib.sha256()
+        for source in sources:
+            digest.update(f"{len(source)}\0".encode())
+            digest.update(source)
+        digest.update(
+            f"\0{SPEC_FORMAT_VERSION}\0{sys.version_info[0]}.{sys.version_info[1]}".encode()
+        )
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.marshal")
+
+    def get(self, key: str) -> t.Optional[t.Dict[str, ServiceSpec]]:
+        try:
+            with open(self._path(key), "rb") as file:
+                rows = marshal.load(file)
+            specs = [ServiceSpec.from_tuple(row) for row in rows]
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return {spec.name: spec for spec in specs}
+
+    def put(self, key: str, specs: t.Dict[str, ServiceSpec]) -> None:
+        try:
+            data = marshal.dumps([spec.to_tuple() for spec in specs.values()])
+        except ValueError:
+            # Values YAML can produce but marshal cannot store, e.g. timestamps.
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Cannot write compose cache {path}: {e}")
@@ -0,0 +1,57 @@
+"""
+Build farm coordinator
+
+Usage:
+    kaniko [--compose-file=<file>...] serve [--listen=<address>] [--plan-in=<file>] [--kaniko-image=<image>] [--profile=<name>...] [--with-dependencies] [--changed-since=<ref>] [--heartbeat-timeout=<seconds>] [--log-dir=<dir>] [--tail-lines=<n>] [--push] [<service>...]
+
+Options:
+  --compose-file=<file>           Path to the docker-compose.yml file; repeat to merge overrides. [default: docker-compose.yml]
+  --listen=<address>              Where workers connect: tcp://host:port or unix:///path. [default: tcp://127.0.0.1:7464]
+  --plan-in=<file>                Serve a plan written by `kaniko build --plan-out` instead of reading the compose files.
+  --kaniko-image=<image>          Kaniko executor image the builds are fingerprinted for. [default: gcr.io/kaniko-project/executor:latest]
+  --profile=<name>                Also build services of this compose profile; repeatable (def. $COMPOSE_PROFILES).
+  --with-dependencies             With <service> names, also build the services they depend on.
+  --changed-since=<ref>           Only build services changed since this git ref, and their dependents.
+  --heartbeat-timeout=<seconds>   Queue the builds of a worker silent for this long again. [default: 30]
+  --log-dir=<dir>                 Write each service's build output streamed by the workers to <dir>/<service>.log.
+  --tail-lines=<n>                Lines of output kept per build. [default: 50]
+  --push, -p                      Have the workers push the built images.
+  -h --help                       Show this help message and exit.
+"""
+
+import os
+import typing as t
+
+
+def run(opts: t.Dict[str, t.Any]) -> None:
+    from kaniko.commands.build.kaniko.farm import Coordinator
+    from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoBuilder
+    from kaniko.commands.build.kaniko.plan import BuildPlan
+
+    if opts.get("--plan-in"):
+        plan = BuildPlan.read(opts["--plan-in"])
+    else:
+        profiles = opts.get("--profile") or [
+            profile
+            for profile in os.environ.get("COMPOSE_PROFILES", "").split(",")
+            if profile
+        ]
+        plan = KanikoBuilder(
+            opts.get("--compose-file") or ["docker-compose.yml"],
+            opts.get("--kaniko-image") or "gcr.io/kaniko-project/executor:latest",
+            push=False,
+            dry_run=False,
+            profiles=profiles,
+            services=opts.get("<service>") or [],
+            with_dependencies=opts.get("--with-dependencies", False),
+            changed_since=opts.get("--changed-since"),
+        ).plan()
+
+    coordinator = Coordinator(
+        plan,
+        push=opts.get("--push", False),
+        heartbeat_timeout=float(opts.get("--heartbeat-timeout") or 30),
+        log_dir=opts.get("--log-dir"),
+        tail_lines=int(opts.get("--tail-lines") or 50),
+    )
+    coordinator.serve(opts.get("--listen") or "tcp://127.0.0.1:7464")
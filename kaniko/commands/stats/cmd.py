@@ -0,0 +1,64 @@
+"""
+Build history statistics
+
+Usage:
+    kaniko stats [--history=<file>] [--json] [<service>...]
+
+Options:
+  --history=<file>                Build history database (under ~/.cache/kaniko-wrapper by default).
+  --json                          Print the statistics as JSON.
+  -h --help                       Show this help message and exit.
+"""
+
+import json
+import time
+import typing as t
+
+from kaniko.commands.build.kaniko.history import BuildHistory, ServiceStats
+
+COLUMNS = ("SERVICE", "BUILDS", "FAILED", "P50", "P95", "PEAK MEM", "LAST BUILD")
+
+
+def _seconds(value: t.Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}s"
+
+
+def _memory(value: t.Optional[int]) -> str:
+    return "-" if value is None else f"{value / 1024**2:.0f}M"
+
+
+def _timestamp(value: t.Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(value))
+
+
+def format_table(stats: t.Sequence[ServiceStats]) -> str:
+    rows = [COLUMNS] + [
+        (
+            item.service,
+            str(item.builds),
+            str(item.failures),
+            _seconds(item.p50),
+            _seconds(item.p95),
+            _memory(item.peak_memory),
+            _timestamp(item.last_build),
+        )
+        for item in stats
+    ]
+    widths = [max(len(row[index]) for row in rows) for index in range(len(COLUMNS))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def run(opts: t.Dict[str, t.Any]) -> None:
+    history = BuildHistory(opts.get("--history"))
+    stats = history.stats(opts.get("<service>") or [])
+    if opts.get("--json"):
+        print(json.dumps([item._asdict() for item in stats], indent=2))
+    elif not stats:
+        print(f"No builds recorded in {history.path}.")
+    else:
+        print(format_table(stats))
@@ -0,0 +1,45 @@
+"""
+Build farm worker
+
+Usage:
+    kaniko worker [--connect=<address>] [--name=<name>] [--slots=<n>] [--prefetch=<n>] [--kaniko-image=<image>] [--backend=<name>] [--executor=<path>] [--log-dir=<dir>] [--tail-lines=<n>]
+
+Options:
+  --connect=<address>             Coordinator started by `kaniko serve`: tcp://host:port or unix:///path. [default: tcp://127.0.0.1:7464]
+  --name=<name>                   Worker name shown by the coordinator (host name and pid by default).
+  --slots=<n>                     Builds run at the same time. [default: 1]
+  --prefetch=<n>                  Builds leased ahead of a free slot; idle workers may steal them. [default: 1]
+  --kaniko-image=<image>          Kaniko executor image for building. [default: gcr.io/kaniko-project/executor:latest]
+  --backend=<name>                How builds run: docker or direct. [default: docker]
+  --executor=<path>               Kaniko executor binary of the direct backend. [default: /kaniko/executor]
+  --log-dir=<dir>                 Write each service's build output to <dir>/<service>.log.
+  --tail-lines=<n>                Lines of output shown when a build fails. [default: 50]
+  -h --help                       Show this help message and exit.
+"""
+
+import typing as t
+
+from kaniko.helpers.logger_file import Logger
+
+
+def run(opts: t.Dict[str, t.Any]) -> None:
+    from kaniko.commands.build.kaniko.backends import create_backend
+    from kaniko.commands.build.kaniko.farm import Worker
+
+    backend = create_backend(
+        opts.get("--backend") or "docker",
+        opts.get("--kaniko-image") or "gcr.io/kaniko-project/executor:latest",
+        opts.get("--executor") or "/kaniko/executor",
+    )
+    if opts.get("--log-dir"):
+        Logger.log_to_service_files(opts["--log-dir"])
+    worker = Worker(
+        opts.get("--connect") or "tcp://127.0.0.1:7464",
+        backend,
+        name=opts.get("--name"),
+        slots=int(opts.get("--slots") or 1),
+        prefetch=int(opts.get("--prefetch") or 1),
+        log_dir=opts.get("--log-dir"),
+        tail_lines=int(opts.get("--tail-lines") or 50),
+    )
+    worker.run()
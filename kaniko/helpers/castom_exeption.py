@@ -1,7 +1,101 @@
 class FailedBuild(Exception):
-    def __init__(self, service_name):
+    def __init__(self, service_name, failures=None, skipped=()):
         self.service_name = service_name
-        self.message = f"Failed to build service '{service_name}'."
+        self.failures = dict(failures or {})
+        self.skipped = list(skipped)
+        if len(self.failures) > 1:
+            details = "; ".join(
+                f"{name}: {error}" for name, error in self.failures.items()
+            )
+            self.message = f"Failed to build {len(self.failures)} services: {details}."
+        else:
+            self.message = f"Failed to build service '{service_name}'."
+        if self.skipped:
+            self.message += f" Skipped: {', '.join(self.skipped)}."
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class CyclicDependency(Exception):
+    def __init__(self, services):
+        self.services = list(services)
+        self.message = (
+            f"Cyclic build dependency between services: {', '.join(self.services)}."
+        )
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class UnknownService(Exception):
+    def __init__(self, services, available=()):
+        self.services = list(services)
+        self.available = list(available)
+        self.message = f"No buildable service named: {', '.join(self.services)}."
+        if self.available:
+            self.message += f" Buildable services: {', '.join(self.available)}."
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class UnknownProfile(Exception):
+    def __init__(self, profiles, available=()):
+        self.profiles = list(profiles)
+        self.available = list(available)
+        self.message = f"No service has the profile: {', '.join(self.profiles)}."
+        if self.available:
+            self.message += f" Profiles: {', '.join(self.available)}."
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class ChangeDetectionFailed(Exception):
+    def __init__(self, ref, reason):
+        self.ref = ref
+        self.reason = reason
+        self.message = f"Cannot list changes since '{ref}': {reason}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class InvalidComposeFile(Exception):
+    def __init__(self, compose_file, errors):
+        self.compose_file = compose_file
+        self.errors = errors
+        self.message = f"Invalid compose file {compose_file}: {errors}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class UnsetVariable(Exception):
+    def __init__(self, variable, value, reason=None):
+        self.variable = variable
+        self.value = value
+        self.message = f"Variable {variable} used in '{value}' is not set" + (
+            f": {reason}" if reason else "."
+        )
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class InvalidBuildPlan(Exception):
+    def __init__(self, path, reason):
+        self.path = path
+        self.reason = reason
+        self.message = f"Invalid build plan {path}: {reason}"
         super().__init__(self.message)
 
     def __str__(self):
@@ -0,0 +1,89 @@
+import os
+import re
+import typing as t
+
+DOCKERIGNORE = ".dockerignore"
+
+
+def _translate(pattern: str) -> str:
+    """Translate a ``.dockerignore`` glob into a regular expression."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "*":
+            if pattern[i : i + 2] == "**":
+                i += 2
+                if pattern[i : i + 1] == "/":
+                    # "**/" matches zero or more directories.
+                    regex += "(?:.*/)?"
+                    i += 1
+                else:
+                    regex += ".*"
+                continue
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+class DockerIgnore:
+    """Matcher for ``.dockerignore`` rules, following the docker CLI semantics.
+
+    A path is excluded by the last pattern that matches it or one of its parent
+    directories; patterns starting with ``!`` re-include paths.
+    """
+
+    def __init__(self, patterns: t.Iterable[str] = ()):
+        self.rules: t.List[t.Tuple[bool, "re.Pattern"]] = []
+        for line in patterns:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:].strip()
+            line = os.path.normpath(line).replace(os.sep, "/").lstrip("/")
+            if line == ".":
+                continue
+            self.rules.append((negate, re.compile(f"^{_translate(line)}$")))
+        self.has_exceptions = any(negate for negate, _ in self.rules)
+
+    @classmethod
+    def from_context(cls, context: str) -> "DockerIgnore":
+        path = os.path.join(context, DOCKERIGNORE)
+        if not os.path.isfile(path):
+            return cls()
+        with open(path, "r") as file:
+            return cls(file.read().splitlines())
+
+    def is_excluded(self, relpath: str) -> bool:
+        relpath = relpath.replace(os.sep, "/").strip("/")
+        parents = relpath.split("/")
+        candidates = ["/".join(parents[: i + 1]) for i in range(len(parents))]
+
+        excluded = False
+        for negate, regex in self.rules:
+            if any(regex.match(candidate) for candidate in candidates):
+                excluded = not negate
+        return excluded
+
+    def can_skip_dir(self, relpath: str) -> bool:
+        """Whether a whole directory can be pruned from a walk."""
+        return not self.has_exceptions and self.is_excluded(relpath)
@@ -1,11 +1,33 @@
+import atexit
 import logging
 import enum
-from typing import Optional
+import os
+import sys
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
 
-from kaniko.models.model_wrapper import CommandLineOptions
+if TYPE_CHECKING:
+    import logging.handlers
+
+    from kaniko.models.model_wrapper import CommandLineOptions
 
 DEFAULT_LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
+# Every message of the wrapper goes through this logger.
+LOGGER_NAME = "KanikoBuilder"
+# Records of build output written by ``ServiceOutput``.
+OUTPUT_LOGGER_NAME = f"{LOGGER_NAME}.output"
+
+TEXT = "text"
+JSON = "json"
+LOG_FORMATS = (TEXT, JSON)
+
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Fields a record may carry, set with ``extra`` or a ``LoggerAdapter``.
+RECORD_FIELDS = ("service", "build_id")
+
 
 class VerbosityLevel(enum.IntEnum):
     QUIET = -1
@@ -18,52 +40,268 @@ class VerbosityLevel(enum.IntEnum):
     def from_opts(cls, opts: dict):
         if opts.get("--quiet"):
             return cls.QUIET
-        verbosity_level = opts.get("-v", 0)
+        verbosity_level = int(opts.get("--verbose") or opts.get("-v") or 0)
         return cls(min(verbosity_level, cls.MAX))
 
+    @property
+    def level(self) -> int:
+        if self == VerbosityLevel.QUIET:
+            return logging.WARNING
+        if self == VerbosityLevel.NORMAL:
+            return logging.INFO
+        return logging.DEBUG
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, with the ``RECORD_FIELDS`` it carries."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        import json
+
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _ServiceFileFormatter(logging.Formatter):
+    """Build output as is, messages of the wrapper with time and level."""
+
+    def __init__(self):
+        super().__init__(DEFAULT_LOG_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.name == OUTPUT_LOGGER_NAME:
+            return record.getMessage()
+        return super().format(record)
+
+
+class BuildOutputHandler(logging.Handler):
+    """Echo records of build output to stdout as ``[service] line``.
+
+    Output written while a live progress view is shown has ``echo`` off and
+    only goes to the service files.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.name != OUTPUT_LOGGER_NAME or not getattr(record, "echo", False):
+            return
+        try:
+            sys.stdout.write(f"[{record.service}] {record.getMessage()}\n")
+            sys.stdout.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class ServiceFileHandler(logging.Handler):
+    """Write records that carry a ``service`` to ``<log_dir>/<service>.log``.
+
+    Build output from ``ServiceOutput`` and the wrapper's messages about the
+    service share the file, which is rotated on its own. Build output is only
+    written to the ``log_dir`` it is logged for, and a ``closing`` record
+    closes the file once everything queued before it is written.
+    """
+
+    def __init__(self, log_dir: str):
+        super().__init__()
+        self.log_dir = log_dir
+        self.setFormatter(_ServiceFileFormatter())
+        self._files: Dict[str, logging.Handler] = {}
+        os.makedirs(log_dir, exist_ok=True)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        service = getattr(record, "service", None)
+        if not service:
+            return
+        if record.name == OUTPUT_LOGGER_NAME and getattr(
+            record, "log_dir", None
+        ) != os.path.abspath(self.log_dir):
+            return
+        if getattr(record, "closing", False):
+            self.close_service(service)
+            return
+        handler = self._files.get(service)
+        if handler is None:
+            import logging.handlers
+
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(self.log_dir, f"{service}.log"),
+                maxBytes=LOG_FILE_MAX_BYTES,
+                backupCount=LOG_FILE_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(self.formatter)
+            self._files[service] = handler
+        handler.emit(record)
+
+    def close_service(self, service: str) -> None:
+        with self.lock:
+            handler = self._files.pop(service, None)
+        if handler is not None:
+            handler.close()
+
+    def close(self) -> None:
+        with self.lock:
+            files, self._files = self._files, {}
+        for handler in files.values():
+            handler.close()
+        super().close()
+
+
+_service_files: Dict[str, ServiceFileHandler] = {}
+_service_files_lock = threading.Lock()
+
+
+def service_files(log_dir: str) -> ServiceFileHandler:
+    """The ``ServiceFileHandler`` of ``log_dir``, shared by every writer."""
+    key = os.path.abspath(log_dir)
+    with _service_files_lock:
+        if key not in _service_files:
+            _service_files[key] = ServiceFileHandler(log_dir)
+        return _service_files[key]
+
+
+def queue_logging(
+    logger: logging.Logger, handlers: Sequence[logging.Handler]
+) -> "logging.handlers.QueueListener":
+    """Make ``logger`` hand its records to ``handlers`` on a background thread.
+
+    Logging then only puts the record on a queue, so build threads never wait
+    for a slow console or disk. Stop the returned listener to flush.
+    """
+    import logging.handlers
+    import queue
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.handlers = [logging.handlers.QueueHandler(records)]
+    listener = logging.handlers.QueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
 
 class Logger:
     _instance: Optional[logging.Logger] = None
+    _listener: Optional["logging.handlers.QueueListener"] = None
+    _atexit_registered = False
 
     @classmethod
-    def get_logger(
-        cls, verbosity: VerbosityLevel = VerbosityLevel.NORMAL
-    ) -> logging.Logger:
-        """Retrieve the configured logger instance."""
-        if cls._instance is None:
-            cls._instance = cls.configure_logging(verbosity)
+    def get_logger(cls, verbosity: Optional[VerbosityLevel] = None) -> logging.Logger:
+        """Retrieve the logger, configured for ``verbosity`` when it is given."""
+        if cls._instance is None or verbosity is not None:
+            cls.configure_logging(
+                VerbosityLevel.NORMAL if verbosity is None else verbosity
+            )
         return cls._instance
 
-    @staticmethod
-    def configure_logging(verbosity: VerbosityLevel) -> logging.Logger:
-        """Centralized logger configuration."""
-        logger = logging.getLogger("KanikoBuilder")
-        if not logger.handlers:
-            level = (
-                logging.INFO if verbosity >= VerbosityLevel.NORMAL else logging.ERROR
+    @classmethod
+    def configure_logging(
+        cls, verbosity: VerbosityLevel, log_format: str = TEXT
+    ) -> logging.Logger:
+        """Centralized logger configuration, replacing any earlier one.
+
+        ``-v`` shows the wrapper's debug messages, ``-vv`` those of every
+        library as well, ``--quiet`` only warnings and errors. Build output
+        is echoed to stdout unless ``--quiet`` is given, but always written to
+        the service files.
+        """
+        if log_format not in LOG_FORMATS:
+            raise ValueError(
+                f"Invalid log format '{log_format}', "
+                f"expected one of: {', '.join(LOG_FORMATS)}"
             )
-            logger.setLevel(level)
+        cls.shutdown()
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(
+            JsonLinesFormatter()
+            if log_format == JSON
+            else logging.Formatter(DEFAULT_LOG_FORMAT)
+        )
+        console_handler.addFilter(lambda record: record.name != OUTPUT_LOGGER_NAME)
+        output_handler = BuildOutputHandler(verbosity.level)
+        # Below the wrapper's level with --quiet, so service files still get it.
+        logging.getLogger(OUTPUT_LOGGER_NAME).setLevel(logging.INFO)
 
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(logging.Formatter(DEFAULT_LOG_FORMAT))
-            logger.addHandler(console_handler)
+        logger = logging.getLogger(LOGGER_NAME)
+        root = logging.getLogger()
+        for handler in logger.handlers:
+            root.removeHandler(handler)
+        logger.setLevel(verbosity.level)
+        logger.propagate = False
+        cls._listener = queue_logging(logger, [console_handler, output_handler])
+        if verbosity >= VerbosityLevel.DEBUG:
+            root.setLevel(logging.DEBUG)
+            root.addHandler(logger.handlers[0])
 
+        if not cls._atexit_registered:
+            atexit.register(cls.shutdown)
+            cls._atexit_registered = True
+        cls._instance = logger
         return logger
 
+    @classmethod
+    def log_to_service_files(cls, log_dir: str) -> None:
+        """Also write messages about a service to its file in ``log_dir``."""
+        cls.get_logger()
+        files = service_files(log_dir)
+        if files not in cls._listener.handlers:
+            cls._listener.handlers = (*cls._listener.handlers, files)
+
+    @classmethod
+    def console_handlers(cls) -> List[logging.StreamHandler]:
+        if cls._listener is None:
+            return []
+        return [
+            handler
+            for handler in cls._listener.handlers
+            if type(handler) is logging.StreamHandler
+        ]
+
+    @classmethod
+    def flush(cls) -> None:
+        """Wait until every record queued so far has been handled."""
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener.start()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Write out every queued record."""
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener = None
+
 
 def _init_log():
-    Logger.get_logger(VerbosityLevel.NORMAL)
+    return Logger.get_logger()
+
+
+def service_logger(
+    service_name: str, build_id: Optional[str] = None
+) -> logging.LoggerAdapter:
+    """Logger whose records carry ``service_name`` and ``build_id``."""
+    return logging.LoggerAdapter(
+        Logger.get_logger(), {"service": service_name, "build_id": build_id}
+    )
 
 
 class LoggerModel:
-    def __init__(self, verbosity_level: int = logging.INFO):
-        self.logger = logging.getLogger("KanikoComposeWrapper")
-        self.logger.setLevel(verbosity_level)
-        if not self.logger.handlers:
-            console_handler = logging.StreamHandler()
-            formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-            console_handler.setFormatter(formatter)
-            self.logger.addHandler(console_handler)
+    """Messages of the commands, on the same logger as the build engine."""
+
+    def __init__(self, verbosity_level: Optional[int] = None):
+        self.logger = Logger.get_logger()
+        if verbosity_level is not None:
+            self.logger.setLevel(verbosity_level)
 
     def log_info(self, message: str) -> None:
         """Log information messages."""
@@ -77,7 +315,7 @@ class LoggerModel:
         """Log warning messages."""
         self.logger.warning(message)
 
-    def log_build_details(self, opts: CommandLineOptions) -> None:
+    def log_build_details(self, opts: "CommandLineOptions") -> None:
         self.log_info(f"📁 Using docker-compose file: {opts.compose_file}")
         self.log_info(f"🛠️ Kaniko executor image: {opts.kaniko_image}")
         if opts.push:
@@ -12,11 +12,16 @@ Usage:
 Global Options:
     -e, --allow-dotenv <path>       Load environment variables from the specified file. [default: .env]
     -h, --help                      Show usage help.
-    -v                              Make log.
+    -v, --verbose                   Show debug messages; -vv also those of the libraries used.
+    -q, --quiet                     Only show warnings and errors.
+    --log-format=<format>           Log lines as text or as json objects. [default: text]
     --version                       Show script version.
 
 Commands:
     build                           Run image building with Kaniko.
+    stats                           Show build time percentiles from the build history.
+    serve                           Hand the builds out to `kaniko worker` processes.
+    worker                          Build what a `kaniko serve` coordinator hands out.
 
 Examples:
     1. Build and push images with default settings:
@@ -29,15 +34,15 @@ Examples:
        kaniko build --dry-run
 """
 
-import json
+import importlib
+import os
 import types
 import typing as t
 import logging
 
 import docopt
-import dotenv
 
-from kaniko import commands, helpers, settings
+from kaniko import settings
 from kaniko.helpers.logger_file import (
     VerbosityLevel,
     Logger,
@@ -45,17 +50,25 @@ from kaniko.helpers.logger_file import (
 
 logger = logging.getLogger(__name__)
 
-settings.PACKAGE_VERSION = PACKAGE_VERSION = helpers
+PACKAGE_VERSION = settings.SCRIPT_VERSION
+
+# Command modules are imported only when their command runs, so that
+# ``--version``, ``--help`` and typos never pay for yaml, pydantic or the
+# build engine.
+COMMANDS = {
+    "build": "kaniko.commands.build.cmd",
+    "stats": "kaniko.commands.stats.cmd",
+    "serve": "kaniko.commands.serve.cmd",
+    "worker": "kaniko.commands.worker.cmd",
+}
 
 
 def run_command(opts: t.Dict[str, t.Any]):
     command_name = opts["<command>"]
 
-    match command_name:
-        case "build":
-            cmd_module: types.ModuleType = commands.build
-        case _:
-            raise ValueError(f"Unknown command: {command_name}")
+    if command_name not in COMMANDS:
+        raise ValueError(f"Unknown command: {command_name}")
+    cmd_module: types.ModuleType = importlib.import_module(COMMANDS[command_name])
 
     if cmd_module.__doc__ is None:
         raise RuntimeError(f"Command <{command_name}> has no docstring")
@@ -63,20 +76,28 @@ def run_command(opts: t.Dict[str, t.Any]):
     cmd_options = docopt.docopt(
         cmd_module.__doc__, argv=[command_name] + opts["<args>"]
     )
-    logger.debug(
-        "Run command <%s> with options: %s", command_name, json.dumps(cmd_options)
-    )
+    logger.debug("Run command <%s> with options: %s", command_name, cmd_options)
 
     return cmd_module.run(cmd_options)
 
 
 def main(opts: t.Dict[str, t.Any]):
     verbosity = VerbosityLevel.from_opts(opts)
-    logger = Logger.get_logger(verbosity)
+    log_format = opts.get("--log-format") or "text"
+    if isinstance(log_format, list):
+        log_format = log_format[-1]
+    try:
+        logger = Logger.configure_logging(verbosity, log_format)
+    except ValueError as e:
+        raise SystemExit(str(e))
 
-    logger.debug("Run app with options: %s", json.dumps(opts))
+    logger.debug("Run app with options: %s", opts)
 
     for path in opts["--allow-dotenv"]:
+        if not os.path.isfile(path):
+            continue
+        import dotenv
+
         logger.info(f"Loading environment variables from {path}")
         dotenv.load_dotenv(path)
 
@@ -8,21 +8,31 @@ class BuildArgs(BaseModel):
     value: str
 
 
+class BuildConfig(BaseModel):
+    context: t.Optional[str] = None
+    dockerfile: t.Optional[str] = None
+    target: t.Optional[str] = None
+    args: t.Union[t.Dict[str, t.Optional[str]], t.List[str], None] = None
+    x_kaniko: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="x-kaniko")
+
+    class Config:
+        extra = "ignore"
+
+
 class ServiceData(BaseModel):
     image: t.Optional[str] = None
-    build: t.Optional[t.Dict[str, t.Any]] = None
+    build: t.Union[str, BuildConfig, None] = None
+    depends_on: t.Union[t.List[str], t.Dict[str, t.Any], None] = None
+    deploy: t.Optional[t.Dict[str, t.Any]] = None
+    profiles: t.Optional[t.List[str]] = None
+    x_kaniko: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="x-kaniko")
 
     class Config:
         extra = "ignore"
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        if self.build is None:
-            self.build = {}
-
 
 class DockerComposeFile(BaseModel):
-    services: t.Dict[str, ServiceData]
+    services: t.Dict[str, ServiceData] = Field(default_factory=dict)
 
     class Config:
         extra = "ignore"
@@ -1,2 +1,13 @@
+import os
+
 # Script version
 SCRIPT_VERSION = "1.1.0"
+
+# Local state (build index, caches) shared between invocations
+CACHE_DIR = os.environ.get(
+    "KANIKO_WRAPPER_CACHE_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+        "kaniko-wrapper",
+    ),
+)
@@ -0,0 +1,117 @@
+"""Stand-in for ``/kaniko/executor`` used by the backend tests.
+
+Accepts the executor flags the wrapper passes, checks the context and
+Dockerfile exist, echoes the Dockerfile instructions the way kaniko logs them
+and reports a pushed digest. ``RUN exit <code>`` makes the build fail and
+``RUN sleep <seconds>`` makes it slow.
+
+The build arg ``FAKE_FLAKY=<file>`` makes it fail intermittently: the file
+holds a count and a failure kind (``pull``, ``push`` or ``auth``); while the
+count is positive each run decrements it and fails with a registry error.
+With ``--tar-path`` the "image" it saves is the Dockerfile.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tarfile
+import time
+import typing as t
+
+
+def read_dockerfile(context: str, dockerfile: str) -> str:
+    if context.startswith("tar://"):
+        with tarfile.open(context[len("tar://") :]) as archive:
+            return archive.extractfile(dockerfile).read().decode()
+    if not os.path.isabs(dockerfile):
+        dockerfile = os.path.join(context, dockerfile)
+    with open(dockerfile) as file:
+        return file.read()
+
+
+FAILURES = {
+    "pull": "error building image: GET https://registry.local/v2/base/manifests/1: "
+    "TOOMANYREQUESTS: You have reached your pull rate limit",
+    "push": "error pushing image: failed to push to destination {image}: "
+    "PUT https://registry.local/v2/app/blobs/uploads: "
+    "unexpected status code 503 Service Unavailable",
+    "auth": "error pushing image: failed to push to destination {image}: "
+    "UNAUTHORIZED: authentication required; 503",
+}
+
+
+def flaky_failure(state_file: str) -> t.Optional[str]:
+    with open(state_file) as file:
+        count, kind = file.read().split()
+    if int(count) <= 0:
+        return None
+    with open(state_file, "w") as file:
+        file.write(f"{int(count) - 1} {kind}")
+    return kind
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--context", required=True)
+    parser.add_argument("--dockerfile", required=True)
+    parser.add_argument("--destination", action="append", default=[])
+    parser.add_argument("--no-push", action="store_true")
+    parser.add_argument("--target")
+    parser.add_argument("--build-arg", action="append", default=[])
+    parser.add_argument("--cleanup", action="store_true")
+    parser.add_argument("--digest-file")
+    parser.add_argument("--image-name-with-digest-file")
+    parser.add_argument("--tar-path")
+    args, _ = parser.parse_known_args()
+
+    try:
+        dockerfile = read_dockerfile(args.context, args.dockerfile)
+    except (OSError, KeyError) as e:
+        print(f"error resolving dockerfile path: {e}", file=sys.stderr)
+        return 1
+
+    build_args = dict(arg.split("=", 1) for arg in args.build_arg)
+    failure = None
+    if "FAKE_FLAKY" in build_args:
+        failure = flaky_failure(build_args["FAKE_FLAKY"])
+    print(f"INFO[0000] Cache enabled: {'--cache=true' in sys.argv}", flush=True)
+    if failure == "pull":
+        print(FAILURES[failure], file=sys.stderr)
+        return 1
+
+    for tick, line in enumerate(dockerfile.splitlines()):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        print(f"INFO[{tick:04d}] {line}", flush=True)
+        if line.startswith("RUN exit "):
+            return int(line.split()[-1])
+        if line.startswith("RUN sleep "):
+            time.sleep(float(line.split()[-1]))
+
+    if args.tar_path:
+        with open(args.tar_path, "w") as file:
+            file.write(dockerfile)
+    for destination in args.destination:
+        print(f"INFO[0099] Pushing image to {destination}", flush=True)
+    if failure is not None:
+        image = ", ".join(args.destination)
+        print(FAILURES[failure].format(image=image), file=sys.stderr)
+        return 1
+
+    digest = hashlib.sha256(" ".join(sys.argv[1:]).encode()).hexdigest()
+    repositories = [destination.split(":")[0] for destination in args.destination]
+    for repository in repositories:
+        print(f"INFO[0100] Pushed {repository}@sha256:{digest}")
+    if args.digest_file:
+        with open(args.digest_file, "w") as file:
+            file.write(f"sha256:{digest}")
+    if args.image_name_with_digest_file:
+        with open(args.image_name_with_digest_file, "w") as file:
+            file.write("\n".join(f"{name}@sha256:{digest}" for name in repositories))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import asyncio
+import io
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.async_builder import AsyncKanikoBuilder
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.helpers.logger_file import Logger
+
+
+class ScriptBuilder(AsyncKanikoBuilder):
+    """Runs a Python snippet per service instead of a kaniko container."""
+
+    def __init__(self, scripts, **kwargs):
+        super().__init__("docker-compose.yml", "kaniko", False, False, **kwargs)
+        self.scripts = scripts
+
+    def build_command(self, service):
+        return [sys.executable, "-c", self.scripts[service.image]]
+
+
+def graph(dependencies):
+    services = specs_from_dicts({name: {"image": name} for name in dependencies})
+    return BuildGraph(services, dependencies, {})
+
+
+class TestAsyncKanikoBuilder(unittest.TestCase):
+    def setUp(self):
+        # Output queued by earlier tests must not reach this test's stdout.
+        Logger.flush()
+        patcher = patch("sys.stdout", io.StringIO())
+        self.stdout = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(Logger.flush)
+
+    def output(self):
+        Logger.flush()
+        return self.stdout.getvalue()
+
+    def test_dependencies_and_concurrency(self):
+        sleep = "import time; print('start'); time.sleep(0.2); print('done')"
+        builder = ScriptBuilder({name: sleep for name in "abcd"}, max_parallel=2)
+
+        started = time.monotonic()
+        asyncio.run(
+            builder.run_graph(graph({"a": set(), "b": set(), "c": {"a"}, "d": set()}))
+        )
+        elapsed = time.monotonic() - started
+
+        # Four 0.2s builds, two at a time.
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertLess(elapsed, 2.0)
+        lines = self.output().splitlines()
+        self.assertLess(lines.index("[a] done"), lines.index("[c] start"))
+
+    def test_failure_propagates_and_skips_dependents(self):
+        builder = ScriptBuilder(
+            {"a": "import sys; print('bad'); sys.exit(2)", "b": "print('never')"}
+        )
+        with self.assertRaises(subprocess.CalledProcessError) as raised:
+            asyncio.run(builder.run_graph(graph({"a": set(), "b": {"a"}})))
+        self.assertEqual(raised.exception.returncode, 2)
+        self.assertNotIn("[b] never", self.output())
+
+    def test_timeout_terminates_build(self):
+        builder = ScriptBuilder({"a": "import time; time.sleep(30)"}, build_timeout=0.3)
+        started = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            asyncio.run(builder.run_graph(graph({"a": set()})))
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_cancellation_terminates_build(self):
+        builder = ScriptBuilder({"a": "import time; time.sleep(30)"})
+
+        async def cancel_soon():
+            task = asyncio.ensure_future(builder.run_graph(graph({"a": set()})))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            await task
+
+        started = time.monotonic()
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel_soon())
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_signal_exits_with_its_code(self):
+        builder = ScriptBuilder(
+            {"a": "import time; time.sleep(30)", "b": "print('never')"}
+        )
+
+        async def interrupt_soon():
+            asyncio.get_running_loop().call_later(
+                0.3, os.kill, os.getpid(), signal.SIGINT
+            )
+            await builder.run_graph(graph({"a": set(), "b": {"a"}}))
+
+        started = time.monotonic()
+        with self.assertRaises(SystemExit) as raised:
+            asyncio.run(interrupt_soon())
+        self.assertEqual(raised.exception.code, 130)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertNotIn("[b] never", self.output())
+
+    def test_long_lines_are_split(self):
+        long_line = "import sys; sys.stdout.write('x' * (3 << 20) + '\\ndone')"
+        builder = ScriptBuilder({"a": long_line})
+        asyncio.run(builder.run_graph(graph({"a": set()})))
+        lines = self.output().splitlines()
+        self.assertEqual(lines[-1], "[a] done")
+        chunks = [line for line in lines if line.startswith("[a] x")]
+        self.assertEqual(sum(len(line) - 4 for line in chunks), 3 << 20)
@@ -0,0 +1,210 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.backends import (
+    BuildRequest,
+    DirectExecutorBackend,
+    DockerRunBackend,
+    create_backend,
+)
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.context_packer import ContextPacker
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoExecutor
+from kaniko.commands.build.kaniko.metrics import FAILED, SUCCESS, BuildMetrics
+from kaniko.helpers.logger_file import Logger
+
+FAKE_EXECUTOR = [
+    sys.executable,
+    os.path.join(os.path.dirname(__file__), "fake_executor.py"),
+]
+FAKE_CRANE = [sys.executable, os.path.join(os.path.dirname(__file__), "fake_crane.py")]
+
+
+class TestBackends(unittest.TestCase):
+    def request(self, **kwargs):
+        values = dict(
+            service_name="api",
+            context="ctx",
+            dockerfile="Dockerfile",
+            image="org/api:1",
+            build_args={"VERSION": "1"},
+            push=True,
+            cache_options=KanikoCacheOptions(cache=True, cache_dir="/var/cache/base"),
+        )
+        values.update(kwargs)
+        return BuildRequest(**values)
+
+    def test_direct_command(self):
+        command = DirectExecutorBackend().build_command(self.request(), "run")
+        context = os.path.abspath("ctx")
+        self.assertEqual(
+            command,
+            [
+                "/kaniko/executor",
+                "--context",
+                context,
+                "--dockerfile",
+                os.path.join(context, "Dockerfile"),
+                "--snapshot-mode=redo",
+                "--cache=true",
+                "--cache-dir=/var/cache/base",
+                "--cleanup",
+                "--destination",
+                "org/api:1",
+                "--build-arg",
+                "VERSION=1",
+            ],
+        )
+
+        archive = self.request(context_archive="/tmp/ctx.tar.gz", target="prod")
+        command = DirectExecutorBackend().build_command(archive, "run")
+        self.assertEqual(
+            command[1:7],
+            [
+                "--context",
+                "tar:///tmp/ctx.tar.gz",
+                "--dockerfile",
+                "Dockerfile",
+                "--target",
+                "prod",
+            ],
+        )
+
+    def test_destinations_and_digest_files(self):
+        request = self.request(
+            destinations=("org/api:latest", "org/api:1"),
+            digest_paths=("/out/api.digest", "/out/api.image"),
+        )
+        command = DockerRunBackend("kaniko").build_command(request, "run")
+        self.assertIn("/out:/digests", command)
+        self.assertIn("--digest-file=/digests/api.digest", command)
+        self.assertIn("--image-name-with-digest-file=/digests/api.image", command)
+        destinations = [
+            command[index + 1]
+            for index, arg in enumerate(command)
+            if arg == "--destination"
+        ]
+        self.assertEqual(destinations, ["org/api:1", "org/api:latest"])
+
+        command = DirectExecutorBackend().build_command(request, "run")
+        self.assertIn("--digest-file=/out/api.digest", command)
+
+    def test_docker_command(self):
+        command = DockerRunBackend("kaniko").build_command(self.request(), "run")
+        self.assertEqual(
+            command[:5], ["docker", "run", "--rm", "--name", "kaniko-run-api"]
+        )
+        self.assertIn("/var/cache/base:/cache:ro", command)
+        self.assertIn("--cache-dir=/cache", command)
+
+    def test_saved_image_is_pushed_with_crane(self):
+        request = self.request(tar_path="/tmp/out/image.tar")
+        command = DockerRunBackend("kaniko").build_command(request, "run")
+        self.assertIn("/tmp/out:/tarball", command)
+        self.assertIn("--tar-path=/tarball/image.tar", command)
+        command = DockerRunBackend("kaniko").push_tarball_command(
+            "/tmp/out/image.tar", "org/api:1"
+        )
+        self.assertIn("/tmp/out/image.tar:/image.tar:ro", command)
+        self.assertEqual(command[-3:], ["push", "/image.tar", "org/api:1"])
+
+        command = DirectExecutorBackend().build_command(request, "run")
+        self.assertIn("--tar-path=/tmp/out/image.tar", command)
+        with patch("shutil.which", return_value=None):
+            self.assertIsNone(
+                DirectExecutorBackend().push_tarball_command("image.tar", "org/api:1")
+            )
+
+    def test_create_backend(self):
+        self.assertEqual(create_backend("direct", "kaniko").max_parallel, 1)
+        with self.assertRaises(ValueError):
+            create_backend("podman", "kaniko")
+
+
+class TestDirectExecutor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "app")
+        os.makedirs(self.context)
+        self.metrics = BuildMetrics()
+        # Output queued by earlier tests must not reach this test's stdout.
+        Logger.flush()
+        patcher = patch("sys.stdout", io.StringIO())
+        self.stdout = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(Logger.flush)
+
+    def output(self):
+        Logger.flush()
+        return self.stdout.getvalue()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def executor(self, **kwargs):
+        return KanikoExecutor(
+            "kaniko",
+            push=True,
+            dry_run=False,
+            metrics=self.metrics,
+            backend=DirectExecutorBackend(FAKE_EXECUTOR),
+            **kwargs,
+        )
+
+    def write_dockerfile(self, content):
+        with open(os.path.join(self.context, "Dockerfile"), "w") as file:
+            file.write(content)
+
+    def test_build_runs_executor(self):
+        self.write_dockerfile("FROM alpine\nRUN true\n")
+        self.executor().run_build("app", self.context, "Dockerfile", "org/app:1", {})
+
+        metrics = self.metrics.service("app")
+        self.assertEqual(metrics.status, SUCCESS)
+        self.assertTrue(metrics.digest.startswith("sha256:"))
+        self.assertEqual(
+            [step["instruction"] for step in metrics.steps], ["FROM", "RUN"]
+        )
+        self.assertIn("[app] INFO[0001] RUN true", self.output())
+
+    def test_digest_files(self):
+        self.write_dockerfile("FROM alpine\n")
+        digest_dir = os.path.join(self.tmp.name, "digests")
+        self.executor(digest_dir=digest_dir).run_build(
+            "app",
+            self.context,
+            "Dockerfile",
+            "org/app:1",
+            {},
+            destinations=["org/app:latest", "mirror/app:1"],
+        )
+        digest = self.metrics.service("app").digest
+        with open(os.path.join(digest_dir, "app.digest")) as file:
+            self.assertEqual(file.read(), digest)
+        with open(os.path.join(digest_dir, "app.image")) as file:
+            self.assertEqual(
+                file.read().splitlines(),
+                [f"org/app@{digest}", f"org/app@{digest}", f"mirror/app@{digest}"],
+            )
+
+    def test_packed_context(self):
+        self.write_dockerfile("FROM alpine\n")
+        packer = ContextPacker(os.path.join(self.tmp.name, "contexts"))
+        self.executor(context_packer=packer).run_build(
+            "app", self.context, "Dockerfile", "org/app:1", {}
+        )
+        self.assertEqual(self.metrics.service("app").status, SUCCESS)
+
+    def test_failed_build(self):
+        self.write_dockerfile("FROM alpine\nRUN exit 3\n")
+        with self.assertRaises(subprocess.CalledProcessError) as raised:
+            self.executor().run_build(
+                "app", self.context, "Dockerfile", "org/app:1", {}
+            )
+        self.assertEqual(raised.exception.returncode, 3)
+        self.assertEqual(self.metrics.service("app").status, FAILED)
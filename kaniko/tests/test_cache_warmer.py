@@ -0,0 +1,90 @@
+import io
+import sys
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.backends import DirectExecutorBackend
+from kaniko.commands.build.kaniko.cache_warmer import (
+    CacheWarmer,
+    collect_base_images,
+    logger,
+)
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.helpers.logger_file import Logger
+from kaniko.tests.test_backends import FAKE_EXECUTOR
+
+RUN_STREAMING = "kaniko.commands.build.kaniko.cache_warmer.run_streaming"
+
+
+class TestCollectBaseImages(unittest.TestCase):
+    def test_distinct_external_images(self):
+        services = specs_from_dicts(
+            {
+                "base": {"image": "org/base:1"},
+                "api": {"image": "org/api:1"},
+                "worker": {"image": "org/worker:1"},
+            }
+        )
+        base_images = {
+            "base": ["python:3.11"],
+            "api": ["org/base:1", "python:3.11"],
+            "worker": ["python:3.11", "alpine", "alpine:latest"],
+        }
+        graph = BuildGraph(services, {name: set() for name in services}, base_images)
+        self.assertEqual(collect_base_images(graph), ["python:3.11", "alpine"])
+
+
+class TestCacheWarmer(unittest.TestCase):
+    def test_warm_command(self):
+        warmer = CacheWarmer("/tmp/cache", warmer_image="warmer:1")
+        command = warmer.warm_command("python:3.11")
+        self.assertIn("/tmp/cache:/cache", command)
+        self.assertEqual(
+            command[-3:], ["warmer:1", "--cache-dir=/cache", "--image=python:3.11"]
+        )
+
+    def test_direct_backend_runs_the_warmer_binary(self):
+        warmer = CacheWarmer(
+            "/tmp/cache", warmer=DirectExecutorBackend(FAKE_EXECUTOR).warmer
+        )
+        self.assertEqual(
+            warmer.warm_command("python:3.11"),
+            ["/kaniko/warmer", "--cache-dir=/tmp/cache", "--image=python:3.11"],
+        )
+        # Not in the executor image: skipped instead of failing every image.
+        with patch(RUN_STREAMING) as mock_run, patch("os.makedirs"):
+            self.assertEqual(warmer.warm(["python:3.11"]), [])
+        mock_run.assert_not_called()
+
+    def test_output_is_streamed(self):
+        warmer = CacheWarmer(
+            "/tmp/cache", warmer=[sys.executable, "-c", "print('pulled')"]
+        )
+        with patch("sys.stdout", io.StringIO()) as stdout, patch("os.makedirs"):
+            self.assertEqual(warmer.warm(["python:3.11"]), ["python:3.11"])
+            Logger.flush()
+        self.assertIn("[warmer] pulled", stdout.getvalue())
+
+    def test_failures_are_not_fatal(self):
+        def run(command, output):
+            if command[-1] == "--image=broken":
+                output.write_line("UNAUTHORIZED")
+                return 1
+            return 0
+
+        with patch(RUN_STREAMING, side_effect=run) as mock_run, patch(
+            "os.makedirs"
+        ), patch("sys.stdout", io.StringIO()), self.assertLogs(
+            logger, "WARNING"
+        ) as logs:
+            warmed = CacheWarmer("/tmp/cache").warm(["python:3.11", "broken"])
+
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertEqual(warmed, ["python:3.11"])
+        self.assertIn("UNAUTHORIZED", "\n".join(logs.output))
+
+    def test_dry_run_starts_nothing(self):
+        with patch(RUN_STREAMING) as mock_run:
+            CacheWarmer("/tmp/cache", dry_run=True).warm(["python:3.11"])
+        mock_run.assert_not_called()
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+from kaniko.commands.build.kaniko.changes import ChangeDetector, changed_paths
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.helpers.castom_exeption import ChangeDetectionFailed
+
+
+class TestChangedServices(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo = os.path.realpath(self.tmp.name)
+        self.git("init", "-q")
+        self.write("docker-compose.yml", "services: {}\n")
+        self.write("base/Dockerfile", "FROM alpine\n")
+        self.write("api/Dockerfile", "FROM org/base\n")
+        self.write("api/.dockerignore", "*.md\n")
+        self.write("api/app.py", "print(1)\n")
+        self.write("web/Dockerfile", "FROM nginx\n")
+        self.git("add", ".")
+        self.git("commit", "-q", "-m", "initial")
+
+        services = specs_from_dicts(
+            {
+                "base": {"image": "org/base", "build": self.path("base")},
+                "api": {"image": "org/api", "build": self.path("api")},
+                "web": {"image": "org/web", "build": self.path("web")},
+            }
+        )
+        self.graph = BuildGraph(
+            services, {"base": set(), "api": {"base"}, "web": set()}, {}
+        )
+        self.detector = ChangeDetector([self.path("docker-compose.yml")])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.repo, name)
+
+    def git(self, *args):
+        subprocess.run(
+            [
+                "git",
+                "-C",
+                self.repo,
+                "-c",
+                "user.name=t",
+                "-c",
+                "user.email=t@t",
+                *args,
+            ],
+            check=True,
+            capture_output=True,
+        )
+
+    def write(self, name, content):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), "w") as file:
+            file.write(content)
+
+    def affected(self):
+        return self.detector.affected(self.graph, changed_paths("HEAD", self.repo))
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.affected(), set())
+
+    def test_change_propagates_to_dependents(self):
+        self.write("base/Dockerfile", "FROM alpine:3.20\n")
+        self.assertEqual(self.affected(), {"base", "api"})
+
+    def test_untracked_and_ignored_files(self):
+        self.write("api/README.md", "docs")
+        self.assertEqual(self.affected(), set())
+        self.write("api/new.py", "print(2)\n")
+        self.assertEqual(self.affected(), {"api"})
+
+    def test_committed_change_and_compose_file(self):
+        self.write("web/index.html", "<html/>")
+        self.git("add", ".")
+        self.git("commit", "-q", "-m", "web")
+        self.assertEqual(
+            self.detector.affected(self.graph, changed_paths("HEAD~1", self.repo)),
+            {"web"},
+        )
+
+        self.write("docker-compose.yml", "services: {web: {}}\n")
+        self.assertEqual(self.affected(), {"base", "api", "web"})
+
+    def test_unknown_ref(self):
+        with self.assertRaises(ChangeDetectionFailed):
+            changed_paths("no-such-ref", self.repo)
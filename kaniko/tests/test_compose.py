@@ -0,0 +1,216 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.compose import interpolate
+from kaniko.commands.build.kaniko.kaniko_wrapper import DockerComposeLoader
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.commands.build.kaniko.services import (
+    ComposeCache,
+    ServiceSpec,
+    active_services,
+    specs_from_dicts,
+)
+from kaniko.helpers.castom_exeption import (
+    InvalidComposeFile,
+    UnknownService,
+    UnsetVariable,
+)
+
+COMPOSE = """
+x-common: &common
+  build:
+    context: ./api
+    args:
+      - VERSION=1
+      - TOKEN
+    x-kaniko:
+      cache: true
+services:
+  api:
+    <<: *common
+    image: org/api:1
+    deploy:
+      resources:
+        limits: {cpus: "2", memory: 1g}
+  worker:
+    image: org/worker:1
+    build: ./worker
+    depends_on:
+      api:
+        condition: service_started
+  db:
+    image: postgres:16
+"""
+
+
+class TestDockerComposeLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.compose_file = os.path.join(self.tmp.name, "docker-compose.yml")
+        self.write(COMPOSE)
+        self.cache = ComposeCache(os.path.join(self.tmp.name, "cache"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, content):
+        with open(self.compose_file, "w") as file:
+            file.write(content)
+
+    def load(self):
+        return DockerComposeLoader(self.compose_file, self.cache).load()
+
+    def test_services_are_normalized(self):
+        services = self.load()
+        api, worker = services["api"], services["worker"]
+        self.assertEqual(list(services), ["api", "worker", "db"])
+        self.assertEqual(api.context, "./api")
+        self.assertEqual(api.args, {"VERSION": "1", "TOKEN": None})
+        self.assertEqual(api.extension, {"cache": True})
+        self.assertEqual(api.deploy_resources, {"cpus": "2", "memory": "1g"})
+        self.assertEqual(worker.dockerfile_path, os.path.join("./worker", "Dockerfile"))
+        self.assertEqual(worker.depends_on, ["api"])
+        with patch.dict(os.environ, {"TOKEN": "secret"}):
+            self.assertEqual(api.build_args(), {"VERSION": "1", "TOKEN": "secret"})
+
+    def test_unchanged_file_is_not_parsed_again(self):
+        first = self.load()
+        with patch.object(DockerComposeLoader, "parse") as parse:
+            self.assertEqual(self.load(), first)
+        parse.assert_not_called()
+
+        self.write(COMPOSE.replace("org/worker:1", "org/worker:2"))
+        self.assertEqual(self.load()["worker"].image, "org/worker:2")
+
+    def test_invalid_service_is_rejected(self):
+        self.write("services:\n  api:\n    build: [not, valid]\n")
+        with self.assertRaises(InvalidComposeFile):
+            self.load()
+
+
+class TestServiceSpec(unittest.TestCase):
+    def test_tuple_round_trip(self):
+        spec = ServiceSpec.from_dict(
+            "api", {"image": "api", "build": {"args": {"A": 1}}}
+        )
+        self.assertEqual(ServiceSpec.from_tuple(spec.to_tuple()), spec)
+        self.assertEqual(spec.args, {"A": "1"})
+
+    def test_destinations(self):
+        spec = ServiceSpec.from_dict(
+            "api",
+            {
+                "image": "registry:5000/org/api:${GIT_SHA}",
+                "x-kaniko": {
+                    "tags": ["$GIT_BRANCH", "latest", "${GIT_SHA}"],
+                    "destinations": "mirror/api:${GIT_SHA}",
+                },
+            },
+        )
+        self.assertEqual(
+            spec.destinations({"GIT_SHA": "abc", "GIT_BRANCH": "main"}),
+            [
+                "registry:5000/org/api:abc",
+                "registry:5000/org/api:main",
+                "registry:5000/org/api:latest",
+                "mirror/api:abc",
+            ],
+        )
+        with self.assertRaises(UnsetVariable):
+            spec.destinations({"GIT_SHA": "abc"})
+
+    def test_interpolate(self):
+        environ = {"A": "1", "EMPTY": ""}
+        self.assertEqual(interpolate("$A-${A}-$$A", environ), "1-1-$A")
+        self.assertEqual(interpolate("${EMPTY:-x}${EMPTY-y}${B-z}", environ), "xz")
+        with self.assertRaises(UnsetVariable) as raised:
+            interpolate("${B:?set B}", environ)
+        self.assertIn("set B", str(raised.exception))
+
+
+class TestComposeOverlays(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ComposeCache(os.path.join(self.tmp.name, "cache"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def test_overrides_merge_like_docker_compose(self):
+        base = self.write(
+            "docker-compose.yml",
+            "services:\n"
+            "  api:\n"
+            "    image: org/api:dev\n"
+            "    build:\n"
+            "      context: ./api\n"
+            "      args: [VERSION=1, DEBUG=1]\n"
+            "    depends_on: [db]\n"
+            "  db:\n"
+            "    image: postgres:16\n",
+        )
+        prod = self.write(
+            "docker-compose.prod.yml",
+            "services:\n"
+            "  api:\n"
+            "    image: org/api:prod\n"
+            "    build:\n"
+            "      args: {DEBUG: '0'}\n"
+            "    depends_on:\n"
+            "      cache: {condition: service_healthy}\n"
+            "  cache:\n"
+            "    image: redis:7\n",
+        )
+        services = DockerComposeLoader([base, prod], self.cache).load()
+        api = services["api"]
+        self.assertEqual(api.image, "org/api:prod")
+        self.assertEqual(api.context, "./api")
+        self.assertEqual(api.args, {"VERSION": "1", "DEBUG": "0"})
+        self.assertEqual(api.depends_on, ["db", "cache"])
+        self.assertEqual(list(services), ["api", "db", "cache"])
+
+        # The order of the files is part of the cache key.
+        reversed_api = DockerComposeLoader([prod, base], self.cache).load()["api"]
+        self.assertEqual(reversed_api.image, "org/api:dev")
+
+
+class TestServiceSelection(unittest.TestCase):
+    def setUp(self):
+        self.services = specs_from_dicts(
+            {
+                "base": {"image": "org/base"},
+                "api": {"image": "org/api", "depends_on": ["base"]},
+                "docs": {"image": "org/docs", "profiles": ["docs"]},
+                "debug": {"image": "org/debug", "profiles": ["debug", "docs"]},
+            }
+        )
+
+    def graph(self, **kwargs):
+        return BuildGraph.from_services(self.services, lambda path, args: [], **kwargs)
+
+    def test_profiles(self):
+        self.assertEqual(list(active_services(self.services)), ["base", "api"])
+        self.assertEqual(
+            list(active_services(self.services, ["docs"])),
+            ["base", "api", "docs", "debug"],
+        )
+
+    def test_named_services(self):
+        graph = self.graph(targets=["api", "docs"], with_dependencies=False)
+        self.assertEqual(list(graph.services), ["api", "docs"])
+        self.assertEqual(graph.dependencies["api"], set())
+
+        graph = self.graph(targets=["api"])
+        self.assertEqual(list(graph.services), ["base", "api"])
+        self.assertEqual(graph.dependencies["api"], {"base"})
+
+        with self.assertRaises(UnknownService):
+            self.graph(targets=["nope"])
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko import context_hasher
+from kaniko.commands.build.kaniko.context_hasher import (
+    ContextHasher,
+    FileDigestCache,
+    hash_file,
+)
+
+
+class TestContextHasher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "context")
+        self.cache_path = os.path.join(self.tmp.name, "digests.json")
+        self.write("Dockerfile", b"FROM alpine\n")
+        self.write("src/app.py", b"print('hello')\n")
+        self.write("vendor/blob.bin", os.urandom(256 * 1024))
+        self.write(".dockerignore", b".git\n")
+        self.write(".git/HEAD", b"ref: refs/heads/main\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.context, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+        # Age the file past the racy-mtime window so its digest gets cached.
+        past = time.time() - 60
+        os.utime(path, (past, past))
+
+    def hasher(self):
+        return ContextHasher(FileDigestCache(self.cache_path), workers=2)
+
+    def test_mmap_digest_matches_plain_hash(self):
+        path = os.path.join(self.context, "vendor/blob.bin")
+        with open(path, "rb") as file:
+            expected = hashlib.sha256(file.read()).hexdigest()
+        self.assertEqual(hash_file(path), expected)
+
+    def test_unchanged_files_are_not_read_again(self):
+        first = self.hasher().digest(self.context)
+
+        hasher = self.hasher()
+        with patch.object(
+            context_hasher, "hash_file", wraps=context_hasher.hash_file
+        ) as spy:
+            second = hasher.digest(self.context)
+
+        self.assertEqual(first, second)
+        spy.assert_not_called()
+        self.assertEqual(hasher.last_stats.files, 4)
+        self.assertEqual(hasher.last_stats.hashed_files, 0)
+
+    def test_changed_file_changes_digest(self):
+        first = self.hasher().digest(self.context)
+        self.write("src/app.py", b"print('changed')\n")
+
+        hasher = self.hasher()
+        second = hasher.digest(self.context)
+        self.assertNotEqual(first, second)
+        self.assertEqual(hasher.last_stats.hashed_files, 1)
+
+    def test_ignored_files_do_not_matter(self):
+        first = self.hasher().digest(self.context)
+        self.write(".git/HEAD", b"ref: refs/heads/other\n")
+        self.assertEqual(first, self.hasher().digest(self.context))
+
+    def test_process_pool(self):
+        expected = self.hasher().digest(self.context)
+        hasher = ContextHasher(
+            FileDigestCache(os.path.join(self.tmp.name, "other.json")),
+            workers=2,
+            use_processes=True,
+        )
+        self.assertEqual(hasher.digest(self.context), expected)
+        self.assertGreater(hasher.last_stats.bytes_per_second, 0)
@@ -0,0 +1,96 @@
+import os
+import tarfile
+import tempfile
+import unittest
+
+from kaniko.commands.build.kaniko.context_hasher import ContextHasher, FileDigestCache
+from kaniko.commands.build.kaniko.context_packer import ContextPacker
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoCommandBuilder
+
+
+class TestContextPacker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "context")
+        self.write("Dockerfile", b"FROM alpine\n")
+        self.write("src/app.py", b"print('hello')\n")
+        self.write("node_modules/lib.js", b"module.exports = 1\n")
+        self.write(".dockerignore", b"node_modules\n.git\nDockerfile\n.dockerignore\n")
+        self.write(".git/HEAD", b"ref: refs/heads/main\n")
+        self.packer = self.make_packer()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_packer(self, **kwargs):
+        hasher = ContextHasher(FileDigestCache(os.path.join(self.tmp.name, "d.json")))
+        return ContextPacker(os.path.join(self.tmp.name, "contexts"), hasher, **kwargs)
+
+    def write(self, name, content):
+        path = os.path.join(self.context, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+
+    def test_archive_honors_dockerignore(self):
+        path = self.packer.pack(self.context, "Dockerfile")
+        with tarfile.open(path) as archive:
+            members = archive.getmembers()
+        self.assertEqual(
+            [member.name for member in members],
+            [".dockerignore", "Dockerfile", "src", "src/app.py"],
+        )
+        self.assertTrue(all(member.mtime == 0 for member in members))
+        self.assertTrue(all(member.uid == 0 for member in members))
+
+    def test_archive_is_reproducible_and_shared(self):
+        first = self.packer.pack(self.context, "Dockerfile")
+        with open(first, "rb") as file:
+            content = file.read()
+        os.remove(first)
+
+        other = self.make_packer()
+        self.assertEqual(other.pack(self.context, "Dockerfile"), first)
+        with open(first, "rb") as file:
+            self.assertEqual(file.read(), content)
+
+        self.write("node_modules/lib.js", b"module.exports = 2\n")
+        self.assertEqual(other.pack(self.context, "Dockerfile"), first)
+        self.write("src/app.py", b"print('bye')\n")
+        self.assertNotEqual(other.pack(self.context, "Dockerfile"), first)
+
+    def test_dry_run_and_pruning(self):
+        packer = self.make_packer(max_archives=1)
+        path = packer.pack(self.context, "Dockerfile", dry_run=True)
+        self.assertFalse(os.path.exists(path))
+
+        packer.pack(self.context, "Dockerfile")
+        self.write("src/app.py", b"print('bye')\n")
+        newest = packer.pack(self.context, "Dockerfile")
+        self.assertEqual(os.listdir(packer.cache_dir), [os.path.basename(newest)])
+
+    def test_dockerfile_outside_context(self):
+        with self.assertRaises(ValueError):
+            self.packer.pack(self.context, "../Dockerfile")
+
+    def test_command_uses_tar_context(self):
+        command = KanikoCommandBuilder("kaniko").build_command(
+            self.context,
+            "docker/Dockerfile",
+            "org/app",
+            {},
+            False,
+            context_archive="/cache/abc.tar.gz",
+        )
+        self.assertIn("/cache/abc.tar.gz:/workspace/context.tar.gz:ro", command)
+        self.assertNotIn(f"{self.context}:/workspace", command)
+        index = command.index("--context")
+        self.assertEqual(
+            command[index : index + 4],
+            [
+                "--context",
+                "tar:///workspace/context.tar.gz",
+                "--dockerfile",
+                "docker/Dockerfile",
+            ],
+        )
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.context_hasher import ContextHasher, FileDigestCache
+from kaniko.commands.build.kaniko.context_packer import ContextPacker
+from kaniko.commands.build.kaniko.contexts import SharedContexts, group_by_context
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+
+
+class TestSharedContexts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "app")
+        os.makedirs(self.context)
+        for name in ("Dockerfile", "Dockerfile.worker", "app.py"):
+            with open(os.path.join(self.context, name), "w") as file:
+                file.write(f"{name}\n")
+        self.hasher = ContextHasher(
+            FileDigestCache(os.path.join(self.tmp.name, "digests.json"))
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_group_by_context(self):
+        services = specs_from_dicts(
+            {
+                "api": {"build": {"context": self.context, "target": "api"}},
+                "worker": {"build": self.context + "/"},
+                "web": {"build": self.tmp.name},
+            }
+        )
+        self.assertEqual(services["api"].target, "api")
+        self.assertEqual(
+            group_by_context(services),
+            {
+                os.path.realpath(self.context): ["api", "worker"],
+                os.path.realpath(self.tmp.name): ["web"],
+            },
+        )
+
+    def test_context_is_prepared_once(self):
+        packer = ContextPacker(os.path.join(self.tmp.name, "contexts"), self.hasher)
+        contexts = SharedContexts(self.hasher, packer)
+        with patch.object(
+            self.hasher, "digest", wraps=self.hasher.digest
+        ) as digest, patch.object(packer, "pack", wraps=packer.pack) as pack:
+            with ThreadPoolExecutor(4) as pool:
+                archives = list(
+                    pool.map(
+                        lambda dockerfile: contexts.archive(self.context, dockerfile),
+                        ["Dockerfile", "Dockerfile.worker"] * 4,
+                    )
+                )
+        self.assertEqual(digest.call_count, 1)
+        self.assertEqual(pack.call_count, 2)
+        # Both Dockerfiles are part of the context, so the archive is shared.
+        self.assertEqual(len(set(archives)), 1)
+        self.assertEqual(len(os.listdir(packer.cache_dir)), 1)
+
+    def test_without_packer(self):
+        self.assertIsNone(SharedContexts(self.hasher).archive(self.context, "x"))
@@ -0,0 +1,194 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.farm import Coordinator, parse_address
+from kaniko.commands.build.kaniko.plan import create_plan
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.helpers.castom_exeption import FailedBuild
+from kaniko.helpers.logger_file import Logger
+from kaniko.tests.test_backends import FAKE_EXECUTOR
+
+WORKER_SCRIPT = """
+import sys
+from kaniko.commands.build.kaniko.backends import DirectExecutorBackend
+from kaniko.commands.build.kaniko.farm import Worker
+
+Worker(sys.argv[1], DirectExecutorBackend(sys.argv[3:]), sys.argv[2],
+       poll_interval=0.1).run()
+"""
+
+
+def plan(dependencies, contexts=None):
+    services = specs_from_dicts(
+        {
+            name: {"image": f"org/{name}", "build": (contexts or {}).get(name, ".")}
+            for name in dependencies
+        }
+    )
+    return create_plan(BuildGraph(services, dependencies, {}))
+
+
+class TestCoordinator(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("sys.stdout", io.StringIO())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(Logger.flush)
+
+    def lease(self, coordinator, worker):
+        reply = coordinator.handle(worker, {"type": "lease"})
+        return reply["job"]["service"] if reply["type"] == "job" else reply["type"]
+
+    def finish(self, coordinator, worker, service, status="success"):
+        self.assertEqual(
+            coordinator.handle(worker, {"type": "start", "service": service}),
+            {"type": "ok"},
+        )
+        coordinator.handle(
+            worker, {"type": "result", "service": service, "status": status}
+        )
+
+    def test_dependencies_and_failures(self):
+        coordinator = Coordinator(
+            plan({"base": set(), "app": {"base"}, "cli": {"app"}, "docs": set()})
+        )
+        self.assertEqual(
+            {self.lease(coordinator, "w1"), self.lease(coordinator, "w1")},
+            {"base", "docs"},
+        )
+        self.assertEqual(self.lease(coordinator, "w1"), "wait")
+        self.finish(coordinator, "w1", "base")
+        self.assertEqual(self.lease(coordinator, "w1"), "app")
+        self.finish(coordinator, "w1", "app", "failed")
+        self.assertFalse(coordinator.finished.is_set())
+        self.finish(coordinator, "w1", "docs")
+
+        self.assertTrue(coordinator.finished.is_set())
+        self.assertEqual(self.lease(coordinator, "w1"), "finished")
+        self.assertEqual(coordinator.done, ["base", "docs"])
+        self.assertEqual(list(coordinator.failures), ["app"])
+        self.assertEqual(coordinator.skipped, ["cli"])
+
+    def test_idle_worker_steals_leased_build(self):
+        coordinator = Coordinator(plan({"a": set(), "b": set()}))
+        self.assertEqual(self.lease(coordinator, "busy"), "a")
+        self.assertEqual(self.lease(coordinator, "busy"), "b")
+        self.assertEqual(self.lease(coordinator, "idle"), "b")
+        self.assertEqual(
+            coordinator.handle("busy", {"type": "start", "service": "b"}),
+            {"type": "stolen"},
+        )
+        self.finish(coordinator, "idle", "b")
+        self.assertEqual(coordinator.done, ["b"])
+
+    def test_builds_of_lost_workers_are_queued_again(self):
+        coordinator = Coordinator(plan({"a": set(), "b": set()}), heartbeat_timeout=0)
+        self.assertEqual(self.lease(coordinator, "w1"), "a")
+        coordinator.handle("w1", {"type": "start", "service": "a"})
+        coordinator.disconnect("w1")
+        self.assertEqual(self.lease(coordinator, "w2"), "a")
+
+        time.sleep(0.01)
+        coordinator.reap()
+        self.assertEqual(coordinator.assignments(), {})
+        # A late result of a build that was handed to another worker is ignored.
+        coordinator.handle("w1", {"type": "result", "service": "a", "status": "ok"})
+        self.assertEqual(self.lease(coordinator, "w3"), "a")
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("unix:///run/k.sock")[1], "/run/k.sock")
+        self.assertEqual(parse_address("tcp://:7464")[1], ("0.0.0.0", 7464))
+        self.assertEqual(parse_address("build-host:80")[1], ("build-host", 80))
+        with self.assertRaises(ValueError):
+            parse_address("build-host")
+
+
+class TestBuildFarm(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.address = f"unix://{os.path.join(self.tmp.name, 'farm.sock')}"
+        patcher = patch("sys.stdout", io.StringIO())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(Logger.flush)
+
+    def context(self, name, dockerfile):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(path)
+        with open(os.path.join(path, "Dockerfile"), "w") as file:
+            file.write(dockerfile)
+        return path
+
+    def worker(self, name):
+        process = subprocess.Popen(
+            [sys.executable, "-c", WORKER_SCRIPT, self.address, name, *FAKE_EXECUTOR],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        return process
+
+    def serve(self, coordinator):
+        errors = []
+
+        def serve():
+            try:
+                coordinator.serve(self.address)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        while not os.path.exists(self.address[len("unix://") :]):
+            time.sleep(0.01)
+        return thread, errors
+
+    def wait_for(self, condition, timeout=20):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def test_workers_build_everything_and_survive_a_crash(self):
+        contexts = {
+            "slow": self.context("slow", "FROM alpine\nRUN sleep 30\n"),
+            "base": self.context("base", "FROM alpine\n"),
+            "app": self.context("app", "FROM org/base\nRUN exit 3\n"),
+            "cli": self.context("cli", "FROM org/app\n"),
+        }
+        coordinator = Coordinator(
+            plan(
+                {"slow": set(), "base": set(), "app": {"base"}, "cli": {"app"}},
+                contexts,
+            ),
+            heartbeat_timeout=5,
+        )
+        thread, errors = self.serve(coordinator)
+
+        doomed = self.worker("doomed")
+        self.wait_for(lambda: coordinator.assignments().get("doomed"))
+        victim = coordinator.assignments()["doomed"][0]
+        doomed.kill()
+        self.wait_for(lambda: "doomed" not in coordinator.assignments())
+
+        with open(os.path.join(contexts[victim], "Dockerfile"), "w") as file:
+            file.write("FROM alpine\n")
+        self.worker("w1")
+        self.worker("w2")
+        thread.join(30)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(sorted(coordinator.done), ["base", "slow"])
+        self.assertEqual(list(coordinator.failures), ["app"])
+        self.assertEqual(coordinator.skipped, ["cli"])
+        self.assertIsInstance(errors[0], FailedBuild)
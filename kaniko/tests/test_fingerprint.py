@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.fingerprint import BuildIndex, ContextFingerprinter
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoExecutor
+from kaniko.helpers.dockerignore import DockerIgnore
+
+KANIKO_IMAGE = "gcr.io/kaniko-project/executor:latest"
+RUN_STREAMING = "kaniko.commands.build.kaniko.kaniko_wrapper.run_streaming"
+
+
+class TestDockerIgnore(unittest.TestCase):
+    def test_patterns(self):
+        ignore = DockerIgnore(
+            [
+                "# comment",
+                ".git",
+                "node_modules",
+                "!node_modules/keep",
+                "**/*.pyc",
+                "/docs/*.md",
+            ]
+        )
+        self.assertTrue(ignore.is_excluded(".git/HEAD"))
+        self.assertTrue(ignore.is_excluded("node_modules/left-pad/index.js"))
+        self.assertFalse(ignore.is_excluded("node_modules/keep"))
+        self.assertTrue(ignore.is_excluded("app/module.pyc"))
+        self.assertTrue(ignore.is_excluded("module.pyc"))
+        self.assertTrue(ignore.is_excluded("docs/readme.md"))
+        self.assertFalse(ignore.is_excluded("docs/api/readme.md"))
+        self.assertFalse(ignore.is_excluded("app/main.py"))
+
+    def test_can_skip_dir_respects_exceptions(self):
+        self.assertTrue(DockerIgnore(["build"]).can_skip_dir("build"))
+        self.assertFalse(DockerIgnore(["build", "!build/keep"]).can_skip_dir("build"))
+
+
+class TestContextFingerprinter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = self.tmp.name
+        self.write("Dockerfile", "FROM alpine\nCOPY . /app\n")
+        self.write("app.py", "print('hello')\n")
+        self.write(".dockerignore", "*.log\n")
+        self.fingerprinter = ContextFingerprinter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.context, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def fingerprint(self, build_args=None):
+        return self.fingerprinter.fingerprint(
+            self.context, "Dockerfile", build_args or {}, KANIKO_IMAGE
+        )
+
+    def test_stable_and_ignores_excluded_files(self):
+        first = self.fingerprint()
+        self.write("debug.log", "noise")
+        self.assertEqual(first, self.fingerprint())
+
+    def test_changes_with_inputs(self):
+        first = self.fingerprint()
+        self.assertNotEqual(first, self.fingerprint({"VERSION": "2"}))
+
+        self.write("app.py", "print('changed')\n")
+        second = self.fingerprint()
+        self.assertNotEqual(first, second)
+
+        self.write("Dockerfile", "FROM alpine:3.20\nCOPY . /app\n")
+        self.assertNotEqual(second, self.fingerprint())
+
+    def test_changes_with_target(self):
+        self.assertNotEqual(
+            self.fingerprint(),
+            self.fingerprinter.fingerprint(
+                self.context, "Dockerfile", {}, KANIKO_IMAGE, target="test"
+            ),
+        )
+
+
+class TestBuildIndex(unittest.TestCase):
+    def test_record_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.json")
+            BuildIndex(path).record("abc", "app", ["org/app:1"], "sha256:123")
+            entry = BuildIndex(path).lookup("abc")
+            self.assertEqual(entry["images"], ["org/app:1"])
+            self.assertEqual(entry["digest"], "sha256:123")
+
+    def test_moved_tags_and_corrupt_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.json")
+            with open(path, "w") as file:
+                file.write("{not json")
+            index = BuildIndex(path)
+            self.assertIsNone(index.lookup("abc"))
+
+            index.record("abc", "app", ["org/app:1", "org/app:latest"])
+            index.record("def", "app", ["org/app:2", "org/app:latest"])
+            self.assertEqual(BuildIndex(path).lookup("abc")["images"], ["org/app:1"])
+
+
+class TestSkipUnchanged(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "app")
+        os.makedirs(self.context)
+        with open(os.path.join(self.context, "Dockerfile"), "w") as file:
+            file.write("FROM alpine\n")
+        self.index = BuildIndex(os.path.join(self.tmp.name, "index.json"))
+        self.executor = KanikoExecutor(
+            KANIKO_IMAGE, push=True, dry_run=False, build_index=self.index
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, image, destinations=()):
+        self.executor.run_build(
+            "app", self.context, "Dockerfile", image, {}, destinations=destinations
+        )
+
+    def test_second_build_is_skipped(self):
+        with patch(RUN_STREAMING, return_value=0) as run:
+            self.build("org/app:1")
+            self.build("org/app:1")
+        self.assertEqual(run.call_count, 1)
+
+    def test_new_tag_is_retagged(self):
+        with patch(RUN_STREAMING, return_value=0) as build, patch(
+            "subprocess.run"
+        ) as retag:
+            self.build("org/app:1")
+            self.build("org/app:2")
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(
+            retag.call_args.args[0][-3:], ["copy", "org/app:1", "org/app:2"]
+        )
+
+    def test_only_missing_tags_are_retagged(self):
+        with patch(RUN_STREAMING, return_value=0) as build, patch(
+            "subprocess.run"
+        ) as retag:
+            self.build("org/app:1", ["org/app:latest"])
+            self.build("org/app:1", ["org/app:latest"])
+            self.assertEqual(retag.call_count, 0)
+            self.build("org/app:1", ["org/app:latest", "org/app:stable"])
+            self.build("org/app:1", ["org/app:latest", "org/app:stable"])
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(retag.call_count, 1)
+        self.assertEqual(retag.call_args.args[0][-1], "org/app:stable")
+
+    def test_other_target_is_built(self):
+        with patch(RUN_STREAMING, return_value=0) as run:
+            self.build("org/app:1")
+            self.executor.run_build(
+                "app-test",
+                self.context,
+                "Dockerfile",
+                "org/app:test",
+                {},
+                target="test",
+            )
+        self.assertEqual(run.call_count, 2)
+        command = run.call_args.args[0]
+        self.assertEqual(command[command.index("--target") + 1], "test")
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from kaniko.commands.build.kaniko.history import (
+    BuildHistory,
+    BuildRecord,
+    percentile,
+)
+from kaniko.commands.build.kaniko.resources import MemoryPeakSampler
+from kaniko.commands.build.kaniko.scheduler import BuildGraph, DagScheduler
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.commands.stats.cmd import format_table
+
+
+def make_graph(dependencies):
+    services = specs_from_dicts({name: {"image": name} for name in dependencies})
+    return BuildGraph(services, dependencies, {})
+
+
+class TestBuildHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = BuildHistory(os.path.join(self.tmp.name, "history.sqlite"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_expected_durations_and_stats(self):
+        records = [
+            BuildRecord("api", float(start), duration, True, 0, 512 * 1024**2)
+            for start, duration in enumerate([10.0, 12.0, 100.0])
+        ]
+        records.append(BuildRecord("api", 3.0, 1.0, False, 1))
+        records.append(BuildRecord("web", 4.0, 2.0, True, 0))
+        self.history.record(records)
+
+        self.assertEqual(
+            self.history.expected_durations(["api", "web", "new"]),
+            {"api": 12.0, "web": 2.0, "new": 7.0},
+        )
+
+        api, web = self.history.stats()
+        self.assertEqual((api.builds, api.failures), (4, 1))
+        self.assertEqual((api.p50, api.p95), (12.0, 100.0))
+        self.assertEqual(api.peak_memory, 512 * 1024**2)
+        self.assertEqual(web.peak_memory, None)
+        self.assertEqual(
+            [item.service for item in self.history.stats(["web"])], ["web"]
+        )
+
+        table = format_table(self.history.stats()).splitlines()
+        self.assertEqual(table[0].split()[:3], ["SERVICE", "BUILDS", "FAILED"])
+        self.assertEqual(
+            table[1].split()[:6], ["api", "4", "1", "12.0s", "100.0s", "512M"]
+        )
+
+    def test_empty_history(self):
+        self.assertEqual(self.history.expected_durations(["api"]), {})
+        self.assertIsNone(percentile([], 50))
+
+
+class TestPriorities(unittest.TestCase):
+    def test_longest_chain_starts_first(self):
+        graph = make_graph(
+            {"short": set(), "long": set(), "base": set(), "child": {"base"}}
+        )
+        durations = {"short": 1.0, "long": 10.0, "base": 4.0, "child": 8.0}
+        priorities = graph.critical_paths(durations)
+        self.assertEqual(priorities["base"], 12.0)
+
+        started = []
+        DagScheduler(max_parallel=1, priorities=priorities).run(graph, started.append)
+        self.assertEqual(started, ["base", "long", "child", "short"])
+
+
+class TestMemoryPeakSampler(unittest.TestCase):
+    def test_reads_container_cgroup(self):
+        with tempfile.TemporaryDirectory() as root:
+            cidfile = os.path.join(root, "build.cid")
+            scope = os.path.join(root, "system.slice", "docker-abc.scope")
+            os.makedirs(scope)
+            with open(cidfile, "w") as file:
+                file.write("abc")
+
+            sampler = MemoryPeakSampler(cidfile, cgroup_root=root)
+            for peak in ("100", "300", "200"):
+                with open(os.path.join(scope, "memory.peak"), "w") as file:
+                    file.write(peak)
+                sampler.sample()
+            self.assertEqual(sampler.peak, 300)
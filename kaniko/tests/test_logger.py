@@ -0,0 +1,161 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.output import ServiceOutput
+from kaniko.helpers.logger_file import (
+    JSON,
+    Logger,
+    LoggerModel,
+    VerbosityLevel,
+    queue_logging,
+    service_logger,
+)
+
+BUILDS = 50
+RECORDS_PER_BUILD = 20
+
+
+class SlowStream(io.StringIO):
+    """A console that takes a while for every write, like a busy terminal."""
+
+    def write(self, text):
+        time.sleep(0.0002)
+        return super().write(text)
+
+
+def flood(logger, builds=BUILDS, records=RECORDS_PER_BUILD):
+    """Seconds the ``builds`` threads spent in logging calls, summed up."""
+    spent = []
+
+    def build(index):
+        log = logging.LoggerAdapter(logger, {"service": f"svc-{index}"})
+        started = time.perf_counter()
+        for record in range(records):
+            log.info("Step %d of build %d", record, index)
+        spent.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=build, args=(i,)) for i in range(builds)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(spent)
+
+
+def measure_overhead():
+    """Logging time of a 50-build flood, written directly and through the queue."""
+    direct = logging.getLogger("kaniko-benchmark.direct")
+    direct.propagate = False
+    direct.setLevel(logging.INFO)
+    stream = SlowStream()
+    direct.handlers = [logging.StreamHandler(stream)]
+    blocking = flood(direct)
+
+    queued = logging.getLogger("kaniko-benchmark.queued")
+    queued.propagate = False
+    queued.setLevel(logging.INFO)
+    queued_stream = SlowStream()
+    listener = queue_logging(queued, [logging.StreamHandler(queued_stream)])
+    try:
+        queueing = flood(queued)
+    finally:
+        listener.stop()
+    lines = BUILDS * RECORDS_PER_BUILD
+    assert len(stream.getvalue().splitlines()) == lines
+    assert len(queued_stream.getvalue().splitlines()) == lines
+    return blocking, queueing
+
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(Logger.configure_logging, VerbosityLevel.NORMAL)
+        self.stderr = io.StringIO()
+        patcher = patch("sys.stderr", self.stderr)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_verbosity_from_options(self):
+        cases = [
+            ({"--quiet": 1, "--verbose": 2}, VerbosityLevel.QUIET, logging.WARNING),
+            ({}, VerbosityLevel.NORMAL, logging.INFO),
+            ({"-v": True}, VerbosityLevel.VERBOSE, logging.DEBUG),
+            ({"--verbose": 5}, VerbosityLevel.DEBUG, logging.DEBUG),
+        ]
+        for opts, verbosity, level in cases:
+            self.assertEqual(VerbosityLevel.from_opts(opts), verbosity)
+            self.assertEqual(verbosity.level, level)
+
+    def test_json_lines_with_service_fields(self):
+        Logger.configure_logging(VerbosityLevel.QUIET, JSON)
+        LoggerModel().log_info("hidden")
+        service_logger("app", "run-1").warning("Retrying %s", "push")
+        Logger.shutdown()
+
+        (line,) = self.stderr.getvalue().splitlines()
+        entry = json.loads(line)
+        self.assertEqual(entry["message"], "Retrying push")
+        self.assertEqual(entry["level"], "WARNING")
+        self.assertEqual((entry["service"], entry["build_id"]), ("app", "run-1"))
+
+    def test_one_logger_for_commands_and_engine(self):
+        Logger.configure_logging(VerbosityLevel.VERBOSE)
+        self.assertIs(LoggerModel().logger, Logger.get_logger())
+        Logger.get_logger().debug("debug shown")
+        Logger.shutdown()
+        self.assertIn("DEBUG - debug shown", self.stderr.getvalue())
+        with self.assertRaises(ValueError):
+            Logger.configure_logging(VerbosityLevel.NORMAL, "xml")
+
+    def test_service_messages_join_the_build_output(self):
+        with tempfile.TemporaryDirectory() as log_dir, patch(
+            "sys.stdout", io.StringIO()
+        ):
+            Logger.configure_logging(VerbosityLevel.NORMAL)
+            Logger.log_to_service_files(log_dir)
+            output = ServiceOutput("app", log_dir)
+            output.write_line("INFO[0000] RUN make")
+            output.close()
+            service_logger("app").info("Service app built successfully.")
+            Logger.get_logger().info("Not about a service")
+            Logger.shutdown()
+
+            with open(os.path.join(log_dir, "app.log")) as file:
+                lines = file.read().splitlines()
+            self.assertEqual(os.listdir(log_dir), ["app.log"])
+
+        self.assertEqual(lines[0], "INFO[0000] RUN make")
+        self.assertTrue(lines[1].endswith("INFO - Service app built successfully."))
+
+    def test_quiet_hides_build_output_but_keeps_the_files(self):
+        with tempfile.TemporaryDirectory() as log_dir, patch(
+            "sys.stdout", io.StringIO()
+        ) as stdout:
+            Logger.configure_logging(VerbosityLevel.QUIET)
+            output = ServiceOutput("app", log_dir)
+            output.write_line("INFO[0000] RUN make")
+            output.close()
+            Logger.shutdown()
+            with open(os.path.join(log_dir, "app.log")) as file:
+                self.assertEqual(file.read(), "INFO[0000] RUN make\n")
+
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual(self.stderr.getvalue(), "")
+
+    def test_queue_keeps_builds_from_waiting_on_the_console(self):
+        blocking, queueing = measure_overhead()
+        self.assertLess(queueing * 5, blocking)
+
+
+if __name__ == "__main__":
+    blocking, queueing = measure_overhead()
+    print(
+        f"{BUILDS} builds x {RECORDS_PER_BUILD} records: {blocking:.3f}s spent logging "
+        f"to the console directly, {queueing:.3f}s through the queue"
+    )
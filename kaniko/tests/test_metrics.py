@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoExecutor
+from kaniko.commands.build.kaniko.metrics import (
+    FAILED,
+    SUCCESS,
+    BuildMetrics,
+    ServiceMetrics,
+    parse_pushed_digest,
+)
+from kaniko.commands.build.kaniko.scheduler import BuildGraph, DagScheduler
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+
+RUN_STREAMING = "kaniko.commands.build.kaniko.kaniko_wrapper.run_streaming"
+DIGEST = "sha256:" + "ab" * 32
+
+KANIKO_OUTPUT = [
+    "INFO[0000] Retrieving image manifest alpine",
+    "INFO[0001] FROM alpine",
+    "INFO[0002] RUN apk add --no-cache curl",
+    "INFO[0003] Running: [/bin/sh -c apk add --no-cache curl]",
+    "INFO[0004] COPY . /app",
+    "INFO[0005] Pushing image to registry.local/app:1",
+    f"INFO[0006] Pushed registry.local/app@{DIGEST}",
+]
+
+
+def fake_build(lines, returncode=0):
+    def run_streaming(command, output, on_start=None):
+        for line in lines:
+            output.write_line(line)
+        return returncode
+
+    return run_streaming
+
+
+class TestServiceMetrics(unittest.TestCase):
+    def test_steps_and_digest_are_parsed(self):
+        metrics = ServiceMetrics("app")
+        metrics.started_at = 0.0
+        for line in KANIKO_OUTPUT:
+            metrics.observe_line(line)
+        metrics.finish(SUCCESS, 0)
+
+        self.assertEqual(
+            [step["instruction"] for step in metrics.steps], ["FROM", "RUN", "COPY"]
+        )
+        self.assertTrue(all(step["duration"] is not None for step in metrics.steps))
+        self.assertEqual(metrics.digest, DIGEST)
+        self.assertIsNotNone(metrics.container_start_latency)
+        self.assertEqual(parse_pushed_digest(KANIKO_OUTPUT[-1]), DIGEST)
+        self.assertIsNone(parse_pushed_digest(KANIKO_OUTPUT[0]))
+
+
+class TestBuildMetricsReports(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "app")
+        os.makedirs(self.context)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_builds(self, metrics):
+        executor = KanikoExecutor("kaniko", push=True, dry_run=False, metrics=metrics)
+        graph = BuildGraph(
+            specs_from_dicts({"app": {"image": "app"}, "broken": {"image": "broken"}}),
+            {"app": set(), "broken": set()},
+            {},
+        )
+
+        def build(name):
+            lines, returncode = (KANIKO_OUTPUT, 0) if name == "app" else ([], 2)
+            with patch(RUN_STREAMING, fake_build(lines, returncode)):
+                executor.run_build(name, self.context, "Dockerfile", name, {})
+
+        with self.assertRaises(Exception):
+            DagScheduler(max_parallel=1, on_ready=metrics.mark_queued).run(graph, build)
+
+    def test_json_and_prometheus_reports(self):
+        metrics = BuildMetrics()
+        self.run_builds(metrics)
+
+        json_path = os.path.join(self.tmp.name, "metrics.json")
+        prom_path = os.path.join(self.tmp.name, "metrics.prom")
+        metrics.write_json(json_path)
+        metrics.write_prometheus(prom_path)
+
+        with open(json_path) as file:
+            report = json.load(file)
+        app = report["services"]["app"]
+        self.assertEqual(app["status"], SUCCESS)
+        self.assertEqual(app["exit_code"], 0)
+        self.assertEqual(app["digest"], DIGEST)
+        self.assertGreaterEqual(app["queue_wait"], 0)
+        self.assertEqual(len(app["steps"]), 3)
+        self.assertEqual(report["services"]["broken"]["status"], FAILED)
+        self.assertEqual(report["services"]["broken"]["exit_code"], 2)
+
+        with open(prom_path) as file:
+            prom = file.read()
+        self.assertIn('kaniko_build_success{service="app"} 1', prom)
+        self.assertIn('kaniko_build_success{service="broken"} 0', prom)
+        self.assertIn('kaniko_build_exit_code{service="broken"} 2', prom)
+        self.assertIn('instruction="RUN"', prom)
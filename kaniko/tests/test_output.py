@@ -0,0 +1,58 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoExecutor
+from kaniko.commands.build.kaniko.output import ServiceOutput, run_streaming
+from kaniko.helpers.logger_file import Logger, VerbosityLevel
+
+CHATTY_SCRIPT = (
+    "import sys\n"
+    "for i in range(2000):\n"
+    "    sys.stdout.write(f'out {i}\\n')\n"
+    "    sys.stderr.write(f'err {i}\\n')\n"
+    "sys.stdout.write('no newline')\n"
+    "sys.exit(3)\n"
+)
+
+
+class TestStreamingOutput(unittest.TestCase):
+    def test_both_pipes_are_streamed_with_prefix(self):
+        self.addCleanup(Logger.configure_logging, VerbosityLevel.NORMAL)
+        console = io.StringIO()
+        with tempfile.TemporaryDirectory() as log_dir, patch("sys.stdout", console):
+            output = ServiceOutput("app", log_dir, tail_lines=5)
+            returncode = run_streaming([sys.executable, "-c", CHATTY_SCRIPT], output)
+            output.close()
+            Logger.flush()
+            with open(os.path.join(log_dir, "app.log")) as file:
+                logged = file.read().splitlines()
+
+        lines = console.getvalue().splitlines()
+        self.assertEqual(returncode, 3)
+        self.assertEqual(len(lines), 4001)
+        self.assertTrue(all(line.startswith("[app] ") for line in lines))
+        self.assertIn("[app] err 1999", lines)
+        self.assertEqual(len(logged), 4001)
+        self.assertEqual(len(output.tail()), 5)
+        self.assertEqual(output.tail()[-1], "no newline")
+
+    def test_failed_build_reports_tail(self):
+        executor = KanikoExecutor("kaniko", push=False, dry_run=False, tail_lines=2)
+
+        def fail(command, output, on_start=None):
+            for line in ["step 1", "step 2", "error: boom"]:
+                output.write_line(line)
+            return 1
+
+        with patch(
+            "kaniko.commands.build.kaniko.kaniko_wrapper.run_streaming",
+            side_effect=fail,
+        ), patch("sys.stdout", io.StringIO()):
+            with self.assertRaises(Exception) as raised:
+                executor.run_build("app", ".", "Dockerfile", "img", {})
+
+        self.assertEqual(raised.exception.output, "step 2\nerror: boom")
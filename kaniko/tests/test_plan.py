@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
+from kaniko.commands.build.kaniko.plan import BuildPlan, create_plan
+from kaniko.commands.build.kaniko.retry import RetryPolicy
+from kaniko.commands.build.kaniko.scheduler import BuildGraph
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.helpers.castom_exeption import InvalidBuildPlan, UnsetVariable
+
+
+def graph(dependencies, **services):
+    specs = specs_from_dicts(
+        {name: services.get(name, {"image": f"org/{name}"}) for name in dependencies}
+    )
+    return BuildGraph(specs, dependencies, {name: [] for name in dependencies})
+
+
+class TestBuildPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_plan_is_resolved_in_build_order(self):
+        plan = create_plan(
+            graph(
+                {"app": {"base"}, "base": set()},
+                app={
+                    "image": "org/app:1",
+                    "build": {"context": "app", "args": {"V": "1"}, "target": "prod"},
+                    "x-kaniko": {"cache": True, "retries": 2, "tags": ["latest"]},
+                    "deploy": {"resources": {"limits": {"cpus": "2"}}},
+                },
+            ),
+            KanikoCacheOptions(cache_repo="org/cache"),
+            RetryPolicy(1),
+            {"app": 10.0, "base": 5.0},
+        )
+        base, app = plan.builds
+        self.assertEqual(base.service_name, "base")
+        self.assertEqual(app.depends_on, ("base",))
+        self.assertEqual(app.images, ["org/app:1", "org/app:latest"])
+        self.assertEqual(app.build_args, (("V", "1"),))
+        self.assertEqual(app.target, "prod")
+        self.assertTrue(app.cache_options.cache)
+        self.assertEqual(app.cache_options.cache_repo, "org/cache")
+        self.assertEqual(app.retry_policy.retries, 2)
+        self.assertEqual(app.resources.cpus, 2.0)
+        self.assertEqual((base.priority, base.duration), (15.0, 5.0))
+
+    def test_build_args_are_interpolated(self):
+        app = {
+            "image": "org/app:${GIT_SHA}",
+            "build": {"args": {"REVISION": "${GIT_SHA}", "PRICE": "$$5"}},
+        }
+        with patch.dict(os.environ, {"GIT_SHA": "abc"}):
+            (build,) = create_plan(graph({"app": set()}, app=app)).builds
+        self.assertEqual(build.image, "org/app:abc")
+        self.assertEqual(build.build_args, (("REVISION", "abc"), ("PRICE", "$5")))
+        with patch.dict(os.environ, clear=True), self.assertRaises(UnsetVariable):
+            create_plan(graph({"app": set()}, app=app))
+
+    def test_round_trip(self):
+        plan = create_plan(
+            graph(
+                {"app": {"base"}, "base": set()},
+                app={"image": "org/app", "deploy": {"resources": {"limits": {}}}},
+            ),
+            fingerprint=lambda service, parents: f"sha-{service.name}",
+        )
+        path = os.path.join(self.tmp.name, "plans", "plan.json")
+        plan.write(path)
+        with open(path) as file:
+            self.assertEqual(json.load(file)["order"], ["base", "app"])
+
+        loaded = BuildPlan.read(path)
+        self.assertEqual(loaded.to_dict(), plan.to_dict())
+        self.assertEqual(loaded.build("app").fingerprint, "sha-app")
+
+    def test_fingerprints_include_dependencies(self):
+        services = {"app": {"base"}, "base": set(), "tool": set()}
+        plan = create_plan(
+            graph(services),
+            fingerprint=lambda service, parents: "+".join([service.name, *parents]),
+        )
+        self.assertEqual(plan.build("app").fingerprint, "app+base")
+
+        plan = create_plan(
+            graph(services),
+            fingerprint=lambda service, parents: (
+                None if service.name == "base" else service.name
+            ),
+        )
+        self.assertIsNone(plan.build("app").fingerprint)
+        self.assertEqual(plan.build("tool").fingerprint, "tool")
+
+    def test_invalid_plan(self):
+        path = os.path.join(self.tmp.name, "plan.json")
+        for content in ("not json", '{"version": 0, "builds": []}'):
+            with open(path, "w") as file:
+                file.write(content)
+            with self.assertRaises(InvalidBuildPlan):
+                BuildPlan.read(path)
+
+        with open(path, "w") as file:
+            json.dump({"version": 1, "builds": [{"service": "app"}]}, file)
+        with self.assertRaises(InvalidBuildPlan):
+            BuildPlan.read(path)
+
+    def test_shards_keep_dependencies_together(self):
+        plan = create_plan(
+            graph({"base": set(), "app": {"base"}, "worker": set(), "docs": set()}),
+            durations={"base": 30.0, "app": 30.0, "worker": 40.0, "docs": 10.0},
+        )
+        shards = [
+            [build.service_name for build in plan.shard(index, 2).builds]
+            for index in (1, 2)
+        ]
+        self.assertEqual(shards, [["base", "app"], ["worker", "docs"]])
+        self.assertEqual([b.service_name for b in plan.shard(3, 3).builds], ["docs"])
+        self.assertEqual(plan.shard(4, 4).builds, ())
+        with self.assertRaises(ValueError):
+            plan.shard(0, 2)
+
+    def test_shards_without_history_split_by_count(self):
+        plan = create_plan(graph({name: set() for name in "abcd"}))
+        sizes = [len(plan.shard(index, 2).builds) for index in (1, 2)]
+        self.assertEqual(sizes, [2, 2])
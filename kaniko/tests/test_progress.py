@@ -0,0 +1,87 @@
+import io
+import unittest
+
+from kaniko.commands.build.kaniko import metrics as build_metrics
+from kaniko.commands.build.kaniko.progress import (
+    BUILDING,
+    DONE,
+    FAILED,
+    LIVE,
+    PLAIN,
+    PUSHING,
+    QUEUED,
+    BuildProgress,
+    ProgressEvent,
+    ServiceProgress,
+)
+
+
+def event(kind, value=None, at=0.0):
+    return ProgressEvent("app", kind, value, at)
+
+
+class TestServiceProgress(unittest.TestCase):
+    def test_follows_the_build_output(self):
+        service = ServiceProgress("app", steps=3, expected=10.0)
+        self.assertTrue(service.apply(event(QUEUED)))
+        self.assertTrue(service.apply(event(BUILDING, at=100.0)))
+        self.assertFalse(service.apply(event("line", "INFO[0000] FROM alpine")))
+        service.apply(event("line", "INFO[0001] RUN make"))
+        service.apply(event("line", "compiling"))
+        self.assertEqual(service.describe(), "building step 2 of 3")
+        self.assertEqual(service.last_line, "compiling")
+        self.assertEqual(service.eta(104.0), 6.0)
+        self.assertEqual(service.eta(115.0), -5.0)
+
+        self.assertTrue(service.apply(event("line", "INFO[0009] Pushing image to a")))
+        self.assertEqual(service.state, PUSHING)
+        service.apply(event("finished", build_metrics.SUCCESS, at=112.0))
+        self.assertEqual(service.state, DONE)
+        self.assertEqual(service.elapsed(200.0), 12.0)
+        self.assertIsNone(service.eta(200.0))
+
+    def test_unknown_status_is_a_failure(self):
+        service = ServiceProgress("app")
+        service.apply(event(BUILDING))
+        service.apply(event("finished", None))
+        self.assertEqual(service.state, FAILED)
+
+
+class TestBuildProgress(unittest.TestCase):
+    def report(self, progress):
+        progress.add("base", steps=2)
+        progress.add("app", steps=2, expected=60.0)
+        with progress:
+            progress.set_state("base", BUILDING)
+            progress.line("base", "INFO[0000] FROM alpine")
+            progress.finished("base", build_metrics.SUCCESS)
+            progress.set_state("app", QUEUED)
+            progress.set_state("app", BUILDING)
+            progress.line("app", "INFO[0000] RUN exit 3")
+            progress.finished("app", build_metrics.FAILED)
+
+    def test_plain_lines_without_terminal(self):
+        console = io.StringIO()
+        progress = BuildProgress(console=console, refresh_interval=0.01)
+        self.assertFalse(progress.live)
+        self.report(progress)
+
+        lines = console.getvalue().splitlines()
+        self.assertIn("[base] done, after 0s", lines)
+        self.assertIn("[app] failed, after 0s", lines)
+        self.assertFalse(any("queued" in line for line in lines))
+
+    def test_live_table(self):
+        console = io.StringIO()
+        progress = BuildProgress(LIVE, console=console, refresh_interval=0.01)
+        self.report(progress)
+
+        output = console.getvalue()
+        self.assertIn("last output", output)
+        self.assertIn("RUN exit 3", output)
+        self.assertEqual(progress.services["app"].state, FAILED)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            BuildProgress("off")
+        self.assertFalse(BuildProgress(PLAIN).live)
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoCommandBuilder
+from kaniko.commands.build.kaniko.resources import (
+    DEFAULT_REQUEST,
+    HostResources,
+    ResourcePool,
+    ResourceRequest,
+    parse_memory,
+)
+from kaniko.commands.build.kaniko.scheduler import (
+    BuildGraph,
+    DagScheduler,
+    admission_request,
+)
+from kaniko.commands.build.kaniko.services import ServiceSpec, specs_from_dicts
+
+
+class TestResourceRequest(unittest.TestCase):
+    def test_parse_memory(self):
+        self.assertEqual(parse_memory("512m"), 512 * 1024**2)
+        self.assertEqual(parse_memory("2G"), 2 * 1024**3)
+        self.assertEqual(parse_memory("1.5GiB"), int(1.5 * 1024**3))
+        self.assertEqual(parse_memory(1024), 1024)
+        with self.assertRaises(ValueError):
+            parse_memory("lots")
+
+    def test_from_service(self):
+        service = {
+            "deploy": {"resources": {"limits": {"cpus": "0.5", "memory": "256M"}}}
+        }
+        self.assertEqual(
+            ResourceRequest.from_service(ServiceSpec.from_dict("app", service)),
+            ResourceRequest(0.5, 256 * 1024**2),
+        )
+
+        service["x-kaniko"] = {"resources": {"cpus": 2, "memory": "4g"}}
+        self.assertEqual(
+            ResourceRequest.from_service(ServiceSpec.from_dict("app", service)),
+            ResourceRequest(2.0, 4 * 1024**3),
+        )
+        self.assertIsNone(ResourceRequest.from_service(ServiceSpec("app", image="app")))
+
+    def test_docker_flags(self):
+        command = KanikoCommandBuilder("kaniko").build_command(
+            "ctx", "Dockerfile", "img", {}, False, resources=ResourceRequest(1.5, 1024)
+        )
+        self.assertEqual(
+            command[:7], ["docker", "run", "--rm", "--cpus", "1.5", "--memory", "1024"]
+        )
+
+    def test_undeclared_resources_are_charged_but_not_limited(self):
+        service = ServiceSpec("app", image="app")
+        self.assertEqual(admission_request(service), DEFAULT_REQUEST)
+        command = KanikoCommandBuilder("kaniko").build_command(
+            "ctx",
+            "Dockerfile",
+            "img",
+            {},
+            False,
+            resources=ResourceRequest.from_service(service),
+        )
+        self.assertNotIn("--cpus", command)
+        self.assertNotIn("--memory", command)
+
+
+class TestHostResources(unittest.TestCase):
+    def test_cgroup_v2_limits(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name, value in [
+                ("cpu.max", "200000 100000"),
+                ("memory.max", str(8 * 1024**3)),
+                ("memory.current", str(2 * 1024**3)),
+            ]:
+                with open(os.path.join(root, name), "w") as file:
+                    file.write(value)
+            host = HostResources.detect(root)
+        self.assertLessEqual(host.cpus, 2.0)
+        self.assertLessEqual(host.memory, 6 * 1024**3)
+
+
+class TestResourcePool(unittest.TestCase):
+    def test_acquire_release_and_clamp(self):
+        pool = ResourcePool(cpus=4, memory=1000)
+        self.assertTrue(pool.try_acquire(ResourceRequest(3, 600)))
+        self.assertFalse(pool.try_acquire(ResourceRequest(2, 100)))
+        pool.release(ResourceRequest(3, 600))
+        # Larger than the whole pool: clamped, so it runs alone.
+        self.assertTrue(pool.try_acquire(ResourceRequest(16, 5000)))
+        self.assertFalse(pool.try_acquire(ResourceRequest(1, 1)))
+
+    def test_scheduler_admits_by_memory(self):
+        services = specs_from_dicts(
+            {
+                name: {"image": name, "x-kaniko": {"resources": {"memory": "3g"}}}
+                for name in "abcd"
+            }
+        )
+        graph = BuildGraph(services, {name: set() for name in services}, {})
+        pool = ResourcePool(cpus=16, memory=parse_memory("7g"))
+        active, peak = [], []
+        lock = threading.Lock()
+
+        def build(name):
+            with lock:
+                active.append(name)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(name)
+
+        DagScheduler(max_parallel=8, resources=pool).run(graph, build)
+        self.assertEqual(max(peak), 2)
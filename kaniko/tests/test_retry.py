@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from kaniko.commands.build.kaniko.backends import DirectExecutorBackend
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoExecutor
+from kaniko.commands.build.kaniko.metrics import FAILED, SUCCESS, BuildMetrics
+from kaniko.commands.build.kaniko.retry import (
+    TRANSIENT,
+    TRANSIENT_PUSH,
+    FailureClassifier,
+    RetryPolicy,
+)
+from kaniko.helpers.logger_file import Logger
+from kaniko.tests.test_backends import FAKE_CRANE, FAKE_EXECUTOR
+
+
+def classify(*lines):
+    classifier = FailureClassifier()
+    for line in lines:
+        classifier.observe_line(line)
+    return classifier.kind
+
+
+class TestFailureClassifier(unittest.TestCase):
+    def test_kinds(self):
+        self.assertEqual(
+            classify("error building image: GET https://r/v2/: TOOMANYREQUESTS"),
+            TRANSIENT,
+        )
+        self.assertEqual(
+            classify("ERRO[0003] read tcp: connection reset by peer"), TRANSIENT
+        )
+        self.assertEqual(
+            classify('time=2024-05-01T10:00:00Z level=fatal msg="i/o timeout"'),
+            TRANSIENT,
+        )
+        self.assertEqual(
+            classify(
+                "INFO[0005] Pushing image to registry.local/app:1",
+                "error pushing image: unexpected status code 502 Bad Gateway",
+            ),
+            TRANSIENT_PUSH,
+        )
+        self.assertIsNone(classify("RUN make", "error: make returned 2"))
+        self.assertIsNone(
+            classify("ERRO[0001] status 503", "error pushing image: UNAUTHORIZED")
+        )
+
+    def test_ignores_output_of_run_steps(self):
+        self.assertIsNone(
+            classify(
+                "INFO[0002] RUN curl -f https://api.local/health",
+                "curl: (22) The requested URL returned error: 503",
+                "WARN[0002] retrying after connection reset by peer",
+                "error building image: error building stage: failed to execute "
+                "command: waiting for process to exit: exit status 22",
+            )
+        )
+
+    def test_crane_errors(self):
+        classifier = FailureClassifier(kaniko=False)
+        classifier.observe_line(
+            "Error: PUT https://r/v2/app/blobs: 503 Service Unavailable"
+        )
+        self.assertEqual(classifier.kind, TRANSIENT)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_exponential_backoff_with_jitter(self):
+        policy = RetryPolicy(3, base_delay=2.0, max_delay=5.0)
+        self.assertEqual(policy.delay(1, jitter=lambda: 0.0), 1.0)
+        self.assertEqual(policy.delay(2, jitter=lambda: 1.0), 4.0)
+        self.assertEqual(policy.delay(3, jitter=lambda: 1.0), 5.0)
+
+    def test_per_service_override(self):
+        default = RetryPolicy(1, base_delay=2.0)
+        self.assertIs(RetryPolicy.from_extension({}, default), default)
+        policy = RetryPolicy.from_extension({"retries": "4"}, default)
+        self.assertEqual((policy.retries, policy.base_delay), (4, 2.0))
+        with self.assertRaises(ValueError):
+            RetryPolicy(-1)
+
+
+class TestRetriedBuilds(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = os.path.join(self.tmp.name, "app")
+        os.makedirs(self.context)
+        with open(os.path.join(self.context, "Dockerfile"), "w") as file:
+            file.write("FROM alpine\nRUN true\n")
+        self.state = os.path.join(self.tmp.name, "flaky")
+        self.metrics = BuildMetrics()
+        # Output queued by earlier tests must not reach this test's stdout.
+        Logger.flush()
+        patcher = patch("sys.stdout", io.StringIO())
+        self.stdout = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(Logger.flush)
+
+    def output(self):
+        Logger.flush()
+        return self.stdout.getvalue()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def executor(self, retry_policy, crane=FAKE_CRANE):
+        return KanikoExecutor(
+            "kaniko",
+            push=True,
+            dry_run=False,
+            metrics=self.metrics,
+            backend=DirectExecutorBackend(FAKE_EXECUTOR, crane=crane),
+            retry_policy=retry_policy,
+        )
+
+    def build(self, failures, kind, retries, executor=None):
+        with open(self.state, "w") as file:
+            file.write(f"{failures} {kind}")
+        executor = executor or self.executor(RetryPolicy(retries, base_delay=0.0))
+        executor.run_build(
+            "app",
+            self.context,
+            "Dockerfile",
+            "org/app:1",
+            {"FAKE_FLAKY": self.state},
+        )
+        return self.metrics.service("app")
+
+    def test_transient_pull_failures_are_retried(self):
+        metrics = self.build(2, "pull", retries=2)
+        self.assertEqual((metrics.status, metrics.attempts), (SUCCESS, 3))
+        self.assertIsNotNone(metrics.digest)
+        self.assertEqual(len(metrics.steps), 2)
+
+    def test_push_retry_pushes_the_saved_image(self):
+        metrics = self.build(1, "push", retries=1)
+        self.assertEqual((metrics.status, metrics.attempts), (SUCCESS, 2))
+        lines = self.output().splitlines()
+        # Built once, then only pushed again.
+        self.assertEqual(len([line for line in lines if "RUN true" in line]), 1)
+        # The fake executor saves the Dockerfile as the image.
+        saved = hashlib.sha256(b"FROM alpine\nRUN true\n").hexdigest()
+        self.assertEqual(metrics.digest, f"sha256:{saved}")
+
+    def test_push_retry_rebuilds_without_crane(self):
+        with patch("shutil.which", return_value=None):
+            metrics = self.build(
+                1, "push", retries=1, executor=self.executor(RetryPolicy(1, 0.0), None)
+            )
+        self.assertEqual((metrics.status, metrics.attempts), (SUCCESS, 2))
+        lines = self.output().splitlines()
+        self.assertEqual(len([line for line in lines if "RUN true" in line]), 2)
+
+    def test_budget_and_permanent_failures(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.build(3, "pull", retries=2)
+        self.assertEqual(self.metrics.service("app").attempts, 3)
+
+        self.metrics = BuildMetrics()
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.build(1, "auth", retries=2)
+        metrics = self.metrics.service("app")
+        self.assertEqual((metrics.status, metrics.attempts), (FAILED, 1))
+
+    def test_abort_during_backoff_stops_retrying(self):
+        class AbortingPolicy(RetryPolicy):
+            # Another build fails with --fail-fast while this one waits.
+            def delay(self, attempt, jitter=None):
+                executor.kill_running()
+                return 60.0
+
+        executor = self.executor(AbortingPolicy(2))
+        started = time.monotonic()
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.build(1, "pull", retries=2, executor=executor)
+        self.assertLess(time.monotonic() - started, 30)
+        metrics = self.metrics.service("app")
+        self.assertEqual((metrics.status, metrics.attempts), (FAILED, 1))
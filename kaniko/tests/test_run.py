@@ -1,4 +1,8 @@
+import io
+import json
+import os
 import subprocess
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -6,119 +10,258 @@ from kaniko.commands.build.cmd import (
     KanikoBuildCommand,
     LoggerModel,
     CommandLineOptions,
+    run,
 )
+from kaniko.commands.build.kaniko.async_builder import AsyncKanikoBuilder
+from kaniko.commands.build.kaniko.backends import DirectExecutorBackend
+from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoBuilder
+from kaniko.helpers.logger_file import Logger
+from kaniko.tests.test_backends import FAKE_EXECUTOR
+
+COMPOSE = """
+services:
+  base:
+    image: org/base:1
+    build:
+      context: ./base
+  app:
+    image: org/app:1
+    build:
+      context: ./app
+      args:
+        VERSION: "2"
+"""
 
 
 class TestKanikoBuildCommand(unittest.TestCase):
     def setUp(self):
-        self.mock_opts = MagicMock(spec=CommandLineOptions)
-        self.mock_opts.compose_file = "docker-compose.yml"
-        self.mock_opts.kaniko_image = "gcr.io/kaniko-project/executor:latest"
-        self.mock_opts.push = False
-        self.mock_opts.deploy = False
-        self.mock_opts.dry_run = False
-
-        self.build_command = KanikoBuildCommand(self.mock_opts)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.write("docker-compose.yml", COMPOSE)
+        self.write("base/Dockerfile", "FROM alpine\nRUN echo base\n")
+        self.write("app/Dockerfile", "FROM org/base:1\nRUN echo app\n")
+        for target in (
+            "kaniko.commands.build.kaniko.services.CACHE_DIR",
+            "kaniko.commands.build.kaniko.context_hasher.CACHE_DIR",
+        ):
+            patcher = patch(target, os.path.join(self.tmp.name, "cache"))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Build contexts are relative to the working directory.
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
         self.mock_logger = MagicMock(spec=LoggerModel)
 
-    def test_build_command_basic(self):
-        self.mock_opts.push = False
-        self.mock_opts.deploy = False
-
-        expected_command = [
-            "docker",
-            "run",
-            "--rm",
-            "-v",
-            "docker-compose.yml:/workspace",
-            "gcr.io/kaniko-project/executor:latest",
-            "--context",
-            "/workspace",
-            "--dockerfile",
-            "/workspace/Dockerfile",
-        ]
-        self.assertEqual(self.build_command.build_command(), expected_command)
-
-    def test_build_command_with_push(self):
-        self.mock_opts.push = True
-        self.mock_opts.deploy = False
-        expected_command = [
-            "docker",
-            "run",
-            "--rm",
-            "-v",
-            "docker-compose.yml:/workspace",
-            "gcr.io/kaniko-project/executor:latest",
-            "--context",
-            "/workspace",
-            "--dockerfile",
-            "/workspace/Dockerfile",
-            "--destination",
-            "your-registry/your-image:latest",
-        ]
-        self.assertEqual(self.build_command.build_command(), expected_command)
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
 
-    def test_run_build_error_logging(self):
-        self.mock_opts.dry_run = False
-        mock_subprocess_run = MagicMock(
-            side_effect=subprocess.CalledProcessError(1, "test")
+    def options(self, **kwargs):
+        values = dict(record_history=False)
+        values.update(kwargs)
+        return CommandLineOptions(**values)
+
+    def test_creates_builder_from_options(self):
+        builder = KanikoBuildCommand(
+            self.options(deploy=True, backend="direct", retries=2, max_parallel=3)
+        ).create_builder()
+        self.assertIsInstance(builder, KanikoBuilder)
+        self.assertTrue(builder.push)
+        self.assertIsInstance(builder.backend, DirectExecutorBackend)
+        self.assertEqual(builder.retry_policy.retries, 2)
+
+        builder = KanikoBuildCommand(self.options(engine="asyncio")).create_builder()
+        self.assertIsInstance(builder, AsyncKanikoBuilder)
+        self.assertFalse(builder.push)
+
+    def test_asyncio_engine_rejects_threads_only_options(self):
+        self.assertTrue(self.options(engine="asyncio", build_timeout=60).validate())
+        for option, value in (
+            ("--skip-unchanged", dict(skip_unchanged=True)),
+            ("--digest-dir", dict(digest_dir="digests")),
+            ("--metrics-out", dict(metrics_out="metrics.json")),
+            ("--warm-cache", dict(warm_cache=True)),
+            ("--fail-fast", dict(failure_mode="fail-fast")),
+            ("--keep-going", dict(failure_mode="keep-going")),
+            ("--retries", dict(retries=2)),
+            ("--pack-context", dict(pack_context=True)),
+            ("--history", dict(history="history.db")),
+            ("--host-cpus", dict(host_cpus=4.0)),
+            ("--host-memory", dict(host_memory=1 << 30)),
+        ):
+            with self.subTest(option):
+                logger = MagicMock()
+                self.assertTrue(self.options(**value).validate())
+                options = self.options(engine="asyncio", **value)
+                self.assertFalse(options.validate(logger))
+                self.assertIn(option, logger.error.call_args.args[0])
+
+    def test_threads_engine_rejects_build_timeout(self):
+        logger = MagicMock()
+        self.assertFalse(self.options(build_timeout=60).validate(logger))
+        self.assertIn("--build-timeout", logger.error.call_args.args[0])
+
+    def test_plan_in_rejects_service_selection(self):
+        self.assertTrue(self.options(plan_in="plan.json", shard=(1, 2)).validate())
+        for option, value in (
+            ("<service>", dict(services=["app"])),
+            ("--profile", dict(profiles=["ci"])),
+            ("--with-dependencies", dict(with_dependencies=True)),
+            ("--changed-since", dict(changed_since="main")),
+        ):
+            with self.subTest(option):
+                logger = MagicMock()
+                self.assertTrue(self.options(**value).validate())
+                options = self.options(plan_in="plan.json", **value)
+                self.assertFalse(options.validate(logger))
+                self.assertIn(option, logger.error.call_args.args[0])
+
+    def test_dry_run_prints_plan_without_starting_builds(self):
+        stdout = io.StringIO()
+        with patch("subprocess.Popen") as popen, patch(
+            "subprocess.run"
+        ) as run_process, patch("sys.stdout", stdout):
+            result = KanikoBuildCommand(self.options(dry_run=True)).run_build(
+                self.mock_logger
+            )
+
+        self.assertTrue(result)
+        popen.assert_not_called()
+        run_process.assert_not_called()
+        plan = stdout.getvalue()
+        self.assertIn("Build plan for 2 services:", plan)
+        self.assertLess(plan.index("[1/2] base"), plan.index("[2/2] app"))
+        self.assertIn("after: base", plan)
+        self.assertIn("--build-arg VERSION=2", plan)
+        self.assertIn("--no-push", plan)
+
+    def test_builds_every_service(self):
+        options = self.options(backend="direct", push=True)
+        with patch(
+            "kaniko.commands.build.kaniko.backends.create_backend",
+            return_value=DirectExecutorBackend(FAKE_EXECUTOR),
+        ), patch("sys.stdout", io.StringIO()):
+            result = KanikoBuildCommand(options).run_build(self.mock_logger)
+
+        self.assertTrue(result)
+        self.mock_logger.log_error.assert_not_called()
+        self.mock_logger.log_info.assert_called_with(
+            "✅ Kaniko build process completed successfully!"
         )
 
-        with patch("subprocess.run", mock_subprocess_run):
-            self.build_command.run_build(self.mock_logger)
+    def test_skip_unchanged_rebuilds_dependents(self):
+        metrics_path = os.path.join(self.tmp.name, "metrics.json")
+        options = self.options(
+            backend="direct",
+            push=True,
+            skip_unchanged=True,
+            build_index=os.path.join(self.tmp.name, "index.json"),
+            metrics_out=metrics_path,
+        )
+
+        def build():
+            with patch(
+                "kaniko.commands.build.kaniko.backends.create_backend",
+                return_value=DirectExecutorBackend(FAKE_EXECUTOR),
+            ), patch("sys.stdout", io.StringIO()):
+                self.assertTrue(KanikoBuildCommand(options).run_build(self.mock_logger))
+            with open(metrics_path) as file:
+                services = json.load(file)["services"]
+            return {name: services[name]["status"] for name in ("base", "app")}
+
+        self.assertEqual(build(), {"base": "success", "app": "success"})
+        self.assertEqual(build(), {"base": "skipped", "app": "skipped"})
+        # Only the parent changes; app is built on top of it.
+        self.write("base/Dockerfile", "FROM alpine\nRUN echo base 2\n")
+        self.assertEqual(build(), {"base": "success", "app": "success"})
+
+    def test_progress_views(self):
+        for mode, expected, hidden in (
+            ("plain", "[app] done", None),
+            ("live", "last output", "[app] INFO["),
+        ):
+            stdout = io.StringIO()
+            options = self.options(backend="direct", progress=mode)
+            with patch(
+                "kaniko.commands.build.kaniko.backends.create_backend",
+                return_value=DirectExecutorBackend(FAKE_EXECUTOR),
+            ), patch("sys.stdout", stdout):
+                self.assertTrue(KanikoBuildCommand(options).run_build(self.mock_logger))
+                Logger.flush()
+            self.assertIn(expected, stdout.getvalue())
+            if hidden:
+                self.assertNotIn(hidden, stdout.getvalue())
+
+    def test_plan_out_then_plan_in(self):
+        plan_path = os.path.join(self.tmp.name, "plan.json")
+        with patch("sys.stdout", io.StringIO()):
+            KanikoBuildCommand(
+                self.options(dry_run=True, plan_out=plan_path)
+            ).run_build(self.mock_logger)
+        os.remove("docker-compose.yml")
+
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout):
+            result = KanikoBuildCommand(
+                self.options(dry_run=True, plan_in=plan_path, shard=(1, 1))
+            ).run_build(self.mock_logger)
+        self.assertTrue(result)
+        self.assertIn("[2/2] app", stdout.getvalue())
+        self.assertIn("fingerprint: ", stdout.getvalue())
+
+    def test_run_build_error_logging(self):
+        builder = MagicMock()
+        builder.run.side_effect = subprocess.CalledProcessError(1, "test")
+        command = KanikoBuildCommand(self.options())
+        with patch.object(command, "create_builder", return_value=builder):
+            self.assertFalse(command.run_build(self.mock_logger))
 
         self.mock_logger.log_error.assert_called_once_with(
             "❌ Kaniko build failed with error: Command 'test' returned non-zero exit status 1."
         )
 
-    def test_build_command_with_deploy(self):
-        self.mock_opts.push = False
-        self.mock_opts.deploy = True
-
-        expected_command = [
-            "docker",
-            "run",
-            "--rm",
-            "-v",
-            "docker-compose.yml:/workspace",
-            "gcr.io/kaniko-project/executor:latest",
-            "--context",
-            "/workspace",
-            "--dockerfile",
-            "/workspace/Dockerfile",
-            "--destination",
-            "your-registry/your-image:latest",
-            "--deploy",
-        ]
-        self.assertEqual(self.build_command.build_command(), expected_command)
-
-    def test_run_build_dry_run(self):
-        self.mock_opts.dry_run = True
-        build_command = KanikoBuildCommand(self.mock_opts)
-        build_command.run_build(self.mock_logger)
-
-        self.mock_logger.log_info.assert_called_once_with(
-            "🔍 Running in dry-run mode. No images will be pushed."
-        )
-        self.mock_logger.log_error.assert_not_called()
+    def test_unknown_service_or_profile_is_a_usage_error(self):
+        for options, message in (
+            (
+                dict(services=["nope"]),
+                "❌ Usage error: No buildable service named: nope. "
+                "Buildable services: app, base.",
+            ),
+            (
+                dict(profiles=["nope"]),
+                "❌ Usage error: No service has the profile: nope.",
+            ),
+        ):
+            with self.subTest(message):
+                logger = MagicMock(spec=LoggerModel)
+                command = KanikoBuildCommand(self.options(dry_run=True, **options))
+                self.assertFalse(command.run_build(logger))
+                logger.log_error.assert_called_once_with(message)
+
+    def test_failed_build_exits_with_error(self):
+        self.write("app/Dockerfile", "FROM org/base:1\nRUN exit 3\n")
+        opts = {
+            "--backend": "direct",
+            "--no-history": True,
+        }
+        with patch(
+            "kaniko.commands.build.kaniko.backends.create_backend",
+            return_value=DirectExecutorBackend(FAKE_EXECUTOR),
+        ), patch("sys.stdout", io.StringIO()), patch(
+            "kaniko.commands.build.cmd.LoggerModel"
+        ):
+            with self.assertRaises(SystemExit) as raised:
+                run(opts)
+        self.assertEqual(raised.exception.code, 1)
 
-    def test_build_command_with_required_options(self):
-        self.mock_opts.compose_file = "test-compose.yml"
-        self.mock_opts.kaniko_image = "test-kaniko-image:latest"
-        self.mock_opts.push = False
-        self.mock_opts.deploy = False
-
-        expected_command = [
-            "docker",
-            "run",
-            "--rm",
-            "-v",
-            "test-compose.yml:/workspace",
-            "test-kaniko-image:latest",
-            "--context",
-            "/workspace",
-            "--dockerfile",
-            "/workspace/Dockerfile",
-        ]
-
-        self.assertEqual(self.build_command.build_command(), expected_command)
+    def test_version_shows_version_without_building(self):
+        with patch("kaniko.commands.build.cmd.LoggerModel") as logger_model, patch(
+            "kaniko.commands.build.cmd.KanikoBuildCommand"
+        ) as command:
+            run({"--version": True}, script_version="1.2.3")
+        logger_model.return_value.log_info.assert_called_once_with(
+            "📄 Kaniko Builder Script Version: 1.2.3"
+        )
+        command.assert_not_called()
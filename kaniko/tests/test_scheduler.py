@@ -0,0 +1,214 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from kaniko.commands.build.kaniko.kaniko_wrapper import (
+    KanikoCommandBuilder,
+    KanikoExecutor,
+)
+from kaniko.commands.build.kaniko.scheduler import (
+    FAIL_FAST,
+    KEEP_GOING,
+    BuildGraph,
+    DagScheduler,
+    parse_dockerfile_bases,
+)
+from kaniko.commands.build.kaniko.services import specs_from_dicts
+from kaniko.helpers.castom_exeption import CyclicDependency, FailedBuild
+
+
+class TestParseDockerfileBases(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dockerfile = os.path.join(self.tmp.name, "Dockerfile")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        with open(self.dockerfile, "w") as file:
+            file.write(text)
+
+    def test_multi_stage_and_args(self):
+        self.write(
+            "ARG BASE=python:3.11\n"
+            "# comment\n"
+            "FROM --platform=linux/amd64 ${BASE} AS builder\n"
+            "RUN make \\\n    all\n"
+            "FROM builder AS test\n"
+            "FROM alpine:3.20\n"
+            "COPY --from=builder /app /app\n"
+            "COPY --from=my-registry/tools:1 /bin/tool /bin/tool\n"
+        )
+        self.assertEqual(
+            parse_dockerfile_bases(self.dockerfile),
+            ["python:3.11", "alpine:3.20", "my-registry/tools:1"],
+        )
+
+    def test_build_args_override_defaults(self):
+        self.write("ARG BASE=python:3.11\nFROM $BASE\n")
+        self.assertEqual(
+            parse_dockerfile_bases(self.dockerfile, {"BASE": "python:3.12"}),
+            ["python:3.12"],
+        )
+
+    def test_missing_dockerfile(self):
+        self.assertEqual(parse_dockerfile_bases("does/not/exist"), [])
+
+
+class TestBuildGraph(unittest.TestCase):
+    def bases(self, mapping):
+        return lambda path, args: mapping.get(path, [])
+
+    def test_edges_from_depends_on_and_from(self):
+        services = {
+            "base": {"image": "org/base", "build": {"context": "base"}},
+            "api": {"image": "org/api:1", "build": "api"},
+            "worker": {"image": "org/worker:1", "depends_on": {"api": {}}},
+            "db": {"environment": {}},
+        }
+        graph = BuildGraph.from_services(
+            specs_from_dicts(services),
+            self.bases({os.path.join("api", "Dockerfile"): ["org/base:latest"]}),
+        )
+        self.assertEqual(set(graph.services), {"base", "api", "worker"})
+        self.assertEqual(graph.dependencies["api"], {"base"})
+        self.assertEqual(graph.dependencies["worker"], {"api"})
+        self.assertEqual(graph.topological_order(), ["base", "api", "worker"])
+
+    def test_cycle_is_rejected(self):
+        services = {
+            "a": {"image": "a", "depends_on": ["b"]},
+            "b": {"image": "b", "depends_on": ["a"]},
+        }
+        with self.assertRaises(CyclicDependency):
+            BuildGraph.from_services(specs_from_dicts(services), self.bases({}))
+
+
+def make_graph(dependencies):
+    services = specs_from_dicts({name: {"image": name} for name in dependencies})
+    return BuildGraph(services, dependencies, {})
+
+
+class TestDagScheduler(unittest.TestCase):
+
+    def test_parents_finish_before_children_start(self):
+        graph = make_graph({"a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}})
+        events = []
+        lock = threading.Lock()
+
+        def build(name):
+            with lock:
+                events.append(("start", name))
+            time.sleep(0.01)
+            with lock:
+                events.append(("end", name))
+
+        DagScheduler(max_parallel=4).run(graph, build)
+
+        position = {event: index for index, event in enumerate(events)}
+        for child, parents in graph.dependencies.items():
+            for parent in parents:
+                self.assertLess(position[("end", parent)], position[("start", child)])
+
+    def test_max_parallel_is_respected(self):
+        graph = make_graph({name: set() for name in "abcdef"})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def build(name):
+            with lock:
+                active.append(name)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(name)
+
+        DagScheduler(max_parallel=2).run(graph, build)
+        self.assertEqual(max(peak), 2)
+
+    def test_failure_skips_dependents(self):
+        graph = make_graph({"a": set(), "b": {"a"}})
+        built = []
+
+        def build(name):
+            if name == "a":
+                raise RuntimeError("boom")
+            built.append(name)
+
+        with self.assertRaises(RuntimeError):
+            DagScheduler().run(graph, build)
+        self.assertEqual(built, [])
+
+    def test_invalid_max_parallel(self):
+        with self.assertRaises(ValueError):
+            DagScheduler(max_parallel=0)
+
+
+class TestFailureModes(unittest.TestCase):
+    def test_keep_going_reports_every_failure(self):
+        graph = make_graph({"a": set(), "b": set(), "c": {"a"}, "d": {"b"}, "e": set()})
+        built = []
+
+        def build(name):
+            if name in ("a", "b"):
+                raise RuntimeError(f"{name} broke")
+            built.append(name)
+
+        with self.assertRaises(FailedBuild) as raised:
+            DagScheduler(max_parallel=1, failure_mode=KEEP_GOING).run(graph, build)
+
+        self.assertEqual(built, ["e"])
+        self.assertEqual(set(raised.exception.failures), {"a", "b"})
+        self.assertEqual(raised.exception.skipped, ["c", "d"])
+        self.assertIn("a broke", str(raised.exception))
+
+    def test_fail_fast_aborts_running_builds(self):
+        graph = make_graph({"slow": set(), "broken": set(), "later": set()})
+        abort = threading.Event()
+
+        def build(name):
+            if name == "broken":
+                raise RuntimeError("typo")
+            # Stand-in for a container that only stops once it is killed.
+            if not abort.wait(5):
+                return
+            raise RuntimeError("killed")
+
+        started = time.monotonic()
+        with self.assertRaises(FailedBuild) as raised:
+            DagScheduler(
+                max_parallel=2, failure_mode=FAIL_FAST, on_abort=abort.set
+            ).run(graph, build)
+
+        self.assertLess(time.monotonic() - started, 4)
+        self.assertEqual(list(raised.exception.failures), ["broken"])
+        self.assertEqual(set(raised.exception.skipped), {"slow", "later"})
+
+    def test_unknown_failure_mode(self):
+        with self.assertRaises(ValueError):
+            DagScheduler(failure_mode="sometimes")
+
+
+class TestContainerLabels(unittest.TestCase):
+    def test_builds_are_named_and_labelled(self):
+        executor = KanikoExecutor("kaniko", push=False, dry_run=False)
+        name = executor.container_name("api/v1")
+        self.assertEqual(name, f"kaniko-{executor.run_id}-api-v1")
+
+        command = KanikoCommandBuilder("kaniko").build_command(
+            "ctx",
+            "Dockerfile",
+            "img",
+            {},
+            False,
+            container_name=name,
+            labels={"kaniko-wrapper.run": executor.run_id},
+        )
+        self.assertEqual(
+            command[3:7],
+            ["--name", name, "--label", f"kaniko-wrapper.run={executor.run_id}"],
+        )
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from kaniko import settings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+# Modules that only a running build needs; the CLI front door must not load them.
+HEAVY_MODULES = {
+    "yaml",
+    "pydantic",
+    "dotenv",
+    "json",
+    "concurrent.futures",
+    "kaniko.models.model_wrapper",
+    "kaniko.commands.build.kaniko.kaniko_wrapper",
+}
+
+# Cumulative import time of kaniko.main, in microseconds. It is ~25ms today, the
+# budget leaves room for slow CI machines while still catching an eager import.
+IMPORT_BUDGET_US = 100_000
+
+
+def import_times(*args):
+    """Run ``python -X importtime -m kaniko *args`` and return its output."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "kaniko", *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    cumulative = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total)
+    return process, cumulative
+
+
+class TestStartup(unittest.TestCase):
+    def test_version_fast_path(self):
+        process, cumulative = import_times("--version")
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(process.stdout.strip(), settings.SCRIPT_VERSION)
+        self.assertFalse(HEAVY_MODULES & set(cumulative))
+        self.assertLess(cumulative["kaniko.main"], IMPORT_BUDGET_US)
+
+    def test_command_help_does_not_load_the_engine(self):
+        process, cumulative = import_times("build", "--help")
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertIn("Usage:", process.stdout)
+        self.assertFalse(HEAVY_MODULES & set(cumulative))
@@ -2,6 +2,7 @@ import os
 import unittest
 
 from kaniko.commands.build.cmd import CommandLineOptions
+from kaniko.commands.build.kaniko.cache_options import KanikoCacheOptions
 from kaniko.commands.build.kaniko.kaniko_wrapper import KanikoCommandBuilder
 
 
@@ -144,3 +145,55 @@ class TestCommandLineOptions(unittest.TestCase):
         options.compose_file = "docker-compose.yml"
         options.kaniko_image = ""
         self.assertFalse(options.validate())
+
+    def test_max_parallel(self):
+        options = CommandLineOptions.from_dict({"--max-parallel": "4"})
+        self.assertEqual(options.max_parallel, 4)
+        self.assertTrue(options.validate())
+
+        options.max_parallel = 0
+        self.assertFalse(options.validate())
+
+
+class TestKanikoCacheOptions(unittest.TestCase):
+    def test_defaults_keep_previous_flags(self):
+        self.assertEqual(
+            KanikoCacheOptions().to_flags(), ["--snapshot-mode=redo", "--cache=false"]
+        )
+
+    def test_service_options_override_global(self):
+        global_options = KanikoCacheOptions.from_cli(
+            {"--cache": True, "--cache-repo": "registry/cache", "--cache-ttl": "24h"}
+        )
+        service_options = KanikoCacheOptions.from_extension(
+            {"cache-repo": "registry/app-cache", "snapshot-mode": "time"}
+        )
+        merged = global_options.merged(service_options)
+        self.assertEqual(
+            merged.to_flags(),
+            [
+                "--snapshot-mode=time",
+                "--cache=true",
+                "--cache-repo=registry/app-cache",
+                "--cache-ttl=24h",
+            ],
+        )
+
+    def test_invalid_snapshot_mode(self):
+        with self.assertRaises(ValueError):
+            KanikoCacheOptions(snapshot_mode="fast")
+
+    def test_cache_dir_is_mounted(self):
+        builder = KanikoCommandBuilder("kaniko:latest")
+        options = KanikoCacheOptions(
+            cache="true", cache_dir="cache", use_new_run=True, cache_copy_layers=True
+        )
+        command = builder.build_command("ctx", "Dockerfile", "img", {}, False, options)
+
+        mount = f"{os.path.abspath('cache')}:/cache:ro"
+        self.assertIn(mount, command)
+        self.assertLess(command.index(mount), command.index("kaniko:latest"))
+        self.assertIn("--cache-dir=/cache", command)
+        self.assertIn("--use-new-run", command)
+        self.assertIn("--cache-copy-layers", command)
+        self.assertIn("--cache=true", command)